@@ -0,0 +1,99 @@
+"""
+Adaptive routing by expected answer length: fixed (every general chat turn goes to the
+70B model with max_tokens=4096) vs adaptive (per-length budgets, short answers to the
+small model), over the bench_routing message corpus.
+
+The mock answers with a long reply cut to each request's max_tokens, after a per-model
+first-token latency plus --token-latency per generated token, so both the smaller model
+and the tighter budgets show up in latency and completion tokens.
+
+Usage (from backend/):
+    python -m benchmarks.bench_adaptive --large-latency 0.6 --small-latency 0.15 --token-latency 0.0005
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import main  # noqa: E402
+from benchmarks.bench_routing import CORPUS  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter  # noqa: E402
+from routing import LENGTH_DETAILED, LENGTH_MODERATE, LENGTH_SHORT, Router  # noqa: E402
+from usage import UsageTracker  # noqa: E402
+
+LENGTHS = (LENGTH_SHORT, LENGTH_MODERATE, LENGTH_DETAILED)
+# A verbose model: ~3000 tokens unless max_tokens stops it
+REPLY = "Vanakkam machi! " + "This is a long and thorough answer. " * 340
+
+
+async def run_policy(adaptive: bool, messages: List[str]) -> Dict[str, List[Tuple[float, int]]]:
+    """(seconds, completion tokens) per expected length"""
+    main.ADAPTIVE_ROUTING = adaptive
+    main.router = Router(main.ROUTE_MODELS, main.IMAGE_MODELS, main.LENGTH_ROUTE_MODELS if adaptive else None)
+    main.usage_tracker = UsageTracker()
+    results: Dict[str, List[Tuple[float, int]]] = {length: [] for length in LENGTHS}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=120) as client:
+        for message in messages:
+            length = main.router.route(message).length
+            start = time.perf_counter()
+            response = await client.post("/api/chat", json={"message": message})
+            response.raise_for_status()
+            results[length].append((time.perf_counter() - start, len(response.json()["text"]) // 4))
+    return results
+
+
+def report(label: str, results: Dict[str, List[Tuple[float, int]]]) -> Tuple[float, int]:
+    print(f"{label}")
+    for length in LENGTHS:
+        samples = results[length]
+        if samples:
+            print(f"  {length:<9} n={len(samples):<3} mean {statistics.mean(s for s, _ in samples):6.3f}s  "
+                  f"completion tokens {sum(t for _, t in samples):>7}")
+    for model, totals in main.usage_tracker.models.items():
+        print(f"  {model:<45} calls {totals['requests']:>3}  prompt {totals['promptTokens']:>7}  "
+              f"completion {totals['completionTokens']:>7}")
+    seconds = [s for samples in results.values() for s, _ in samples]
+    tokens = sum(t for samples in results.values() for _, t in samples)
+    print(f"  total     mean {statistics.mean(seconds):6.3f}s  p95 {sorted(seconds)[int(0.95 * len(seconds))]:6.3f}s  "
+          f"completion tokens {tokens}")
+    return statistics.mean(seconds), tokens
+
+
+async def run() -> None:
+    # Only general chat is affected; images never reach the upstream
+    messages = [m for m in CORPUS if main.router.route(m).category != "image"]
+    fixed = report("fixed", await run_policy(False, messages))
+    adaptive = report("adaptive", await run_policy(True, messages))
+    await main.shutdown()
+    print(f"adaptive: {1 - adaptive[0] / fixed[0]:.0%} lower mean latency, "
+          f"{1 - adaptive[1] / fixed[1]:.0%} fewer completion tokens")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--large-latency", type=float, default=0.6, help="first-token seconds, default 70B model")
+    parser.add_argument("--small-latency", type=float, default=0.15, help="first-token seconds, SHORT_MODEL")
+    parser.add_argument("--token-latency", type=float, default=0.0005, help="seconds per generated token")
+    args = parser.parse_args()
+
+    main.response_cache = None
+    main.semantic_cache = None
+    main.knowledge_base = None
+    main.scheduler = None
+    # Isolate the length policy from deadline-based max_tokens cuts
+    main.DEADLINE_TOKENS_PER_SECOND = 0
+
+    large = main.ROUTE_MODELS["default"][0]
+    small = main.LENGTH_ROUTE_MODELS.get(LENGTH_SHORT, (large,))[0]
+    model_latency = {model: args.large_latency for model in main.MODEL_CATALOG["language"].values()}
+    model_latency[small] = args.small_latency
+    with MockOpenRouter(reply=REPLY, model_latency=model_latency, token_latency=args.token_latency) as mock:
+        main.OPENROUTER_API_URL = mock.url
+        asyncio.run(run())
@@ -0,0 +1,56 @@
+"""
+A study guide's worth of two-mark questions: one /api/chat call per question vs a
+single /api/chat/batch call, over real HTTP against a mock OpenRouter.
+
+Usage (from backend/):
+    python -m benchmarks.bench_batch --questions 200 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter, serve_app  # noqa: E402
+
+
+async def run(base_url: str, questions: int) -> None:
+    items = [{"message": f"Define normalization in DBMS, two mark question {i}"} for i in range(questions)]
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        start = time.perf_counter()
+        for item in items:
+            (await client.post("/api/chat", json=item)).raise_for_status()
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = await client.post("/api/chat/batch", json={"items": items})
+        batch = time.perf_counter() - start
+        failed = sum(result.get("error") is not None for result in response.json()["results"])
+
+    print(f"serial /api/chat    {questions} questions in {serial:6.2f} s")
+    print(f"/api/chat/batch     {questions} questions in {batch:6.2f} s  "
+          f"(concurrency={main.BATCH_CONCURRENCY}, failed={failed}, speedup={serial / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    # Every question is distinct upstream work; caching would only flatter the second pass
+    main.response_cache = None
+    main.semantic_cache = None
+    with MockOpenRouter(latency=args.latency) as mock:
+        main.OPENROUTER_API_URL = mock.url
+        server, base_url = serve_app(main.app)
+        try:
+            asyncio.run(run(base_url, args.questions))
+        finally:
+            server.should_exit = True
@@ -0,0 +1,60 @@
+"""
+Burst of identical /api/chat requests against a slow mock OpenRouter.
+With coalescing on, the mock should see exactly one upstream call per burst.
+
+Usage (from backend/):
+    python -m benchmarks.bench_coalescing --burst 50 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+
+
+async def burst(mock: MockOpenRouter, size: int, coalescing: bool) -> None:
+    main.inflight = SingleFlight() if coalescing else None
+    mock.calls = 0
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/api/chat", json={"message": "what is a hash map in data structures"})
+            for _ in range(size)
+        ])
+        elapsed = time.perf_counter() - start
+
+    ok = sum(r.status_code == 200 for r in responses)
+    label = "coalescing on" if coalescing else "coalescing off"
+    print(f"{label:<15} requests={size} ok={ok} upstream_calls={mock.calls} wall={elapsed:.2f} s")
+
+
+async def run(mock: MockOpenRouter, size: int):
+    # The response cache would hide the effect after the first reply
+    main.response_cache = None
+    main.semantic_cache = None
+    # Rate limiting would stretch the uncoalesced burst
+    main.scheduler = None
+    await burst(mock, size, coalescing=False)
+    await burst(mock, size, coalescing=True)
+    await main.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with MockOpenRouter(latency=args.latency) as mock:
+        main.OPENROUTER_API_URL = mock.url
+        asyncio.run(run(mock, args.burst))
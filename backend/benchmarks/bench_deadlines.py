@@ -0,0 +1,153 @@
+"""
+Request deadlines and disconnect cancellation against a slow mock OpenRouter.
+
+  disconnect  --slots clients ask /api/chat and hang up after --hangup seconds while the
+              mock takes --latency seconds per answer. Then --slots new questions arrive
+              (answered in 50 ms): with the request guard they get the freed upstream
+              slots at once; unguarded they queue behind calls nobody is waiting for.
+  deadline    every deadline set to --deadline seconds: the request answers 504 on time,
+              its slot is released, and the max_tokens sent upstream shrink to fit.
+
+Exits non-zero when the guarded run leaves slots busy or a deadline check fails.
+
+Usage (from backend/):
+    python -m benchmarks.bench_deadlines --slots 4 --latency 5 --hangup 0.5 --deadline 2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List, Tuple
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter, serve_app  # noqa: E402
+from deadlines import RequestGuard  # noqa: E402
+
+MODEL = main.ROUTE_MODELS["default"][0]
+
+
+class Unguarded:
+    """The old behaviour: no deadline, and nobody notices the client leaving"""
+
+    deadline_exceeded = disconnects = 0
+
+    async def run(self, work, deadline, request=None):
+        return await work
+
+    def stats(self):
+        return {}
+
+
+def active_slots() -> int:
+    lane = main.scheduler.lanes.get(MODEL)
+    return lane.active if lane is not None else 0
+
+
+async def ask(base_url: str, message: str, timeout: float) -> Tuple[int, float]:
+    """(status, seconds); status 0 when we hung up first"""
+    start = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        try:
+            response = await client.post("/api/chat", json={"message": message})
+            return response.status_code, time.perf_counter() - start
+        except httpx.TimeoutException:
+            return 0, time.perf_counter() - start
+
+
+async def disconnect_case(base_url: str, mock: MockOpenRouter, slots: int, latency: float, hangup: float) -> bool:
+    """Whether every client hung up and every upstream slot was free again right after"""
+    mock.latency = latency
+    abandoned = await asyncio.gather(*[
+        ask(base_url, f"Explain deadlock in operating systems ({i})", hangup) for i in range(slots)
+    ])
+    hung_up = sum(1 for status, _ in abandoned if status == 0)
+    # Give the guard a couple of poll intervals to notice
+    await asyncio.sleep(main.DISCONNECT_POLL_INTERVAL * 2)
+    busy = active_slots()
+
+    mock.latency = 0.05
+    probes: List[Tuple[int, float]] = await asyncio.gather(*[
+        ask(base_url, f"Explain virtual memory and paging ({i})", latency * 4) for i in range(slots)
+    ])
+    waits = sorted(seconds for _, seconds in probes)
+    print(f"  hung up {hung_up}/{slots}  slots still busy {busy}/{slots}  "
+          f"next requests p50 {waits[len(waits) // 2]:.2f}s max {waits[-1]:.2f}s  "
+          f"upstream calls cancelled {mock.requests_cancelled}")
+    # Let any abandoned upstream calls finish before the next case
+    while active_slots():
+        await asyncio.sleep(0.05)
+    return hung_up == slots and busy == 0
+
+
+async def deadline_case(base_url: str, mock: MockOpenRouter, latency: float, deadline: float) -> bool:
+    """Whether the request got a 504 on time, freed its slot and asked for fewer tokens than usual"""
+    question = "Explain the OSI model in detail"
+    # The same question answered quickly under the default deadlines, for the usual max_tokens
+    mock.latency = 0.05
+    mock.max_tokens.clear()
+    await ask(base_url, question, latency)
+    usual = max(mock.max_tokens, default=0)
+
+    saved = dict(main.REQUEST_DEADLINES)
+    main.REQUEST_DEADLINES.update({kind: deadline for kind in main.REQUEST_DEADLINES})
+    mock.latency = latency
+    mock.max_tokens.clear()
+    try:
+        status, seconds = await ask(base_url, question, latency * 2)
+    finally:
+        main.REQUEST_DEADLINES.update(saved)
+    await asyncio.sleep(main.DISCONNECT_POLL_INTERVAL)
+    busy = active_slots()
+    sent = max(mock.max_tokens, default=0)
+    print(f"  status {status} after {seconds:.2f}s (deadline {deadline:g}s, mock {latency:g}s)  "
+          f"slots still busy {busy}  max_tokens sent {sent} (usually {usual})")
+    # Half a second of slack for the disconnect poll and the round trip
+    return status == 504 and seconds < deadline + 0.5 and busy == 0 and 0 < sent < usual
+
+
+async def run(base_url: str, mock: MockOpenRouter, args) -> int:
+    freed = False
+    for label, guard in (("unguarded", Unguarded()), ("guarded", RequestGuard(main.DISCONNECT_POLL_INTERVAL))):
+        main.request_guard = guard
+        mock.requests_cancelled = 0
+        print(f"disconnect ({label})")
+        freed = await disconnect_case(base_url, mock, args.slots, args.latency, args.hangup)
+    print(f"  guarded slots freed: {'ok' if freed else 'FAILED'}")
+    print("deadline (guarded)")
+    on_time = await deadline_case(base_url, mock, args.latency, args.deadline)
+    print(f"  504, slot freed, max_tokens cut: {'ok' if on_time else 'FAILED'}")
+    print(f"aborted {main.request_guard.stats()}")
+    return 0 if freed and on_time else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, default=4, help="upstream concurrency per model")
+    parser.add_argument("--latency", type=float, default=5.0, help="mock seconds per slow answer")
+    parser.add_argument("--hangup", type=float, default=0.5, help="client timeout for abandoned requests")
+    parser.add_argument("--deadline", type=float, default=2.0)
+    args = parser.parse_args()
+
+    main.response_cache = None
+    main.semantic_cache = None
+    main.inflight = None
+    main.knowledge_base = None
+    main.UPSTREAM_RATE_LIMIT = 0
+    main.UPSTREAM_MODEL_CONCURRENCY = args.slots
+    main.scheduler = main.create_scheduler()
+    main.model_router.max_attempts = 1
+
+    with MockOpenRouter() as mock:
+        main.OPENROUTER_API_URL = mock.url
+        server, base_url = serve_app(main.app)
+        try:
+            code = asyncio.run(run(base_url, mock, args))
+        finally:
+            server.should_exit = True
+    sys.exit(code)
@@ -0,0 +1,85 @@
+"""
+Fallback and hedging against a mock OpenRouter with injected faults.
+
+  rate-limited   the primary coding model answers 429, the next coding model answers
+  slow primary   the primary takes --slow seconds; with hedging a second model is raced
+                 after the primary's p95 and the slow request is cancelled
+
+Usage (from backend/):
+    python -m benchmarks.bench_fallback --requests 20 --slow 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter  # noqa: E402
+from fallback import ModelRouter  # noqa: E402
+
+PRIMARY = main.MODEL_CATALOG["coding"]["qwen"]
+NORMAL_LATENCY = 0.05
+WARMUP_SAMPLES = 20
+
+
+async def scenario(mock: MockOpenRouter, label: str, count: int, hedging: bool) -> None:
+    main.model_router = ModelRouter(main.MODEL_CATALOG, hedging=hedging, hedge_min_delay=0.1)
+    # Warm the latency window so the hedge delay comes from a real p95
+    for _ in range(WARMUP_SAMPLES):
+        main.model_router.model_stats(PRIMARY).record_success(NORMAL_LATENCY)
+    mock.model_calls.clear()
+    mock.requests_cancelled = 0
+
+    transport = httpx.ASGITransport(app=main.app)
+    latencies, answered = [], {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for i in range(count):
+            start = time.perf_counter()
+            response = await client.post("/api/code", json={"message": f"write bubble sort #{i}"})
+            latencies.append(time.perf_counter() - start)
+            model = response.json().get("modelUsed", f"HTTP {response.status_code}")
+            answered[model] = answered.get(model, 0) + 1
+
+    # Give the mock a moment to notice the cancelled connections
+    await asyncio.sleep(0.2)
+    stats = main.model_router.snapshot()
+    print(
+        f"{label:<28} p50={statistics.median(latencies) * 1000:7.1f} ms "
+        f"max={max(latencies) * 1000:7.1f} ms fallbacks={stats['fallbacks']} "
+        f"hedges={stats['hedges']} hedge_wins={stats['hedgeWins']} cancelled_upstream={mock.requests_cancelled}"
+    )
+    print(f"{'':<28} answered by {answered}")
+
+
+async def run(mock: MockOpenRouter, count: int, slow: float) -> None:
+    main.response_cache = None
+    main.semantic_cache = None
+    main.inflight = None
+    main.scheduler = None
+
+    mock.model_status = {PRIMARY: 429}
+    mock.model_latency = {}
+    await scenario(mock, "429 primary, fallback", count, hedging=False)
+
+    mock.model_status = {}
+    mock.model_latency = {PRIMARY: slow}
+    await scenario(mock, "slow primary, no hedging", max(1, count // 10), hedging=False)
+    await scenario(mock, "slow primary, hedging", count, hedging=True)
+    await main.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--slow", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with MockOpenRouter(latency=NORMAL_LATENCY) as mock:
+        main.OPENROUTER_API_URL = mock.url
+        asyncio.run(run(mock, args.requests, args.slow))
@@ -0,0 +1,64 @@
+"""
+Per-call latency of call_openrouter: fresh AsyncClient per call vs shared pool.
+
+Usage (from backend/):
+    python -m benchmarks.bench_http_client --calls 500
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "what is a hash map"}]
+
+
+async def call_with_fresh_client(model: str, messages: list) -> str:
+    """The pre-pool behaviour: one AsyncClient (and connection) per call"""
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        response = await client.post(
+            main.OPENROUTER_API_URL,
+            json={"model": model, "messages": messages},
+            headers={"Authorization": f"Bearer {main.OPENROUTER_API_KEY}"},
+        )
+        return response.json()["choices"][0]["message"]["content"]
+
+
+async def measure(call, calls: int) -> list[float]:
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call("mock/model", MESSAGES)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label: str, latencies: list[float]):
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"{label:<14} p50={cuts[49]:7.2f} ms  p99={cuts[98]:7.2f} ms  n={len(latencies)}")
+
+
+async def run(calls: int):
+    report("fresh client", await measure(call_with_fresh_client, calls))
+    report("shared pool", await measure(main.call_openrouter, calls))
+    await main.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=300)
+    args = parser.parse_args()
+
+    with MockOpenRouter() as mock:
+        main.OPENROUTER_API_URL = mock.url
+        main.response_cache = None  # measure the transport, not cache hits
+        main.scheduler = None  # nor rate limiting
+        asyncio.run(run(args.calls))
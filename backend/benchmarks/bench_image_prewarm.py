@@ -0,0 +1,84 @@
+"""
+Time until the browser has the image bytes for /api/generate-image, against a local
+Pollinations stub that takes --render seconds per image.
+
+  direct      the browser fetches the Pollinations URL itself after the API answers
+  prewarmed   IMAGE_PREWARM=1: the API queues the fetch as it answers and the browser
+              loads /api/images/{key} after --view-delay seconds (the chat bubble renders first)
+  repeat      the same prompts again, served from the local image cache
+
+Also times generate_image_url (prompt cleanup + URL building) per call.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_prewarm --prompts 20 --render 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import timeit
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+os.environ["IMAGE_PREWARM"] = "1"
+os.environ["PUBLIC_API_URL"] = "http://bench"
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter  # noqa: E402
+
+PROMPTS = [
+    "draw a diagram of the TCP three way handshake",
+    "generate an image of a CPU pipeline",
+    "circuit diagram of a full adder",
+    "realistic photo of a futuristic campus library",
+]
+
+
+async def view(api: httpx.AsyncClient, web: httpx.AsyncClient, prompt: str, direct: bool, delay: float) -> float:
+    """Seconds from asking for the image to having its bytes"""
+    start = time.perf_counter()
+    result = (await api.get("/api/generate-image", params={"prompt": prompt})).json()
+    await asyncio.sleep(delay)
+    if direct:
+        response = await web.get(result["sourceUrl"])
+    else:
+        response = await api.get(result["cachedUrl"], follow_redirects=True)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(count: int, delay: float) -> None:
+    prompts = [f"{PROMPTS[i % len(PROMPTS)]} {i}" for i in range(count)]
+    api = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=120)
+    web = httpx.AsyncClient(timeout=120)
+
+    async def scenario(label: str, direct: bool, view_delay: float):
+        times = await asyncio.gather(*(view(api, web, p, direct, view_delay) for p in prompts))
+        print(f"{label:<10} p50={statistics.median(times) * 1000:8.1f} ms  max={max(times) * 1000:8.1f} ms")
+
+    await scenario("direct", True, delay)
+    main.image_prewarmer.cache._entries.clear()
+    await scenario("prewarmed", False, delay)
+    await scenario("repeat", False, 0.0)
+    print(f"image cache: {main.image_prewarmer.stats()}")
+    await api.aclose()
+    await web.aclose()
+    await main.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument("--render", type=float, default=2.0)
+    parser.add_argument("--view-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    per_call = timeit.timeit(lambda: main.generate_image_url(PROMPTS[0]), number=10000) / 10000
+    print(f"generate_image_url: {per_call * 1e6:.1f} us/call")
+
+    with MockOpenRouter(image_latency=args.render) as mock:
+        main.POLLINATIONS_IMAGE_URL = mock.image_url
+        asyncio.run(run(args.prompts, args.view_delay))
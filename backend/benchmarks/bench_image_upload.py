@@ -0,0 +1,122 @@
+"""
+Peak RSS per concurrent vision request: base64 JSON (/api/vision) vs streamed binary
+upload (/api/vision/upload). Each mode runs in its own process so peaks do not mix;
+the mock OpenRouter runs in the parent so upstream parsing is not counted.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_upload --concurrency 8
+"""
+
+import argparse
+import asyncio
+import base64
+import gc
+import io
+import json
+import os
+import subprocess
+import sys
+
+import httpx
+
+CHUNK = 64 * 1024
+PROMPT = "Explain what this circuit does"
+
+
+def photo_bytes() -> bytes:
+    """A ~4.5 MB 12 MP JPEG, similar to a phone photo of a whiteboard"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    base = Image.fromarray(rng.integers(0, 255, (60, 80, 3), dtype=np.uint8)).resize((4000, 3000), Image.BICUBIC)
+    pixels = np.asarray(base).astype(np.int16) + rng.integers(-20, 20, (3000, 4000, 3))
+    out = io.BytesIO()
+    Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def proc_status(field: str) -> float:
+    """VmRSS / VmHWM of this process in MB"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def reset_peak() -> None:
+    """Start VmHWM over from the current RSS (Linux >= 4.0)"""
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+async def chunked(body: bytes):
+    view = memoryview(body)
+    for start in range(0, len(view), CHUNK):
+        yield bytes(view[start:start + CHUNK])
+
+
+async def child(mode: str, url: str, concurrency: int) -> dict:
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+    import main
+
+    main.OPENROUTER_API_URL = url
+    main.scheduler = None
+
+    photo = photo_bytes()
+    if mode == "json":
+        path, params, headers = "/api/vision", None, {"content-type": "application/json"}
+        body = json.dumps({"prompt": PROMPT, "image": base64.b64encode(photo).decode(), "mimeType": "image/jpeg"}).encode()
+    else:
+        path, params, headers = "/api/vision/upload", {"prompt": PROMPT}, {"content-type": "image/jpeg"}
+        body = photo
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+
+        async def send():
+            response = await client.post(path, params=params, content=chunked(body), headers=headers)
+            response.raise_for_status()
+
+        await send()  # warm-up: imports, pools, allocator arenas
+        gc.collect()
+        reset_peak()
+        baseline = proc_status("VmRSS")
+        await asyncio.gather(*[send() for _ in range(concurrency)])
+        peak = proc_status("VmHWM")
+
+    await main.shutdown()
+    return {"baseline": baseline, "peak": peak, "perRequest": (peak - baseline) / concurrency, "bodyBytes": len(body)}
+
+
+def main_parent(concurrency: int, latency: float) -> None:
+    from benchmarks.mock_openrouter import MockOpenRouter
+
+    with MockOpenRouter(latency=latency) as mock:
+        for mode, label in (("json", "base64 JSON"), ("upload", "binary upload")):
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_image_upload",
+                 "--child", mode, "--url", mock.url, "--concurrency", str(concurrency)],
+                capture_output=True, text=True, check=True,
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print(
+                f"{label:<14} body={stats['bodyBytes'] / 1e6:5.1f} MB  "
+                f"peak-baseline={stats['peak'] - stats['baseline']:7.1f} MB  "
+                f"per request={stats['perRequest']:6.1f} MB  (n={concurrency})"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--child", choices=("json", "upload"), help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(child(args.child, args.url, args.concurrency))))
+    else:
+        main_parent(args.concurrency, args.latency)
@@ -0,0 +1,81 @@
+"""
+Serialization cost of the three JSON hot spots, stdlib json vs orjson:
+
+  payload    encode an upstream vision payload carrying a 5 MB base64 image
+  response   decode a 4096-token OpenRouter completion
+  render     render a 4096-token notes ChatResponse through the API response class
+
+Usage (from backend/):
+    python -m benchmarks.bench_json --repeat 50
+"""
+
+import argparse
+import base64
+import os
+import time
+
+from fastapi.responses import JSONResponse
+
+import fastjson
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+from main import ChatResponse  # noqa: E402
+
+# ~4 characters per token, with the Tamil/emoji mix the prompts ask for
+NOTES = ("**Hash table** - புரியுதா? Average O(1) lookup via hashing; 📝 Exam Tip: collisions! " * 200)[:16384]
+
+
+def vision_payload() -> dict:
+    image = base64.b64encode(os.urandom(5 * 1024 * 1024 * 3 // 4)).decode("ascii")
+    return {
+        "model": "meta-llama/llama-3.2-11b-vision-instruct",
+        "messages": [{"role": "user", "content": [
+            {"type": "text", "text": "Explain this circuit"},
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image}"}},
+        ]}],
+        "temperature": 0.7,
+        "max_tokens": 4096,
+        "usage": {"include": True},
+    }
+
+
+def completion_body() -> bytes:
+    return fastjson.stdlib_dumps({
+        "id": "gen-bench",
+        "model": "meta-llama/llama-3.3-70b-instruct:free",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": NOTES}}],
+        "usage": {"prompt_tokens": 620, "completion_tokens": 4096, "total_tokens": 4716},
+    })
+
+
+def timed(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(repeat: int) -> None:
+    payload = vision_payload()
+    body = completion_body()
+    content = ChatResponse(text=NOTES, type="notes", modelUsed="meta-llama/llama-3.3-70b-instruct:free",
+                           modelName="LLaMA 3.3 70B (FREE)").model_dump()
+
+    cases = [
+        ("payload (5 MB image)", lambda: fastjson.stdlib_dumps(payload), lambda: fastjson.dumps(payload)),
+        ("response (4096 tok)", lambda: fastjson.stdlib_loads(body), lambda: fastjson.loads(body)),
+        ("render (4096 tok)", lambda: JSONResponse(content), lambda: fastjson.FastJSONResponse(content)),
+    ]
+    print(f"codec: {fastjson.codec_name()}")
+    for label, baseline, fast in cases:
+        before, after = timed(baseline, repeat), timed(fast, repeat)
+        print(f"{label:<22} json={before:8.3f} ms  fast={after:8.3f} ms  speedup={before / after:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    run(args.repeat)
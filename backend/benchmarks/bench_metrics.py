@@ -0,0 +1,87 @@
+"""
+Per-request cost of the metrics middleware, phase timers and Server-Timing header.
+Builds the app's middleware stack with and without MetricsMiddleware, alternates
+rounds between the two so machine noise hits both equally, and exits 1 if the
+difference per request exceeds --budget-us.
+
+  health   GET /              (middleware only)
+  chat     POST /api/chat     response-cache hit, so every phase runs but nothing goes upstream
+
+Usage (from backend/):
+    python -m benchmarks.bench_metrics --requests 1000 --budget-us 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+os.environ["METRICS"] = "1"
+os.environ["SERVER_TIMING"] = "1"
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter  # noqa: E402
+from metrics import MetricsMiddleware  # noqa: E402
+
+ROUNDS = 7
+BODY = {"message": "what is normalization in dbms"}
+
+
+def build_stacks():
+    """(instrumented, bare) ASGI apps sharing the same routes and state"""
+    instrumented = main.app.build_middleware_stack()
+    main.app.user_middleware = [m for m in main.app.user_middleware if m.cls is not MetricsMiddleware]
+    bare = main.app.build_middleware_stack()
+    return instrumented, bare
+
+
+async def per_request_us(client: httpx.AsyncClient, case: str, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        if case == "health":
+            await client.get("/")
+        else:
+            await client.post("/api/chat", json=BODY)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def run(requests: int, budget_us: float) -> int:
+    main.scheduler = None
+    instrumented, bare = build_stacks()
+    clients = {
+        "on": httpx.AsyncClient(transport=httpx.ASGITransport(app=instrumented), base_url="http://bench"),
+        "off": httpx.AsyncClient(transport=httpx.ASGITransport(app=bare), base_url="http://bench"),
+    }
+    await clients["off"].post("/api/chat", json=BODY)  # fills the response cache
+
+    worst = 0.0
+    for case in ("health", "chat"):
+        best = {"on": float("inf"), "off": float("inf")}
+        for _ in range(ROUNDS):
+            for mode, client in clients.items():
+                best[mode] = min(best[mode], await per_request_us(client, case, requests))
+        overhead = best["on"] - best["off"]
+        worst = max(worst, overhead)
+        print(f"{case:<7} off={best['off']:8.1f} us  on={best['on']:8.1f} us  overhead={overhead:6.1f} us/request")
+
+    for client in clients.values():
+        await client.aclose()
+    await main.shutdown()
+    print(f"budget {budget_us:.0f} us/request: {'ok' if worst <= budget_us else 'EXCEEDED'}")
+    return 0 if worst <= budget_us else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--budget-us", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with MockOpenRouter() as mock:
+        main.OPENROUTER_API_URL = mock.url
+        code = asyncio.run(run(args.requests, args.budget_us))
+    sys.exit(code)
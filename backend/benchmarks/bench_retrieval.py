@@ -0,0 +1,130 @@
+"""
+Syllabus knowledge base: index startup, retrieval throughput and how often a question
+is answered locally instead of upstream.
+
+  build   tokenize the corpus and write the index (first start, or corpus changed)
+  load    map the saved index (every later start and every forked worker)
+  search  BM25 top-k over QUESTIONS, per query
+  direct  share of QUESTIONS answered from the glossary / interview Q&A
+  check   RELEVANT questions retrieve their passage, UNRELATED ones retrieve nothing
+          (exits non-zero otherwise)
+
+Usage (from backend/):
+    python -m benchmarks.bench_retrieval --repeat 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from knowledge import KnowledgeBase, format_passages
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge_base.json")
+
+QUESTIONS = [
+    "what is normalization in dbms",
+    "CSE semester 4 subjects",
+    "ECE semester 5 syllabus",
+    "explain deadlock in operating systems",
+    "important topics in computer networks",
+    "which textbooks should I refer for data structures",
+    "What's docker?",
+    "Define API",
+    "firewalls",
+    "what is kubernetes",
+    "Tell me about yourself",
+    "why should we hire you",
+    "what are your strengths and weaknesses",
+    "difference between tcp and udp",
+    "what subjects are in AIDS semester 3",
+    "cyber security semester 6 focus",
+    "how to prepare for placement interviews",
+    "hi machi",
+    "write a python function to reverse a linked list",
+    "draw a circuit diagram of a full wave rectifier",
+]
+
+# Question -> title fragment of a passage that must be among its top-k hits
+RELEVANT = {
+    "what is normalization in dbms": "Normalization",
+    "explain normalization in detail": "Normalization",
+    "CSE semester 4 subjects": "CSE Semester 4",
+    "ECE semester 5 syllabus": "ECE Semester 5",
+    "what subjects are in AIDS semester 3": "AIDS Semester 3",
+    "cyber security semester 6 focus": "CYBER Semester 6",
+    "difference between tcp and udp": "Computer Networks",
+    "what are your strengths and weaknesses": "strength",
+}
+
+# Answer-shape phrasing and off-syllabus small talk: nothing in the corpus is about these
+UNRELATED = [
+    "explain in detail",
+    "tell me in detail with an example",
+    "describe it briefly with a simple example",
+    "hi machi",
+]
+
+
+def check_relevance(kb: KnowledgeBase, top_k: int, min_score: float) -> bool:
+    """Whether every RELEVANT question finds its passage and no UNRELATED one finds any"""
+    ok = True
+    for question, fragment in RELEVANT.items():
+        titles = [hit.passage.title for hit in kb.search(question, top_k, min_score)]
+        if not any(fragment.lower() in title.lower() for title in titles):
+            print(f"  FAILED  {question!r} missed {fragment!r}: {titles}")
+            ok = False
+    for question in UNRELATED:
+        hits = kb.search(question, top_k, min_score)
+        if hits:
+            print(f"  FAILED  {question!r} matched {[(hit.passage.title, round(hit.score, 2)) for hit in hits]}")
+            ok = False
+    print(f"check   {len(RELEVANT)} relevant, {len(UNRELATED)} unrelated: {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--min-score", type=float, default=4.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, "knowledge_base.index")
+        start = time.perf_counter()
+        kb = KnowledgeBase.open(CORPUS, index_path)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        kb = KnowledgeBase.open(CORPUS, index_path)
+        load_ms = (time.perf_counter() - start) * 1000
+        size = os.path.getsize(index_path)
+
+        stats = kb.stats()
+        print(f"corpus  {stats['passages']} passages, {stats['terms']} terms, index {size / 1024:.1f} KiB")
+        print(f"build   {build_ms:8.2f} ms")
+        print(f"load    {load_ms:8.2f} ms  (mmap)")
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for question in QUESTIONS:
+                format_passages(kb.search(question, args.top_k, args.min_score))
+        elapsed = time.perf_counter() - start
+        queries = args.repeat * len(QUESTIONS)
+        print(f"search  {queries / elapsed:8.0f} queries/s  ({elapsed / queries * 1e6:.1f} us/query)")
+
+        direct = 0
+        for question in QUESTIONS:
+            answer = kb.direct_answer(question)
+            hits = kb.search(question, args.top_k, args.min_score)
+            direct += answer is not None
+            label = f"direct:{answer.source}" if answer else f"{len(hits)} passages"
+            print(f"  {question[:48]:<48} {label}")
+        print(f"direct  {direct}/{len(QUESTIONS)} answered without an upstream call")
+
+        if not check_relevance(kb, args.top_k, args.min_score):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
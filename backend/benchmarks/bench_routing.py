@@ -0,0 +1,190 @@
+"""
+Routing throughput: legacy regex + substring scans vs the single-pass Router.
+Also checks both make the same decisions, except where the legacy substring
+checks were wrong (listed in LEGACY_BUGS). The Router is built without length
+models, as the legacy code had none (ADAPTIVE_ROUTING is bench_adaptive's subject).
+
+Usage (from backend/):
+    python -m benchmarks.bench_routing --repeat 2000
+"""
+
+import argparse
+import os
+import re
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+from main import IMAGE_MODELS, MODEL_CATALOG, ROUTE_MODELS  # noqa: E402
+from routing import Router  # noqa: E402
+
+CORPUS = [
+    "hi machi",
+    "vanakkam anna, how are you?",
+    "thanks da",
+    "explain deadlock in operating systems with an example",
+    "what is normalization in dbms and why do we need it",
+    "write a python function to reverse a linked list",
+    "debug this java error: NullPointerException at line 12",
+    "how does useState work in react components",
+    "solve the equation 2x + 3 = 7 step by step",
+    "find the derivative of x^2 sin x",
+    "calculate my cgpa for semester 3",
+    "draw a circuit diagram of a full wave rectifier",
+    "generate an image of a futuristic chennai skyline",
+    "create a realistic portrait of a robot",
+    "show me an anime style picture of a cat studying",
+    "make a flowchart for the bubble sort algorithm",
+    "draw a dreamy fantasy castle",
+    "sdxl picture of a tamil temple at sunset",
+    "tell me the important topics for data structures unit 2 this semester",
+    "list the two mark questions for computer networks",
+    "what are the placement tips for TCS and Infosys interviews",
+    "I am feeling stressed before my exams, give me some motivation please",
+    "recommend some good anime to watch during holidays",
+    "what is the exam pattern for anna university R2021 regulation",
+    "give me a study plan for the next two weeks before semester exams",
+    "describe the process of photosynthesis in detail",
+    "write notes on the OSI model layers",
+    "compare tcp and udp protocols in a table",
+    "what is the difference between process and thread",
+    "c++ program to find factorial",
+    "visualize the probability distribution of dice rolls",
+    "render a hyper realistic photo of a human face",
+    "explain the steps to implement dijkstra algorithm",
+    "which textbooks should I refer for signals and systems this semester",
+    "this semester is very hard for me, any tips on time management",
+    "okay bye see you tomorrow",
+    "nandri anna",
+    "please elaborate on virtual memory and paging",
+    "give examples of polymorphism in object oriented systems",
+    "is there any scholarship for first graduate students in tamil nadu",
+]
+
+# Messages where the legacy substring checks fired inside other words
+# ("hi" in "this"/"which", "how" in "show", "photo" in "photosynthesis", ...) or missed "c++"
+LEGACY_BUGS = {
+    "tell me the important topics for data structures unit 2 this semester",
+    "debug this java error: NullPointerException at line 12",
+    "which textbooks should I refer for signals and systems this semester",
+    "this semester is very hard for me, any tips on time management",
+    "describe the process of photosynthesis in detail",
+    "c++ program to find factorial",
+    "give examples of polymorphism in object oriented systems",
+    "show me an anime style picture of a cat studying",
+    "is there any scholarship for first graduate students in tamil nadu",
+}
+
+# ----------------------------------------------------------------------------
+# Legacy routing, copied from main.py before the Router was introduced
+# ----------------------------------------------------------------------------
+
+CODE_PATTERN = re.compile(
+    r'\b(code|coding|function|class|debug|error|bug|fix|algorithm|compile|syntax|'
+    r'javascript|python|java|c\+\+|typescript|html|css|react|node|sql|api|loop|'
+    r'array|variable|method|import|export|const|let|var|async|await|promise|'
+    r'callback|component|hook|useState|useEffect|npm|yarn|git|github|programming|'
+    r'developer|script|snippet)\b', re.IGNORECASE
+)
+MATH_PATTERN = re.compile(
+    r'\b(calculate|solve|equation|formula|math|algebra|calculus|statistics|'
+    r'probability|derivative|integral|proof|theorem|number|percentage|fraction|'
+    r'decimal|geometry|trigonometry|logarithm|exponent|matrix|vector|graph|plot)\b',
+    re.IGNORECASE
+)
+IMAGE_PATTERN = re.compile(
+    r'\b(draw|generate|create|show me|visualize|picture|image|photo|diagram|'
+    r'sketch|illustration|render|design|art|artwork|portrait|landscape|anime|'
+    r'cartoon|realistic|fantasy|sci-fi|generate an image|create an image|'
+    r'make an image|draw me)\b', re.IGNORECASE
+)
+
+
+def legacy_model(message):
+    if CODE_PATTERN.search(message):
+        return MODEL_CATALOG["coding"]["qwen"]
+    if MATH_PATTERN.search(message):
+        return MODEL_CATALOG["reasoning"]["deepseek_r1"]
+    if IMAGE_PATTERN.search(message):
+        return "IMAGE_GENERATION"
+    return MODEL_CATALOG["language"]["primary"]
+
+
+def legacy_length(message):
+    word_count = len(message.split())
+    is_simple = any(g in message.lower() for g in ['hi', 'hello', 'hey', 'vanakkam', 'thanks', 'ok', 'bye', 'nandri'])
+    needs_detail = any(k in message.lower() for k in ['explain', 'describe', 'how', 'why', 'what is', 'elaborate', 'steps', 'process'])
+    is_code_request = any(k in message.lower() for k in ['code', 'program', 'implement', 'write', 'function', 'script'])
+    if is_simple or word_count < 5:
+        return "SHORT"
+    if needs_detail or is_code_request:
+        return "DETAILED"
+    return "MODERATE"
+
+
+def legacy_image_model(prompt):
+    prompt_lower = prompt.lower()
+    if any(word in prompt_lower for word in ['sdxl', 'stable diffusion']):
+        return IMAGE_MODELS["sdxl"]
+    elif any(word in prompt_lower for word in ['realistic', 'photo', 'portrait', 'person', 'face', 'human']):
+        return IMAGE_MODELS["realistic"]
+    elif any(word in prompt_lower for word in ['juggernaut', 'detailed', 'hyper']):
+        return IMAGE_MODELS["juggernaut"]
+    elif any(word in prompt_lower for word in ['dream', 'fantasy', 'surreal', 'artistic', 'abstract', 'creative']):
+        return IMAGE_MODELS["dreamshaper"]
+    return IMAGE_MODELS["flux"]
+
+
+def legacy_style(prompt):
+    prompt_lower = prompt.lower()
+    if any(word in prompt_lower for word in ['circuit', 'schematic', 'wiring', 'pcb']):
+        return "circuit"
+    elif any(word in prompt_lower for word in ['flowchart', 'uml', 'process', 'algorithm']):
+        return "diagram"
+    elif any(word in prompt_lower for word in ['anime', 'manga', 'ghibli']):
+        return "anime"
+    elif any(word in prompt_lower for word in ['realistic', 'photo', 'portrait']):
+        return "photo"
+    elif any(word in prompt_lower for word in ['dream', 'fantasy', 'surreal']):
+        return "dream"
+    return "digital_art"
+
+
+def legacy_route(message):
+    return legacy_model(message), legacy_image_model(message), legacy_style(message), legacy_length(message)
+
+
+router = Router(ROUTE_MODELS, IMAGE_MODELS)
+
+
+def router_route(message):
+    route = router.route(message)
+    return route.model_id, route.image_model, route.style, route.length
+
+
+def throughput(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in CORPUS:
+            fn(message)
+    return repeat * len(CORPUS) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    mismatches = [m for m in CORPUS if legacy_route(m) != router_route(m)]
+    for message in mismatches:
+        tag = "legacy bug" if message in LEGACY_BUGS else "REGRESSION"
+        print(f"[{tag}] {message!r}\n    legacy={legacy_route(message)}\n    router={router_route(message)}")
+    regressions = [m for m in mismatches if m not in LEGACY_BUGS]
+    print(f"\n{len(CORPUS) - len(mismatches)}/{len(CORPUS)} identical, "
+          f"{len(mismatches) - len(regressions)} legacy bugs fixed, {len(regressions)} regressions")
+
+    legacy_rps = throughput(legacy_route, args.repeat)
+    router_rps = throughput(router_route, args.repeat)
+    print(f"legacy  {legacy_rps:12,.0f} routes/sec")
+    print(f"router  {router_rps:12,.0f} routes/sec  ({router_rps / legacy_rps:.2f}x)")
+    raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,75 @@
+"""
+Mixed burst of short greetings and detailed questions through a tight upstream scheduler.
+Greetings should wait less than detailed requests, and once the queue is full the
+overflow gets 503 + Retry-After instead of piling up.
+
+Usage (from backend/):
+    python -m benchmarks.bench_scheduler --burst 60 --concurrency 4 --queue 40
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter  # noqa: E402
+from scheduler import UpstreamScheduler  # noqa: E402
+
+SHORT = "hi anna {i}"
+DETAILED = "explain how a b-tree index keeps lookups logarithmic, with steps and examples #{i}"
+
+
+async def run(burst: int, concurrency: int, queue: int, rate: float) -> None:
+    main.response_cache = None
+    main.semantic_cache = None
+    main.inflight = None
+    main.scheduler = UpstreamScheduler(rate=rate, burst=concurrency, max_concurrency=concurrency, max_queue=queue)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+
+        async def send(kind: str, i: int):
+            # Detailed requests arrive first, so greetings only win through priority
+            if kind == "short":
+                await asyncio.sleep(0.01)
+            message = (SHORT if kind == "short" else DETAILED).format(i=i)
+            start = time.perf_counter()
+            response = await client.post("/api/chat", json={"message": message})
+            return kind, response, time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            send("short" if i % 2 else "detailed", i) for i in range(burst)
+        ])
+        elapsed = time.perf_counter() - start
+
+    for kind in ("short", "detailed"):
+        ok = [t for k, r, t in results if k == kind and r.status_code == 200]
+        rejected = [r for k, r, _ in results if k == kind and r.status_code == 503]
+        retry = {r.headers.get("retry-after") for r in rejected}
+        p50 = f"{statistics.median(ok) * 1000:7.1f} ms" if ok else "      -"
+        print(f"{kind:<9} ok={len(ok):3d} p50={p50} rejected_503={len(rejected):3d} retry_after={sorted(retry)}")
+
+    stats = main.scheduler.stats()
+    print(f"wall={elapsed:.2f} s queue_depth_now={stats['queueDepth']} wait_ms={stats['waitMs']}")
+    await main.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=40)
+    parser.add_argument("--rate", type=float, default=20.0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with MockOpenRouter(latency=args.latency) as mock:
+        main.OPENROUTER_API_URL = mock.url
+        asyncio.run(run(args.burst, args.concurrency, args.queue, args.rate))
@@ -0,0 +1,99 @@
+"""
+Semantic cache lookup latency at 10k / 100k / 1M cached entries, after a check that
+scopes stay apart when eviction empties a partition mid-store (exits 1 on failure).
+
+Usage (from backend/):
+    python -m benchmarks.bench_semantic_cache --sizes 10000 100000 1000000
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from semantic_cache import HashingVectorizer, SemanticCache
+
+# Every query is scanned against the whole cache: same model, no scope, no numbers
+PARTITION = SemanticCache.partition("bench/model", "", "")
+QUERIES = [
+    "explain deadlock in operating systems",
+    "what is normalization in dbms",
+    "difference between tcp and udp",
+    "two mark questions for data structures unit two",
+    "what is a hash map",
+    "explain paging and segmentation",
+    "what is polymorphism in java",
+    "define cgpa calculation anna university",
+]
+
+
+def random_unit_vectors(count: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def check_partitions() -> bool:
+    """A store into a full cache whose victim is that partition's only row keeps scopes apart"""
+    cache = SemanticCache({"language": 0.9}, max_entries=2)
+    question = "explain deadlock in operating systems"
+    cache.store("bench/model", "language", question, "ALICE-ANSWER", scope="alice")
+    cache.store("bench/model", "language", "what is a hash map", "OTHER-ANSWER", scope="other")
+    # Full: the alice row is the least recently used, so this store evicts it
+    cache.store("bench/model", "language", "what is normalization in dbms", "ALICE-2", scope="alice")
+    cache.store("bench/model", "language", "what is polymorphism in java", "BOB-ANSWER", scope="bob")
+    leaked = cache.lookup("bench/model", "language", question, scope="bob")
+    kept = cache.lookup("bench/model", "language", "what is normalization in dbms", scope="alice")
+    ok = leaked is None and kept == "ALICE-2"
+    print(f"partition check: {'ok' if ok else 'FAILED'} (bob got {leaked!r}, alice got {kept!r})")
+    return ok
+
+
+def bench(size: int, dim: int, rounds: int, batch: int):
+    rng = np.random.default_rng(0)
+    cache = SemanticCache(
+        {"language": 0.9},
+        vectorizer=HashingVectorizer(dim),
+        max_entries=size,
+        max_bytes=1 << 40,
+    )
+
+    start = time.perf_counter()
+    chunk = 100_000
+    for offset in range(0, size, chunk):
+        count = min(chunk, size - offset)
+        cache.store_vectors(PARTITION, random_unit_vectors(count, dim, rng), ["answer"] * count)
+    fill_s = time.perf_counter() - start
+
+    single = []
+    for i in range(rounds):
+        start = time.perf_counter()
+        cache.lookup("bench/model", "language", QUERIES[i % len(QUERIES)])
+        single.append((time.perf_counter() - start) * 1000)
+
+    queries = cache.vectorizer.transform_batch((QUERIES * (batch // len(QUERIES) + 1))[:batch])
+    start = time.perf_counter()
+    cache.search(queries, PARTITION)
+    batched_ms = (time.perf_counter() - start) * 1000
+
+    cuts = statistics.quantiles(single, n=100)
+    print(
+        f"{size:>9,} entries  fill={fill_s:6.2f} s  mem={cache.memory_bytes / 2**20:7.1f} MiB  "
+        f"lookup p50={cuts[49]:7.2f} ms p99={cuts[98]:7.2f} ms  "
+        f"batch[{batch}]={batched_ms:7.2f} ms ({batched_ms / batch:.3f} ms/query)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+
+    if not check_partitions():
+        raise SystemExit(1)
+    for size in args.sizes:
+        bench(size, args.dim, args.rounds, args.batch)
@@ -0,0 +1,95 @@
+"""
+Prompt tokens per request for a long tutoring conversation: resending the whole history
+in the message text vs a server-side session (recent turns within the budget, older
+ones summarized). Token counts come from the mock OpenRouter's usage blocks; the
+summarizer runs on its own model (SUMMARY_MODEL) so its calls are counted separately.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sessions --turns 30
+"""
+
+import argparse
+import asyncio
+import os
+from typing import List, Tuple
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import MockOpenRouter  # noqa: E402
+from usage import UsageTracker  # noqa: E402
+
+# Not used for answers, so usage per model tells answers and summaries apart
+SUMMARY_MODEL = main.MODEL_CATALOG["language"]["mistral"]
+
+REPLY = ("**Normalization** organizes tables to remove redundancy. 1NF removes repeating groups, "
+         "2NF removes partial dependencies, 3NF removes transitive ones. 📝 Exam Tip: list the "
+         "functional dependencies first. புரியுதா? சந்தேகம் கேளு! ") * 4
+
+
+def question(turn: int) -> str:
+    return f"Follow-up {turn}: explain the next normal form with an example from a college database"
+
+
+def upstream_prompt_tokens() -> int:
+    """Prompt tokens of the answers only, leaving out the summarizer's calls"""
+    return sum(
+        totals["promptTokens"] for model, totals in main.usage_tracker.models.items()
+        if model != SUMMARY_MODEL
+    )
+
+
+def summary_usage() -> Tuple[int, int]:
+    """(calls, prompt tokens) of the summarizer"""
+    totals = main.usage_tracker.models.get(SUMMARY_MODEL, {})
+    return totals.get("requests", 0), totals.get("promptTokens", 0)
+
+
+async def conversation(client: httpx.AsyncClient, turns: int, session: bool) -> List[int]:
+    """Prompt tokens sent upstream for each turn"""
+    main.usage_tracker = UsageTracker()
+    session_id = (await client.post("/api/sessions")).json()["sessionId"]
+    transcript: List[str] = []
+    sent: List[int] = []
+    for turn in range(turns):
+        if session:
+            body = {"message": question(turn), "sessionId": session_id}
+        else:
+            body = {"message": "\n".join(transcript + [f"Student: {question(turn)}"])}
+        before = upstream_prompt_tokens()
+        response = await client.post("/api/chat", json=body)
+        response.raise_for_status()
+        sent.append(upstream_prompt_tokens() - before)
+        transcript += [f"Student: {question(turn)}", f"Murukku: {response.json()['text']}"]
+    return sent
+
+
+async def run(turns: int) -> None:
+    main.response_cache = None
+    main.semantic_cache = None
+    main.scheduler = None
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+        full = await conversation(client, turns, session=False)
+        session = await conversation(client, turns, session=True)
+        summary_calls, summary_tokens = summary_usage()
+    await main.shutdown()
+
+    print(f"{'turn':>5}{'full resend':>14}{'session':>10}")
+    for turn in range(0, turns, max(1, turns // 10)):
+        print(f"{turn + 1:>5}{full[turn]:>14}{session[turn]:>10}")
+    print(f"total {sum(full):>13}{sum(session):>10}  ({1 - sum(session) / sum(full):.0%} fewer prompt tokens)")
+    print(f"summarizer {summary_calls} calls, {summary_tokens} prompt tokens "
+          f"({1 - (sum(session) + summary_tokens) / sum(full):.0%} fewer including them)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    args = parser.parse_args()
+
+    with MockOpenRouter(reply=REPLY) as mock:
+        main.OPENROUTER_API_URL = mock.url
+        main.SESSION_SUMMARY_MODEL = SUMMARY_MODEL
+        asyncio.run(run(args.turns))
@@ -0,0 +1,173 @@
+"""
+Throughput of the production profile (gunicorn.conf.py) as the worker count grows.
+Each worker count gets a fresh gunicorn; load comes from --clients processes so the
+client side is not the bottleneck.
+
+  image   GET /api/generate-image   local work only (routing, prompt cleanup, JSON)
+  chat    POST /api/chat            unique questions through a mock OpenRouter with
+                                    --latency seconds per call; response cache off
+
+The mock runs in its own process; at high worker counts it can become the limit for
+chat, which shows up as flat scaling there but not for image.
+
+--shared-rate turns on the cross-worker rate limit (UPSTREAM_RATE_SHARED_PATH) with a
+budget too large to ever throttle, so the numbers show only what the shared SQLite
+bucket costs each chat request.
+
+Usage (from backend/):
+    python -m benchmarks.bench_workers --workers 1,2,4 --duration 10 [--shared-rate]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_mock(latency: float, ready) -> None:
+    """Child process: run the mock OpenRouter until terminated"""
+    sys.path.insert(0, BACKEND)
+    from benchmarks.mock_openrouter import MockOpenRouter
+
+    mock = MockOpenRouter(latency=latency).start()
+    ready.send(mock.url)
+    while True:
+        time.sleep(3600)
+
+
+def start_gunicorn(workers: int, port: int, mock_url: str, shared_rate: str = "") -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "OPENROUTER_API_KEY": "bench",
+        "OPENROUTER_API_URL": mock_url,
+        "PORT": str(port),
+        "WEB_CONCURRENCY": str(workers),
+        "RESPONSE_CACHE": "off",
+        "SEMANTIC_CACHE": "0",
+        "UPSTREAM_RATE_LIMIT": "1000000" if shared_rate else "0",
+        "UPSTREAM_RATE_BURST": "1000000",
+        "UPSTREAM_RATE_SHARED_PATH": shared_rate,
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        cwd=BACKEND, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"gunicorn with {workers} workers did not start")
+
+
+async def drive(base_url: str, case: str, duration: float, concurrency: int,
+                client_id: int) -> Tuple[int, int, List[float]]:
+    """(ok, failed, seconds per ok request) for one client process"""
+    ok = failed = 0
+    latencies: List[float] = []
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+
+        async def worker(worker_id: int):
+            nonlocal ok, failed
+            i = 0
+            while time.monotonic() < deadline:
+                i += 1
+                start = time.perf_counter()
+                if case == "image":
+                    response = await client.get("/api/generate-image", params={"prompt": f"circuit of a full adder {i}"})
+                else:
+                    question = f"What is normalization in DBMS? ({client_id}-{worker_id}-{i})"
+                    response = await client.post("/api/chat", json={"message": question})
+                if response.status_code == 200:
+                    ok += 1
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    failed += 1
+
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    return ok, failed, latencies
+
+
+def client_process(args) -> Tuple[int, int, List[float]]:
+    return asyncio.run(drive(*args))
+
+
+def measure(base_url: str, case: str, duration: float, clients: int, concurrency: int) -> Tuple[float, int, List[float]]:
+    """(ok requests/s, failed, p50 and p99 seconds)"""
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        start = time.perf_counter()
+        results: List[Tuple[int, int, List[float]]] = pool.map(
+            client_process, [(base_url, case, duration, concurrency, c) for c in range(clients)]
+        )
+        elapsed = time.perf_counter() - start
+    ok = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    cuts = statistics.quantiles([s for r in results for s in r[2]], n=100)
+    return ok / elapsed, failed, [cuts[49], cuts[98]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--concurrency", type=int, default=32, help="in-flight requests per client process")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--shared-rate", action="store_true", help="rate-limit through the shared SQLite bucket")
+    args = parser.parse_args()
+    shared_dir = tempfile.TemporaryDirectory()
+
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    mock = ctx.Process(target=serve_mock, args=(args.latency, child), daemon=True)
+    mock.start()
+    mock_url = parent.recv()
+
+    baseline = {}
+    try:
+        for workers in (int(w) for w in args.workers.split(",")):
+            port = free_port()
+            shared_rate = os.path.join(shared_dir.name, f"rate-{workers}.sqlite3") if args.shared_rate else ""
+            server = start_gunicorn(workers, port, mock_url, shared_rate)
+            try:
+                for case in ("image", "chat"):
+                    rps, failed, (p50, p99) = measure(
+                        f"http://127.0.0.1:{port}", case, args.duration, args.clients, args.concurrency
+                    )
+                    baseline.setdefault(case, rps)
+                    print(f"workers={workers:<3} {case:<6} {rps:9.1f} req/s  "
+                          f"x{rps / baseline[case]:4.2f}  p50={p50 * 1000:7.1f} ms  p99={p99 * 1000:7.1f} ms  "
+                          f"failed={failed}")
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=60)
+    finally:
+        mock.terminate()
+        shared_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Load test of the whole API over real HTTP against a local mock OpenRouter and Pollinations.
+A weighted mix of student traffic hits /api/chat (plain, streamed and with an attached
+image), /api/vision, /api/code, /api/reasoning and /api/generate-image from --concurrency
+clients; --repeat of the questions are asked again, as students in one class do.
+
+Reports requests/sec, latency percentiles and status codes per endpoint, upstream calls
+per model and status, Pollinations fetches, and process memory (app + mock + clients).
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --requests 2000 --concurrency 50 --latency 0.4 --distribution lognormal
+    python -m benchmarks.loadtest --rate-limit-rate 0.05 --error-rate 0.02 --no-cache
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import main  # noqa: E402
+from benchmarks.mock_openrouter import LATENCY_DISTRIBUTIONS, MockOpenRouter, PIXEL_PNG, serve_app  # noqa: E402
+
+PIXEL_BASE64 = base64.b64encode(PIXEL_PNG).decode()
+
+CONTEXTS = [
+    {"name": "Priya", "semester": "3", "department": "CSE"},
+    {"name": "Arun", "semester": "5", "department": "ECE"},
+    {"name": "Kavya", "semester": "1", "department": "IT", "learningStyle": "Text"},
+    {"name": "Vikram", "semester": "7", "department": "EEE", "careerGoal": "Higher Studies"},
+]
+
+QUESTIONS = {
+    "chat": [
+        "What is normalization in DBMS?",
+        "Explain the OSI model in detail",
+        "Define a binary search tree, two marks",
+        "Difference between TCP and UDP",
+        "what is deadlock in operating systems",
+        "Explain Kirchhoff's laws with an example",
+        "Tell me about virtual memory and paging",
+        "Summarize the working of a transistor as a switch",
+    ],
+    "code": [
+        "Write bubble sort in C",
+        "Python program to reverse a linked list",
+        "Implement a stack using arrays in Java",
+        "Write SQL to find the second highest salary",
+    ],
+    "reasoning": [
+        "Solve the recurrence T(n) = 2T(n/2) + n",
+        "Prove that the square root of 2 is irrational",
+        "Find the time complexity of merge sort step by step",
+    ],
+    "vision": [
+        "Explain what this circuit does",
+        "Solve the question in this photo",
+    ],
+    "image": [
+        "draw a diagram of the TCP three way handshake",
+        "generate an image of a CPU pipeline",
+        "circuit diagram of a full adder",
+        "realistic photo of a futuristic campus library",
+    ],
+}
+
+# (scenario, weight)
+MIX = [
+    ("chat", 35),
+    ("chat-stream", 10),
+    ("chat-image", 5),
+    ("vision", 10),
+    ("code", 15),
+    ("reasoning", 10),
+    ("generate-image", 15),
+]
+
+
+def proc_status(field: str) -> float:
+    """VmRSS / VmHWM of this process in MB"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def question(rng: random.Random, pool: str, repeat: float, counter: List[int]) -> str:
+    """A question from the pool; unique unless it is one of the repeats"""
+    text = rng.choice(QUESTIONS[pool])
+    if rng.random() < repeat:
+        return text
+    counter[0] += 1
+    return f"{text} (student {counter[0]})"
+
+
+def build_requests(count: int, repeat: float, seed: int) -> List[Tuple[str, str, str, dict]]:
+    """(scenario, method, path, httpx kwargs) for every request of the run"""
+    rng = random.Random(seed)
+    counter = [0]
+    names, weights = zip(*MIX)
+    plan = []
+    for scenario in rng.choices(names, weights, k=count):
+        context = rng.choice(CONTEXTS)
+        if scenario == "chat":
+            body = {"message": question(rng, "chat", repeat, counter), "context": context}
+            plan.append((scenario, "POST", "/api/chat", {"json": body}))
+        elif scenario == "chat-stream":
+            body = {"message": question(rng, "chat", repeat, counter), "context": context}
+            plan.append((scenario, "POST", "/api/chat/stream", {"json": body}))
+        elif scenario == "chat-image":
+            body = {"message": question(rng, "vision", repeat, counter), "context": context,
+                    "attachedImage": PIXEL_BASE64}
+            plan.append((scenario, "POST", "/api/chat", {"json": body}))
+        elif scenario == "vision":
+            body = {"prompt": question(rng, "vision", repeat, counter), "image": PIXEL_BASE64,
+                    "mimeType": "image/png"}
+            plan.append((scenario, "POST", "/api/vision", {"json": body}))
+        elif scenario in ("code", "reasoning"):
+            body = {"message": question(rng, scenario, repeat, counter), "context": context}
+            plan.append((scenario, "POST", f"/api/{scenario}", {"json": body}))
+        else:
+            params = {"prompt": question(rng, "image", repeat, counter)}
+            plan.append((scenario, "GET", "/api/generate-image", {"params": params}))
+    return plan
+
+
+async def send(client: httpx.AsyncClient, images: httpx.AsyncClient, scenario: str, method: str,
+               path: str, kwargs: dict, fetch_images: bool) -> int:
+    """Status of one request, with streamed bodies read to the end"""
+    async with client.stream(method, path, **kwargs) as response:
+        await response.aread()
+    if fetch_images and scenario == "generate-image" and response.status_code == 200:
+        # What the browser does next with the URL
+        await (await images.get(response.json()["url"])).aread()
+    return response.status_code
+
+
+async def run(base_url: str, plan: List[Tuple[str, str, str, dict]], concurrency: int,
+              fetch_images: bool) -> Tuple[Dict[str, List[Tuple[int, float]]], float]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+    results: Dict[str, List[Tuple[int, float]]] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client, \
+            httpx.AsyncClient(timeout=60, limits=limits) as images:
+
+        async def worker():
+            while not queue.empty():
+                scenario, method, path, kwargs = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    status = await send(client, images, scenario, method, path, kwargs, fetch_images)
+                except httpx.HTTPError:
+                    status = 0
+                results.setdefault(scenario, []).append((status, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def report(results: Dict[str, List[Tuple[int, float]]], elapsed: float, mock: MockOpenRouter) -> None:
+    total = sum(len(samples) for samples in results.values())
+    print(f"{total} requests in {elapsed:.2f} s = {total / elapsed:.1f} req/s\n")
+    print(f"{'scenario':<16}{'count':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}  status")
+    everything = []
+    for scenario, _ in MIX:
+        samples = results.get(scenario)
+        if not samples:
+            continue
+        latencies = sorted(latency for _, latency in samples)
+        everything.extend(latencies)
+        statuses: Dict[int, int] = {}
+        for status, _ in samples:
+            statuses[status] = statuses.get(status, 0) + 1
+        print(
+            f"{scenario:<16}{len(samples):>7}{len(samples) / elapsed:>8.1f}"
+            f"{statistics.median(latencies) * 1000:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}"
+            f"{percentile(latencies, 0.99) * 1000:>9.1f}{latencies[-1] * 1000:>9.1f}  {dict(sorted(statuses.items()))}"
+        )
+    everything.sort()
+    print(
+        f"{'all':<16}{total:>7}{total / elapsed:>8.1f}{statistics.median(everything) * 1000:>9.1f}"
+        f"{percentile(everything, 0.95) * 1000:>9.1f}{percentile(everything, 0.99) * 1000:>9.1f}"
+        f"{everything[-1] * 1000:>9.1f}"
+    )
+
+    print(f"\nupstream calls {mock.calls} ({mock.calls / total:.2f} per request), "
+          f"by status {dict(sorted(mock.status_counts.items()))}, cancelled {mock.requests_cancelled}")
+    for model, calls in sorted(mock.model_calls.items(), key=lambda item: -item[1]):
+        print(f"  {calls:>6}  {model}")
+    print(f"pollinations fetches {mock.image_calls}")
+    if main.response_cache is not None:
+        print(f"response cache hits={main.response_cache.hits} misses={main.response_cache.misses}")
+    print(f"memory rss={proc_status('VmRSS'):.0f} MB peak={proc_status('VmHWM'):.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.3, help="mean upstream latency in seconds")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--jitter", type=float, default=0.5, help="lognormal sigma")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="seconds between streamed words")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls answering 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answering 429")
+    parser.add_argument("--image-latency", type=float, default=0.05)
+    parser.add_argument("--repeat", type=float, default=0.3, help="fraction of questions asked before")
+    parser.add_argument("--fetch-images", action="store_true", help="GET each generated image URL")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response and semantic caches")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.no_cache:
+        main.response_cache = None
+        main.semantic_cache = None
+    plan = build_requests(args.requests, args.repeat, args.seed)
+    with MockOpenRouter(
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        distribution=args.distribution,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        image_latency=args.image_latency,
+        seed=args.seed,
+    ) as mock:
+        main.OPENROUTER_API_URL = mock.url
+        main.POLLINATIONS_IMAGE_URL = mock.image_url
+        server, base_url = serve_app(main.app)
+        try:
+            results, elapsed = asyncio.run(run(base_url, plan, args.concurrency, args.fetch_images))
+        finally:
+            server.should_exit = True
+        report(results, elapsed, mock)
@@ -0,0 +1,219 @@
+"""
+Local mock of the OpenRouter chat-completions API and the Pollinations image endpoint.
+Runs in a background thread so benchmarks never spend real API credits; serve_app runs
+the backend itself the same way for benchmarks that need real HTTP.
+"""
+
+import asyncio
+import base64
+import json
+import math
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# 1x1 PNG returned for every Pollinations prompt
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class MockOpenRouter:
+    """
+    OpenRouter stand-in that answers every completion after a mean latency drawn from
+    `distribution` (fixed, uniform 0..2x, exponential or lognormal with sigma `jitter`).
+    model_latency / model_status inject per-model slowness or error codes (e.g. 429);
+    error_rate / rate_limit_rate fail that fraction of all calls with 500 / 429.
+    Replies are cut to the request's max_tokens (~4 chars per token); token_latency adds
+    generation time per completion token on top of the first-token latency.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        reply: str = "Vanakkam machi! 🍘",
+        chunk_delay: float = 0.0,
+        model_latency: Optional[Dict[str, float]] = None,
+        model_status: Optional[Dict[str, int]] = None,
+        distribution: str = "fixed",
+        jitter: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        image_latency: float = 0.0,
+        token_latency: float = 0.0,
+        seed: int = 0,
+    ):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"distribution must be one of {LATENCY_DISTRIBUTIONS}")
+        self.latency = latency
+        self.reply = reply
+        self.chunk_delay = chunk_delay
+        self.model_latency = model_latency or {}
+        self.model_status = model_status or {}
+        self.distribution = distribution
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.image_latency = image_latency
+        self.token_latency = token_latency
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.model_calls: Dict[str, int] = {}
+        self.status_counts: Dict[int, int] = {}
+        self.image_calls = 0
+        self.max_tokens: Dict[int, int] = {}  # max_tokens sent -> calls
+        self.requests_cancelled = 0
+        self.streams_completed = 0
+        self.streams_cancelled = 0
+        self._last_prompt = {}
+        self.app = FastAPI()
+        self.app.post("/api/v1/chat/completions")(self.completions)
+        self.app.get("/prompt/{prompt:path}")(self.image)
+        self._server = None
+        self._thread = None
+
+    async def completions(self, request: Request):
+        self.calls += 1
+        payload = await request.json()
+        model = payload["model"]
+        self.model_calls[model] = self.model_calls.get(model, 0) + 1
+        max_tokens = payload.get("max_tokens", 0)
+        self.max_tokens[max_tokens] = self.max_tokens.get(max_tokens, 0) + 1
+        reply = self.reply[:max_tokens * 4] if max_tokens else self.reply
+        latency = self.sample_latency(self.model_latency.get(model, self.latency)) + len(reply) // 4 * self.token_latency
+        if latency and not await self.wait(request, latency):
+            self.requests_cancelled += 1
+            return JSONResponse({}, status_code=499)
+        status = self.model_status.get(model) or self.injected_status()
+        if status:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            headers = {"Retry-After": "1"} if status == 429 else None
+            return JSONResponse(
+                {"error": {"message": f"mock {status} for {model}"}}, status_code=status, headers=headers
+            )
+        self.status_counts[200] = self.status_counts.get(200, 0) + 1
+        if payload.get("stream"):
+            return StreamingResponse(self.stream(payload, reply), media_type="text/event-stream")
+        return {
+            "id": f"mock-{self.calls}",
+            "model": payload["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}}],
+            "usage": self.usage(payload, reply),
+        }
+
+    async def image(self, prompt: str):
+        """Pollinations stand-in: a tiny PNG for any prompt"""
+        self.image_calls += 1
+        if self.image_latency:
+            await asyncio.sleep(self.sample_latency(self.image_latency))
+        return Response(PIXEL_PNG, media_type="image/png")
+
+    def sample_latency(self, mean: float) -> float:
+        if not mean or self.distribution == "fixed":
+            return mean
+        if self.distribution == "uniform":
+            return self.random.uniform(0.0, 2 * mean)
+        if self.distribution == "exponential":
+            return self.random.expovariate(1 / mean)
+        # lognormal with the requested mean: mu = ln(mean) - sigma^2 / 2
+        return self.random.lognormvariate(math.log(mean) - self.jitter ** 2 / 2, self.jitter)
+
+    def injected_status(self) -> Optional[int]:
+        if not (self.error_rate or self.rate_limit_rate):
+            return None
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    @staticmethod
+    async def wait(request: Request, latency: float) -> bool:
+        """Sleep for the injected latency; False if the caller hung up first"""
+        deadline = time.monotonic() + latency
+        while time.monotonic() < deadline:
+            if await request.is_disconnected():
+                return False
+            await asyncio.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+        return True
+
+    def usage(self, payload: dict, reply: str) -> dict:
+        """Token counts (~4 chars per token) with provider-style prefix caching against the previous prompt"""
+        prompt = json.dumps(payload["messages"], ensure_ascii=False)
+        previous = self._last_prompt.get(payload["model"], "")
+        self._last_prompt[payload["model"]] = prompt
+        shared = 0
+        for a, b in zip(prompt, previous):
+            if a != b:
+                break
+            shared += 1
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(reply) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": shared // 4},
+        }
+
+    async def stream(self, payload: dict, reply: str):
+        try:
+            yield ": OPENROUTER PROCESSING\n\n"
+            for word in reply.split(" "):
+                if self.chunk_delay:
+                    await asyncio.sleep(self.chunk_delay)
+                chunk = {"model": payload["model"], "choices": [{"index": 0, "delta": {"content": word + " "}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield f"data: {json.dumps({'choices': [], 'usage': self.usage(payload, reply)})}\n\n"
+            yield "data: [DONE]\n\n"
+            self.streams_completed += 1
+        except asyncio.CancelledError:
+            self.streams_cancelled += 1
+            raise
+
+    @property
+    def url(self) -> str:
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/api/v1/chat/completions"
+
+    @property
+    def image_url(self) -> str:
+        """Base to use as POLLINATIONS_IMAGE_URL"""
+        return self.url.replace("/api/v1/chat/completions", "/prompt")
+
+    def start(self) -> "MockOpenRouter":
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=0, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join()
+
+    def __enter__(self) -> "MockOpenRouter":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve_app(app: Any) -> Tuple[uvicorn.Server, str]:
+    """Serve an ASGI app on a free local port in a background thread; (server, base URL)"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
@@ -0,0 +1,203 @@
+"""
+Response cache for OpenRouter completions
+Keyed on (model, rendered messages, temperature, max_tokens) with LRU + TTL eviction
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def make_cache_key(model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+    """Stable digest of everything that determines an upstream completion"""
+    # Runs of whitespace never change the answer, so "what is  a hash map " matches too
+    normalized = [
+        {**m, "content": " ".join(m["content"].split())} if isinstance(m["content"], str) else m
+        for m in messages
+    ]
+    raw = json.dumps(
+        [model, normalized, temperature, max_tokens],
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CacheBackend:
+    """
+    Storage interface for cached responses - implement get/set/clear/__len__.
+    A backend that does I/O sets blocking = True so async callers run it in a thread.
+    """
+
+    name = "base"
+    blocking = False
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU bounded by entry count and total text size, with per-entry TTL"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, tuple[float, str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, size)
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self.size_bytes -= size
+
+
+class SQLiteCache(CacheBackend):
+    """Local SQLite stand-in for a shared cache (survives restarts, shareable between processes)"""
+
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str = "response_cache.sqlite3", max_entries: int = 10000, ttl: float = 3600.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Per-process connection, opened on first use (a connection must not cross a fork)"""
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now)
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Cache front-end that counts hits and misses for any backend"""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()  # counters are bumped from worker threads for a blocking backend
+
+    @property
+    def blocking(self) -> bool:
+        return self.backend.blocking
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.backend.set(key, value)
+        with self._lock:
+            self.stores += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
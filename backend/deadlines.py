@@ -0,0 +1,131 @@
+"""
+Request deadlines and cancellation
+A request gets a deadline when it arrives. The deadline travels with it (a context
+variable), so every upstream call below it waits, times out and sizes max_tokens from
+what is left, and the work is cancelled once the deadline passes or the client leaves.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self, seconds: float):
+        super().__init__(status_code=504, detail=f"No answer within the {seconds:g}s request deadline")
+
+
+class ClientDisconnected(HTTPException):
+    """The client hung up; nobody reads this response (499, as nginx logs it)"""
+
+    def __init__(self):
+        super().__init__(status_code=499, detail="Client closed the request")
+
+
+class Deadline:
+    """Absolute time.monotonic() deadline; limit() can only bring it closer"""
+
+    __slots__ = ("seconds", "at")
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.at = time.monotonic() + seconds
+
+    def limit(self, seconds: float) -> None:
+        """Tighten to `seconds` from the start of the request (once its kind is known)"""
+        at = self.at - self.seconds + seconds
+        if at < self.at:
+            self.at, self.seconds = at, seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def limit_deadline(seconds: float) -> None:
+    """Tighten the current request's deadline (no-op outside a guarded request)"""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.limit(seconds)
+
+
+def fit_tokens(max_tokens: int, seconds: float, tokens_per_second: float, first_token_seconds: float,
+               step: int = 256) -> int:
+    """
+    max_tokens cut to what the model can generate in `seconds`, rounded down to `step`
+    (never below it, nor above max_tokens) so requests arriving together still share cache keys
+    """
+    fits = int((seconds - first_token_seconds) * tokens_per_second) // step * step
+    return min(max_tokens, max(step, fits))
+
+
+@asynccontextmanager
+async def within_deadline(deadline: Optional[Deadline] = None) -> AsyncIterator[None]:
+    """Cancel the block when the (current) deadline passes and raise DeadlineExceeded"""
+    deadline = deadline or current_deadline.get()
+    if deadline is None:
+        yield
+        return
+    if deadline.expired:
+        raise DeadlineExceeded(deadline.seconds)
+    try:
+        async with asyncio.timeout(deadline.remaining()):
+            yield
+    except TimeoutError:
+        raise DeadlineExceeded(deadline.seconds)
+
+
+class RequestGuard:
+    """
+    Runs request handlers as tasks under a deadline, polling the client connection while
+    they wait on upstream calls. Either event cancels the task, which releases its
+    scheduler slot and closes its upstream connection before the guard returns.
+    """
+
+    def __init__(self, poll_interval: float = 0.5):
+        self.poll_interval = poll_interval
+        self.deadline_exceeded = 0
+        self.disconnects = 0
+
+    async def run(self, work: Awaitable[T], deadline: Optional[Deadline], request: Optional[Request] = None) -> T:
+        token = current_deadline.set(deadline)
+        try:
+            # The task copies the context here, deadline included
+            task = asyncio.ensure_future(work)
+        finally:
+            current_deadline.reset(token)
+        try:
+            while True:
+                timeout = deadline.remaining() if deadline is not None else None
+                if request is not None:
+                    timeout = self.poll_interval if timeout is None else min(timeout, self.poll_interval)
+                done, _ = await asyncio.wait({task}, timeout=timeout)
+                if done:
+                    if isinstance(task.exception(), DeadlineExceeded):
+                        self.deadline_exceeded += 1
+                    return task.result()
+                if deadline is not None and deadline.expired:
+                    self.deadline_exceeded += 1
+                    raise DeadlineExceeded(deadline.seconds)
+                if request is not None and await request.is_disconnected():
+                    self.disconnects += 1
+                    raise ClientDisconnected()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"deadlineExceeded": self.deadline_exceeded, "disconnects": self.disconnects}
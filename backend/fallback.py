@@ -0,0 +1,191 @@
+"""
+Multi-model fallback and hedged requests
+Tracks rolling per-model latency/error stats and retries other models of the same category
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from deadlines import DeadlineExceeded
+from scheduler import SchedulerFull
+
+# Upstream answers worth trying another model for (rate limits, overload, gateway errors)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    # Out of time for the whole request, not just this model; or our own queue is full,
+    # where another model's attempt would only add to the load being shed
+    if isinstance(error, (DeadlineExceeded, SchedulerFull)):
+        return False
+    if isinstance(error, HTTPException):
+        return error.status_code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+class ModelStats:
+    """Rolling window of latencies and outcomes for one model"""
+
+    MIN_SAMPLES = 5
+
+    def __init__(self, window: int = 100):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.requests += 1
+
+    def record_error(self) -> None:
+        self.outcomes.append(False)
+        self.requests += 1
+        self.errors += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile over the window, or None until there are enough samples"""
+        if len(self.latencies) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.50), self.percentile(0.95)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "errorRate": round(self.error_rate, 4),
+            "p50Ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95Ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class ModelRouter:
+    """
+    Runs a completion against a model, falling back to the next model of its
+    MODEL_CATALOG category on 429/5xx/timeouts.
+
+    With hedging on, if the running request has not answered by that model's p95
+    latency a second request goes to the next model; the first success wins and
+    the other request is cancelled.
+    """
+
+    def __init__(
+        self,
+        catalog: Dict[str, Dict[str, str]],
+        hedging: bool = False,
+        hedge_default_delay: float = 8.0,
+        hedge_min_delay: float = 1.0,
+        max_attempts: int = 3,
+        window: int = 100,
+    ):
+        self.hedging = hedging
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.max_attempts = max_attempts
+        self.window = window
+        self.stats: Dict[str, ModelStats] = {}
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._siblings = {
+            model_id: list(models.values())
+            for models in catalog.values()
+            for model_id in models.values()
+        }
+
+    def candidates(self, model_id: str) -> List[str]:
+        """Requested model first, then the rest of its category in catalog order"""
+        siblings = [m for m in self._siblings.get(model_id, []) if m != model_id]
+        return [model_id, *siblings][:self.max_attempts]
+
+    def hedge_delay(self, model_id: str) -> float:
+        p95 = self.model_stats(model_id).percentile(0.95)
+        return max(self.hedge_min_delay, p95 if p95 is not None else self.hedge_default_delay)
+
+    def model_stats(self, model_id: str) -> ModelStats:
+        if model_id not in self.stats:
+            self.stats[model_id] = ModelStats(self.window)
+        return self.stats[model_id]
+
+    async def complete(self, model_id: str, send: Callable[[str], Awaitable[str]]) -> Tuple[str, str]:
+        """Return (text, model that produced it)"""
+        remaining = iter(self.candidates(model_id))
+        running: Dict[asyncio.Task, str] = {}
+        last_error: Optional[BaseException] = None
+        hedged = False
+
+        def launch() -> bool:
+            model = next(remaining, None)
+            if model is None:
+                return False
+            running[asyncio.ensure_future(self._attempt(model, send))] = model
+            return True
+
+        launch()
+        try:
+            while running:
+                # At most one hedge per call, and only while a single request is in flight
+                timeout = None
+                if self.hedging and not hedged and len(running) == 1:
+                    timeout = self.hedge_delay(next(iter(running.values())))
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Slower than this model's usual p95 - race the next model
+                    hedged = True
+                    if launch():
+                        self.hedges += 1
+                    continue
+
+                for task in done:
+                    model = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if hedged and model != model_id:
+                            self.hedge_wins += 1
+                        return task.result(), model
+                    if not is_retryable(error):
+                        raise error
+                    last_error = error
+
+                if not running and launch():
+                    self.fallbacks += 1
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def _attempt(self, model: str, send: Callable[[str], Awaitable[str]]) -> str:
+        stats = self.model_stats(model)
+        start = time.perf_counter()
+        try:
+            result = await send(model)
+        except (asyncio.CancelledError, SchedulerFull):
+            # Never reached the model
+            raise
+        except Exception:
+            stats.record_error()
+            raise
+        stats.record_success(time.perf_counter() - start)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "hedging": self.hedging,
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedgeWins": self.hedge_wins,
+            "models": {model: stats.snapshot() for model, stats in self.stats.items()},
+        }
@@ -0,0 +1,51 @@
+"""
+JSON encoding for upstream payloads and API responses
+Uses orjson when it is installed, stdlib json otherwise (same compact UTF-8 output)
+"""
+
+import importlib.util
+import json
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse
+
+# orjson is optional - a C/Rust codec that returns bytes directly, several times faster
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+
+
+def stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def stdlib_loads(data: bytes | str) -> Any:
+    return json.loads(data)
+
+
+if HAS_ORJSON:
+    import orjson
+
+    def orjson_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    dumps: Callable[[Any], bytes] = orjson_dumps
+    loads: Callable[[bytes | str], Any] = orjson.loads
+else:
+    dumps = stdlib_dumps
+    loads = stdlib_loads
+
+
+def use_stdlib() -> None:
+    """Force the stdlib codec (FAST_JSON=0 or benchmarking the baseline)"""
+    global dumps, loads
+    dumps, loads = stdlib_dumps, stdlib_loads
+
+
+def codec_name() -> str:
+    return "orjson" if dumps is not stdlib_dumps else "json"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the active codec"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
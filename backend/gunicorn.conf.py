@@ -0,0 +1,43 @@
+"""
+Production server profile: gunicorn managing uvicorn workers
+    gunicorn main:app -c gunicorn.conf.py
+
+The app is imported once in the master (preload_app) so routing regexes, prompt
+templates and the model catalog are built before fork and shared copy-on-write.
+Sockets, the upstream HTTP client and SQLite connections are opened per worker.
+With more than one worker the response cache, upstream rate limits and conversation
+sessions default to SQLite files so every worker sees the same state.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+# .env first, so the shared-state defaults below never override it
+load_dotenv()
+
+
+def default_workers() -> int:
+    """One worker per CPU this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY") or default_workers())
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Streams and hedged upstream calls can legitimately run for minutes
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Heartbeat files on tmpfs; a disk-backed /tmp can stall workers under I/O load
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+accesslog = "-" if os.getenv("GUNICORN_ACCESS_LOG", "0") == "1" else None
+
+if workers > 1:
+    os.environ.setdefault("RESPONSE_CACHE", "sqlite")
+    os.environ.setdefault("UPSTREAM_RATE_SHARED_PATH", "upstream_rate.sqlite3")
+    os.environ.setdefault("SESSION_STORE_PATH", "sessions.sqlite3")
@@ -0,0 +1,206 @@
+"""
+Pre-warmed cache for generated images
+Fetches Pollinations renders in the background with a bounded worker pool and keeps the
+bytes in a size-capped LRU, so a repeat prompt is served straight from our own endpoint
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+Image = Tuple[bytes, str]  # (body, content type)
+
+
+def image_key(url: str, secret: bytes) -> str:
+    """
+    Id for a source URL, used in /api/images/{key}: the URL itself plus an HMAC, so any
+    worker (or a restarted process with the same secret) can map the key back without
+    shared state, and clients cannot make us fetch URLs we did not generate
+    """
+    encoded = base64.urlsafe_b64encode(url.encode("utf-8")).rstrip(b"=").decode("ascii")
+    signature = hmac.new(secret, url.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+    return f"{encoded}.{signature}"
+
+
+def image_source(key: str, secret: bytes) -> Optional[str]:
+    """Source URL for a key made by image_key, or None if it is malformed or not ours"""
+    encoded, _, signature = key.rpartition(".")
+    try:
+        url = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        return None
+    expected = hmac.new(secret, url.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+    return url if hmac.compare_digest(signature, expected) else None
+
+
+class ImageCache:
+    """In-process LRU of image bytes bounded by entry count and total size"""
+
+    def __init__(self, max_entries: int = 500, max_bytes: int = 128 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Image]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Image]:
+        image = self._entries.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return image
+
+    def set(self, key: str, image: Image) -> None:
+        if len(image[0]) > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size_bytes -= len(self._entries.pop(key)[0])
+        self._entries[key] = image
+        self.size_bytes += len(image[0])
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, (body, _) = self._entries.popitem(last=False)
+            self.size_bytes -= len(body)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ImagePrewarmer:
+    """
+    Background fetcher in front of an ImageCache.
+
+    - submit() signs the source URL into a key and queues a fetch unless the image is
+      cached or already on its way; when the queue is full the fetch is skipped, not awaited.
+    - `workers` tasks drain the queue; they start on first use, inside the serving process.
+    - get() returns a cached image, waits for a fetch already running, or starts the fetch
+      now: a view never waits behind the queue. Keys carry their URL, so a worker that
+      never saw submit() can still serve them.
+    """
+
+    def __init__(
+        self,
+        cache: ImageCache,
+        fetch: Callable[[str], Awaitable[Image]],
+        secret: bytes,
+        workers: int = 4,
+        max_queue: int = 100,
+    ):
+        self.cache = cache
+        self.fetch = fetch
+        self.secret = secret
+        self.workers = workers
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.started: Set[str] = set()
+        self.queue: Optional[asyncio.Queue] = None
+        self.max_queue = max_queue
+        self._tasks: List[asyncio.Task] = []
+        self._jumped: Set[asyncio.Task] = set()
+        self.fetched = 0
+        self.failed = 0
+        self.dropped = 0
+        self.jumped = 0
+
+    def submit(self, url: str) -> str:
+        key = image_key(url, self.secret)
+        if key in self.cache or key in self.pending:
+            return key
+        self._start()
+        if self.queue.full():
+            self.dropped += 1
+            return key
+        self.pending[key] = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(key)
+        return key
+
+    def source(self, key: str) -> Optional[str]:
+        """Source URL behind a key, or None if the key was not made with our secret"""
+        return image_source(key, self.secret)
+
+    async def get(self, key: str) -> Optional[Image]:
+        """The image for a key, or None if the key is not one of ours"""
+        image = self.cache.get(key)
+        if image is not None:
+            return image
+        if key not in self.pending:
+            if self.source(key) is None:
+                return None
+            self.pending[key] = asyncio.get_running_loop().create_future()
+        future = self.pending[key]
+        if key not in self.started:
+            # Someone is looking at it now: fetch ahead of the queue (a worker skips it later)
+            self.jumped += 1
+            task = asyncio.create_task(self._run(key))
+            self._jumped.add(task)
+            task.add_done_callback(self._jumped.discard)
+        return await asyncio.shield(future)
+
+    async def close(self) -> None:
+        tasks = self._tasks + list(self._jumped)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self.queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.cache),
+            "sizeBytes": self.cache.size_bytes,
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "pending": len(self.pending),
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "jumped": self.jumped,
+        }
+
+    def _start(self) -> None:
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self.queue.get()
+            try:
+                if key in self.pending and key not in self.started:
+                    await self._run(key)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, key: str) -> None:
+        self.started.add(key)
+        try:
+            await self._fetch(key)
+        finally:
+            self.pending.pop(key, None)
+            self.started.discard(key)
+
+    async def _fetch(self, key: str) -> None:
+        """Fetch into the cache and settle the key's pending future (with the error on failure)"""
+        future = self.pending[key]
+        try:
+            image = await self.fetch(self.source(key))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.failed += 1
+            future.set_exception(e)
+            # Nobody may be waiting; mark the exception retrieved so it is not logged as lost
+            future.exception()
+            return
+        self.fetched += 1
+        self.cache.set(key, image)
+        future.set_result(image)
@@ -0,0 +1,97 @@
+"""
+Image ingestion for vision requests
+Uploads are streamed into a spooled buffer with an early size cap, oversized images are
+downscaled (optional Pillow) and the data URL is built from the final bytes in one pass
+"""
+
+import base64
+import importlib.util
+import io
+import tempfile
+from typing import AsyncIterator, BinaryIO, Tuple
+
+# Pillow is optional - without it images are forwarded as uploaded
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+
+ALLOWED_IMAGE_TYPES = ("image/jpeg", "image/png", "image/webp", "image/gif")
+
+
+class ImageTooLarge(Exception):
+    """Upload exceeded the configured byte cap, or its header declares more pixels than allowed"""
+
+    def __init__(self, max_bytes: int = 0, max_pixels: int = 0):
+        if max_pixels:
+            message = f"Image exceeds the {max_pixels / 1_000_000:.0f} megapixel limit"
+        else:
+            message = f"Image exceeds the {max_bytes / (1024 * 1024):.1f} MB upload limit"
+        super().__init__(message)
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+
+
+class InvalidImage(Exception):
+    """Upload could not be decoded as an image"""
+
+
+async def spool_upload(chunks: AsyncIterator[bytes], max_bytes: int, spool_bytes: int) -> BinaryIO:
+    """
+    Copy a request body into a SpooledTemporaryFile (memory up to spool_bytes, then disk),
+    failing as soon as max_bytes is crossed instead of after the whole body arrived.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise ImageTooLarge(max_bytes)
+            buffer.write(chunk)
+    except BaseException:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return buffer
+
+
+def prepare_image(
+    buffer: BinaryIO, mime: str, max_dimension: int, reencode_bytes: int, max_pixels: int
+) -> Tuple[bytes, str]:
+    """
+    Bytes to send upstream: a JPEG downscaled to max_dimension when the image is larger than
+    that or heavier than reencode_bytes, otherwise the upload unchanged. Images whose header
+    declares more than max_pixels are refused before decoding (a small PNG can expand to GBs).
+    """
+    size = buffer.seek(0, io.SEEK_END)
+    buffer.seek(0)
+    if not HAS_PILLOW:
+        return buffer.read(), mime
+
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(buffer) as image:  # reads the header only
+            if image.size[0] * image.size[1] > max_pixels:
+                raise ImageTooLarge(max_pixels=max_pixels)
+            if max(image.size) <= max_dimension and size <= reencode_bytes:
+                buffer.seek(0)
+                return buffer.read(), mime
+            # JPEG draft mode decodes straight at the smallest DCT scale that still covers
+            # the target size, so a 12 MP photo is never fully expanded in memory
+            scale = max_dimension / max(image.size)
+            image.draft(None, tuple(max(1, int(side * scale)) for side in image.size))
+            image.thumbnail((max_dimension, max_dimension))
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            out = io.BytesIO()
+            image.save(out, "JPEG", quality=85, optimize=True)
+            return out.getvalue(), "image/jpeg"
+    except Image.DecompressionBombError as e:
+        # Pillow's own limit, for headers past twice its MAX_IMAGE_PIXELS
+        raise ImageTooLarge(max_pixels=max_pixels) from e
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidImage("not a decodable image") from e
+
+
+def image_data_url(data: bytes, mime: str) -> str:
+    """data: URL for an image_url content part"""
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
@@ -0,0 +1,266 @@
+"""
+Syllabus knowledge base with BM25 retrieval
+Passages come from knowledge_base.json (exported from services/knowledgeBase.ts). The
+inverted index is built once and saved next to it; later starts memory-map that file
+instead of re-tokenizing the corpus.
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+INDEX_MAGIC = b"MKBI1\n"
+INDEX_HEADER = struct.Struct("<6sQ")  # magic, header JSON length
+
+TOKEN = re.compile(r"[a-z0-9]+(?:\+\+|#)?")
+# Question words plus answer-shape scaffolding ("in detail", "with an example"), which says
+# how to answer rather than what about and would otherwise match unrelated passages
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does explain for from give how i in is it me my of on or "
+    "please tell the this to us what whats which who why with you your "
+    "brief briefly describe detail detailed details elaborate example examples simple simply".split()
+)
+
+# Question phrasing stripped before matching a glossary term or interview question exactly
+QUESTION_PREFIX = re.compile(
+    r"^(?:(?:what|who)\s+(?:is|are)|what\s+s|whats|define|definition\s+of|meaning\s+of|explain|tell\s+me\s+about)\s+(?:an?\s+|the\s+)?"
+)
+PUNCTUATION = re.compile(r"[^\w\s+#]")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def normalize(text: str) -> str:
+    """Lowercase, no punctuation, single spaces"""
+    return " ".join(PUNCTUATION.sub(" ", text.lower()).split())
+
+
+@dataclass
+class Passage:
+    kind: str  # "subject", "syllabus", "glossary", "interview", "reference"
+    title: str
+    text: str
+
+
+@dataclass
+class Hit:
+    passage: Passage
+    score: float
+
+
+@dataclass
+class DirectAnswer:
+    text: str
+    source: str  # "glossary" or "interview"
+    title: str
+
+
+def build_passages(kb: Dict[str, Any]) -> List[Passage]:
+    """One passage per subject note, semester syllabus, glossary term, interview answer and textbook line"""
+    passages = []
+    for note in kb.get("subjectDatabase", {}).values():
+        passages.append(Passage("subject", note["title"], "; ".join(note["bullets"])))
+    for department, semesters in kb.get("departmentCatalog", {}).items():
+        for number, semester in semesters.items():
+            passages.append(Passage(
+                "syllabus",
+                f"{department} Semester {number} syllabus",
+                f"Focus: {semester['focus']}. Subjects: {', '.join(semester['subjects'])}",
+            ))
+    for term, definition in kb.get("techGlossary", {}).items():
+        passages.append(Passage("glossary", term, definition))
+    for module in kb.get("interviewModules", {}).values():
+        for item in module["items"]:
+            passages.append(Passage("interview", item["q"], item["a"]))
+    for entry in kb.get("interviewQA", []):
+        passages.append(Passage("interview", ", ".join(entry["keywords"]), entry["answer"]))
+    for line in kb.get("globalReferences", "").splitlines():
+        if re.match(r"\s*\d+\.", line):
+            passages.append(Passage("reference", "Standard textbooks", line.strip()))
+    return passages
+
+
+class BM25Index:
+    """
+    Inverted index with BM25 scoring. Postings (doc ids and term frequencies) live in two
+    uint32 arrays; a saved index maps them straight from disk with mmap.
+    """
+
+    def __init__(self, terms: Dict[str, Tuple[int, int]], doc_ids, freqs, doc_lengths: List[int],
+                 k1: float = 1.2, b: float = 0.75):
+        self.terms = terms  # term -> (offset, count) into doc_ids / freqs
+        self.doc_ids = doc_ids
+        self.freqs = freqs
+        self.doc_lengths = doc_lengths
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        self.k1 = k1
+        self.b = b
+        # Per-document length normalization is fixed once the index is built
+        self._norms = [k1 * (1 - b + b * length / (self.avg_length or 1)) for length in doc_lengths]
+        n = len(doc_lengths)
+        self._idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, (_, count) in terms.items()}
+
+    @classmethod
+    def build(cls, documents: List[str]) -> "BM25Index":
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = []
+        for doc_id, text in enumerate(documents):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        terms, doc_ids, freqs = {}, array("I"), array("I")
+        for term in sorted(postings):
+            terms[term] = (len(doc_ids), len(postings[term]))
+            for doc_id, count in sorted(postings[term].items()):
+                doc_ids.append(doc_id)
+                freqs.append(count)
+        return cls(terms, doc_ids, freqs, lengths)
+
+    def save(self, path: str, corpus_hash: str) -> None:
+        header = json.dumps({
+            "corpus": corpus_hash,
+            "docLengths": self.doc_lengths,
+            "terms": self.terms,
+        }, separators=(",", ":")).encode("utf-8")
+        # Pad so the uint32 arrays start 4-byte aligned
+        header += b" " * (-(INDEX_HEADER.size + len(header)) % 4)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(header)))
+            f.write(header)
+            f.write(array("I", self.doc_ids).tobytes())
+            f.write(array("I", self.freqs).tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, corpus_hash: str) -> Optional["BM25Index"]:
+        """Map a saved index; None if it is missing, corrupt or built from another corpus"""
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, header_length = INDEX_HEADER.unpack_from(mapped)
+            if magic != INDEX_MAGIC:
+                return None
+            header = json.loads(mapped[INDEX_HEADER.size:INDEX_HEADER.size + header_length])
+        except (struct.error, ValueError):
+            return None
+        if header["corpus"] != corpus_hash:
+            return None
+        postings = memoryview(mapped)[INDEX_HEADER.size + header_length:].cast("I")
+        total = len(postings) // 2
+        terms = {term: tuple(entry) for term, entry in header["terms"].items()}
+        return cls(terms, postings[:total], postings[total:], header["docLengths"])
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[int, float]]:
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            entry = self.terms.get(token)
+            if entry is None:
+                continue
+            offset, count = entry
+            idf = self._idf[token]
+            k1 = self.k1
+            norms = self._norms
+            for doc_id, freq in zip(self.doc_ids[offset:offset + count], self.freqs[offset:offset + count]):
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (k1 + 1) / (freq + norms[doc_id])
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class KnowledgeBase:
+    """Retrieval over the syllabus corpus plus exact-match answers from the glossary and interview Q&A"""
+
+    def __init__(self, kb: Dict[str, Any], index: BM25Index):
+        self.passages = build_passages(kb)
+        self.index = index
+        self.glossary = {normalize(term): definition for term, definition in kb.get("techGlossary", {}).items()}
+        self.questions = {
+            normalize(passage.title): passage
+            for passage in self.passages if passage.kind == "interview" and passage.title.endswith((".", "?"))
+        }
+        # Multi-word interviewQA phrases ("tell me about yourself") are specific enough to answer on
+        self.phrases = [
+            (normalize(keyword), entry["answer"], ", ".join(entry["keywords"]))
+            for entry in kb.get("interviewQA", []) for keyword in entry["keywords"] if " " in keyword
+        ]
+        self.queries = 0
+        self.direct_answers = 0
+
+    @classmethod
+    def open(cls, corpus_path: str, index_path: str) -> "KnowledgeBase":
+        """Load the corpus and map its saved index, rebuilding the index when the corpus changed"""
+        with open(corpus_path, "rb") as f:
+            raw = f.read()
+        kb = json.loads(raw)
+        # The postings depend on the tokenizer too, so changing STOPWORDS rebuilds a saved index
+        corpus_hash = hashlib.sha256(raw + " ".join(sorted(STOPWORDS)).encode("utf-8")).hexdigest()
+        index = BM25Index.load(index_path, corpus_hash)
+        if index is None:
+            index = BM25Index.build([f"{p.title} {p.text}" for p in build_passages(kb)])
+            try:
+                index.save(index_path, corpus_hash)
+            except OSError:
+                pass  # read-only deploy: keep the in-memory index
+        return cls(kb, index)
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.0) -> List[Hit]:
+        self.queries += 1
+        return [
+            Hit(self.passages[doc_id], score)
+            for doc_id, score in self.index.search(query, k) if score >= min_score
+        ]
+
+    def direct_answer(self, message: str) -> Optional[DirectAnswer]:
+        """An answer needing no model: a glossary term or interview question asked (almost) verbatim"""
+        text = normalize(message)
+        subject = QUESTION_PREFIX.sub("", text)
+        answer = None
+        if subject in self.glossary:
+            answer = DirectAnswer(self.glossary[subject], "glossary", subject)
+        elif subject.endswith("s") and subject[:-1] in self.glossary:
+            answer = DirectAnswer(self.glossary[subject[:-1]], "glossary", subject[:-1])
+        elif text in self.questions:
+            passage = self.questions[text]
+            answer = DirectAnswer(passage.text, "interview", passage.title)
+        else:
+            for phrase, reply, title in self.phrases:
+                if phrase in text and len(text.split()) <= len(phrase.split()) + 4:
+                    answer = DirectAnswer(reply, "interview", title)
+                    break
+        if answer is not None:
+            self.direct_answers += 1
+        return answer
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "passages": len(self.passages),
+            "terms": len(self.index.terms),
+            "queries": self.queries,
+            "directAnswers": self.direct_answers,
+        }
+
+
+def format_passages(hits: List[Hit], max_chars: int = 1500) -> str:
+    """Retrieved passages as a compact note for the prompt"""
+    lines, used = [], 0
+    for hit in hits:
+        line = f"- {hit.passage.title}: {hit.passage.text}"
+        if used + len(line) > max_chars:
+            break
+        lines.append(line)
+        used += len(line)
+    return "\n".join(lines)
@@ -3,21 +3,54 @@ FastAPI Backend for Murukku AI
 Handles OpenRouter API calls and model routing
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, RedirectResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import replace
+import asyncio
+import fastjson
 import httpx
+import importlib.util
 import os
+import re
+import time
+from urllib.parse import quote, urlencode
 from dotenv import load_dotenv
 
+from cache import MemoryCache, ResponseCache, SQLiteCache, make_cache_key
+from deadlines import Deadline, DeadlineExceeded, RequestGuard, current_deadline, fit_tokens, limit_deadline, within_deadline
+from fallback import ModelRouter
+from fastjson import FastJSONResponse
+from image_cache import Image, ImageCache, ImagePrewarmer
+from metrics import MetricsMiddleware, Registry, phase
+from images import (
+    ALLOWED_IMAGE_TYPES, ImageTooLarge, InvalidImage, image_data_url, prepare_image, spool_upload
+)
+from prompts import (
+    CODE_PROMPT, REASONING_PROMPT, SUMMARY_SYSTEM_PROMPT, RenderedPrompt, estimate_tokens, model_family,
+    profile_key, prompt_stats, render_system_prompt
+)
+from routing import LENGTH_DETAILED, LENGTH_MODERATE, LENGTH_SHORT, Route, Router
+from scheduler import UpstreamScheduler
+from knowledge import DirectAnswer, KnowledgeBase, format_passages
+from sessions import (
+    History, SessionStore, extractive_summary, is_follow_up, is_session_id, new_session_id, transcript, turns_to_fold
+)
+from singleflight import SingleFlight
+from usage import UsageTracker
+
 # Load environment variables
 load_dotenv()
 
 app = FastAPI(
     title="Murukku AI API",
     description="Multi-model AI backend for Anna University students",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # CORS Configuration - Production Ready
@@ -44,9 +77,19 @@ app.add_middleware(
 # CONFIGURATION
 # ============================================================================
 
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Upstream endpoints; override to point at a local mock (see benchmarks/loadtest.py)
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+POLLINATIONS_IMAGE_URL = os.getenv("POLLINATIONS_IMAGE_URL", "https://image.pollinations.ai/prompt")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
+# Upstream HTTP client - one pooled client is shared for the app lifetime
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "10"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "60"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "1") == "1"
+
 if not OPENROUTER_API_KEY:
     raise ValueError(
         "❌ OPENROUTER_API_KEY not found!\n"
@@ -54,6 +97,140 @@ if not OPENROUTER_API_KEY:
         "Get free API key from: https://openrouter.ai/keys"
     )
 
+# Response cache - "memory", "sqlite" or "off"
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "memory")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+
+# Provider prompt-cache hints (cache_control on the static system block). Off by default:
+# the MODEL_CATALOG providers cache the shared prefix on their own and ignore the field;
+# turn on when the catalog carries models that need explicit breakpoints (Anthropic, Gemini)
+PROMPT_CACHE_HINTS = os.getenv("PROMPT_CACHE_HINTS", "0") == "1"
+
+# Share one upstream call between concurrent identical requests
+REQUEST_COALESCING = os.getenv("REQUEST_COALESCING", "1") == "1"
+
+# Semantic cache - serves stored answers for paraphrased questions (needs numpy)
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+SEMANTIC_CACHE_MAX_BYTES = int(os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+# Model fallback - retry the next model of the same category on 429/5xx/timeouts
+MODEL_FALLBACK = os.getenv("MODEL_FALLBACK", "1") == "1"
+FALLBACK_MAX_ATTEMPTS = int(os.getenv("FALLBACK_MAX_ATTEMPTS", "3"))
+# Hedging - race an alternate model once the first exceeds its rolling p95 latency
+MODEL_HEDGING = os.getenv("MODEL_HEDGING", "0") == "1"
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "8"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "100"))
+
+# Upstream scheduler - per-model rate limit (requests/second, 0 = unlimited) and
+# concurrency cap, with a bounded priority queue; a full queue answers 503 + Retry-After
+UPSTREAM_SCHEDULER = os.getenv("UPSTREAM_SCHEDULER", "1") == "1"
+UPSTREAM_RATE_LIMIT = float(os.getenv("UPSTREAM_RATE_LIMIT", "10"))
+UPSTREAM_RATE_BURST = int(os.getenv("UPSTREAM_RATE_BURST", "20"))
+UPSTREAM_MODEL_CONCURRENCY = int(os.getenv("UPSTREAM_MODEL_CONCURRENCY", "16"))
+UPSTREAM_QUEUE_SIZE = int(os.getenv("UPSTREAM_QUEUE_SIZE", "200"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "30"))
+# SQLite file holding the rate limits so all workers share one budget ("" = per process)
+UPSTREAM_RATE_SHARED_PATH = os.getenv("UPSTREAM_RATE_SHARED_PATH", "")
+
+# Binary image uploads (/api/vision/upload, /api/chat/upload): hard size cap, bytes kept
+# in memory before spilling to disk, and when to downscale/re-encode (needs Pillow)
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv("IMAGE_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_SPOOL_BYTES = int(os.getenv("IMAGE_SPOOL_BYTES", str(1024 * 1024)))
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1568"))
+IMAGE_REENCODE_BYTES = int(os.getenv("IMAGE_REENCODE_BYTES", str(1024 * 1024)))
+# Larger images are refused with 413 from their header, before any pixel is decoded
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "50000000"))
+# Decodes run in threads; bounding them caps peak memory when many photos arrive at once
+IMAGE_DECODE_CONCURRENCY = int(os.getenv("IMAGE_DECODE_CONCURRENCY", "2"))
+
+# /api/chat/batch - largest accepted batch and how many of its items run at once
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Conversation sessions (sessionId from POST /api/sessions, sent with /api/chat): server-side
+# turns in a bounded LRU, optionally persisted to SQLite so they survive restarts and are
+# shared by workers. Ids are signed so made-up ones are refused; the secret defaults to
+# one derived from the API key.
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "50"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "")
+# History tokens sent per request before older turns are summarized, and the summary length cap
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "2000"))
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "300"))
+SESSION_ID_MAX_LENGTH = 128
+SESSION_ID_SECRET = os.getenv("SESSION_ID_SECRET", "")
+
+# Syllabus knowledge base (knowledge_base.json, exported from services/knowledgeBase.ts by
+# `npm run export:kb`): top BM25 passages go into /api/chat prompts, and glossary terms or
+# interview questions asked verbatim are answered without an upstream call
+KNOWLEDGE_BASE = os.getenv("KNOWLEDGE_BASE", "1") == "1"
+KNOWLEDGE_PATH = os.getenv("KNOWLEDGE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base.json"))
+KNOWLEDGE_INDEX_PATH = os.getenv("KNOWLEDGE_INDEX_PATH", os.path.splitext(KNOWLEDGE_PATH)[0] + ".index")
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "3"))
+KNOWLEDGE_MIN_SCORE = float(os.getenv("KNOWLEDGE_MIN_SCORE", "4.0"))
+KNOWLEDGE_DIRECT_ANSWERS = os.getenv("KNOWLEDGE_DIRECT_ANSWERS", "1") == "1"
+
+# Image pre-warming: fetch each generated image in the background and serve repeats from
+# /api/images/{key}; PUBLIC_API_URL makes the returned imageUrl point there
+IMAGE_PREWARM = os.getenv("IMAGE_PREWARM", "0") == "1"
+IMAGE_PREWARM_WORKERS = int(os.getenv("IMAGE_PREWARM_WORKERS", "4"))
+IMAGE_PREWARM_QUEUE = int(os.getenv("IMAGE_PREWARM_QUEUE", "100"))
+IMAGE_PREWARM_TIMEOUT = float(os.getenv("IMAGE_PREWARM_TIMEOUT", "60"))
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "500"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+# Signs /api/images keys so every worker can decode them; defaults to one derived from the API key
+IMAGE_KEY_SECRET = os.getenv("IMAGE_KEY_SECRET", "")
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "").rstrip("/")
+
+# Prometheus /metrics instrumentation, and Server-Timing response headers (off by default)
+METRICS = os.getenv("METRICS", "1") == "1"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+# orjson for upstream payloads and API responses when installed; 0 forces stdlib json
+FAST_JSON = os.getenv("FAST_JSON", "1") == "1"
+if not FAST_JSON:
+    fastjson.use_stdlib()
+
+# How often a silent stream (or a request waiting on upstream) checks whether the
+# browser is still connected (seconds)
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+# Request deadlines (seconds) by kind of request: /api/chat picks one from its route
+# (greetings get the shortest), /api/code, /api/reasoning and /api/vision their own.
+# Queueing, upstream calls and fallbacks all share what is left; max_tokens is cut to
+# what DEADLINE_TOKENS_PER_SECOND can generate in the remaining time (0 = never cut).
+# The defaults fit every kind's full max_tokens with room to spare, so only a request
+# that already spent much of its time (queueing, fallbacks) gets a smaller budget.
+REQUEST_DEADLINES = {
+    LENGTH_SHORT: float(os.getenv("DEADLINE_SHORT", "20")),
+    LENGTH_MODERATE: float(os.getenv("DEADLINE_MODERATE", "45")),
+    LENGTH_DETAILED: float(os.getenv("DEADLINE_DETAILED", "90")),
+    "code": float(os.getenv("DEADLINE_CODE", "90")),
+    "reasoning": float(os.getenv("DEADLINE_REASONING", "180")),
+    "vision": float(os.getenv("DEADLINE_VISION", "60")),
+}
+DEADLINE_TOKENS_PER_SECOND = float(os.getenv("DEADLINE_TOKENS_PER_SECOND", "100"))
+DEADLINE_FIRST_TOKEN_SECONDS = float(os.getenv("DEADLINE_FIRST_TOKEN_SECONDS", "3"))
+
+# Adaptive routing by expected answer length (routing.LENGTH_*): auto-routed general
+# chat gets a max_tokens budget per length, and short answers go to a small model.
+# Code, math and vision keep the full budget; a requested model is never swapped.
+ADAPTIVE_ROUTING = os.getenv("ADAPTIVE_ROUTING", "1") == "1"
+LENGTH_MAX_TOKENS = {
+    LENGTH_SHORT: int(os.getenv("MAX_TOKENS_SHORT", "512")),
+    LENGTH_MODERATE: int(os.getenv("MAX_TOKENS_MODERATE", "1536")),
+    LENGTH_DETAILED: int(os.getenv("MAX_TOKENS_DETAILED", "4096")),
+}
+SHORT_MODEL = os.getenv("SHORT_MODEL", "llama8b")
+MODERATE_MODEL = os.getenv("MODERATE_MODEL", "")
+
 # Model Catalog
 MODEL_CATALOG = {
     "language": {
@@ -82,29 +259,102 @@ MODEL_CATALOG = {
     }
 }
 
-# Auto-detection patterns
-import re
+# Reverse lookup: model id -> MODEL_CATALOG category
+MODEL_CATEGORIES = {
+    model_id: category
+    for category, models in MODEL_CATALOG.items()
+    for model_id in models.values()
+}
 
-CODE_PATTERN = re.compile(
-    r'\b(code|coding|function|class|debug|error|bug|fix|algorithm|compile|syntax|'
-    r'javascript|python|java|c\+\+|typescript|html|css|react|node|sql|api|loop|'
-    r'array|variable|method|import|export|const|let|var|async|await|promise|'
-    r'callback|component|hook|useState|useEffect|npm|yarn|git|github|programming|'
-    r'developer|script|snippet)\b', re.IGNORECASE
-)
+# History budget per model category; coding follow-ups refer back to earlier code, and
+# vision turns already carry an image
+SESSION_HISTORY_BUDGETS = {
+    "language": SESSION_HISTORY_TOKENS,
+    "coding": SESSION_HISTORY_TOKENS * 2,
+    "reasoning": SESSION_HISTORY_TOKENS,
+    "vision": SESSION_HISTORY_TOKENS // 2,
+}
+SESSION_SUMMARY_MODEL = os.getenv("SESSION_SUMMARY_MODEL", MODEL_CATALOG["language"]["primary"])
+
+# Minimum cosine similarity before a cached answer is reused, per category.
+# Categories left out (vision) never use the semantic cache.
+SEMANTIC_CACHE_THRESHOLDS = {
+    "language": 0.90,
+    "coding": 0.95,
+    "reasoning": 0.98,  # "solve 2x+3=7" and "solve 2x+3=9" are close but not the same question
+}
+
+# Available Image Generation Models via Pollinations.ai
+IMAGE_MODELS = {
+    "flux": "flux",                    # High-quality general purpose
+    "sdxl": "sdxl",                    # Stable Diffusion XL
+    "realistic": "realistic-vision-v5", # Realistic Vision
+    "juggernaut": "juggernaut-xl",      # Juggernaut XL  
+    "dreamshaper": "dreamshaper-8",     # DreamShaper
+}
 
-MATH_PATTERN = re.compile(
-    r'\b(calculate|solve|equation|formula|math|algebra|calculus|statistics|'
-    r'probability|derivative|integral|proof|theorem|number|percentage|fraction|'
-    r'decimal|geometry|trigonometry|logarithm|exponent|matrix|vector|graph|plot)\b', 
+# Command words and model names stripped from image prompts, matched in one pass
+# (longest first, so "stable diffusion" goes before "a")
+IMAGE_PROMPT_FILLER = re.compile(
+    r"\b(?:" + "|".join(sorted(map(re.escape, [
+        "generate", "create", "draw", "make", "show", "visualize", "image",
+        "picture", "photo", "diagram", "of", "a", "an", "the",
+        "sdxl", "stable diffusion", "realistic", "juggernaut", "dreamshaper", "flux",
+    ]), key=len, reverse=True)) + r")\b",
     re.IGNORECASE
 )
 
-IMAGE_PATTERN = re.compile(
-    r'\b(draw|generate|create|show me|visualize|picture|image|photo|diagram|'
-    r'sketch|illustration|render|design|art|artwork|portrait|landscape|anime|'
-    r'cartoon|realistic|fantasy|sci-fi|generate an image|create an image|'
-    r'make an image|draw me)\b', re.IGNORECASE
+# Prompt suffix per detected image style (see routing.STYLE_KEYWORDS)
+IMAGE_STYLES = {
+    "circuit": "professional electrical engineering schematic, clean black lines on white background, IEEE standard symbols",
+    "diagram": "clean professional software architecture diagram, white background, flat design",
+    "anime": "high quality anime illustration, studio ghibli style, vibrant colors, 4k, masterpiece",
+    "photo": "hyper-realistic photography, 8k, professional DSLR, perfect lighting, award winning, photorealistic",
+    "dream": "dreamlike surreal digital art, vibrant colors, imaginative, artistic masterpiece, ethereal",
+    "digital_art": "hyper-realistic digital art, 8k, cinematic lighting, masterpiece, trending on artstation",
+}
+
+# Model used for each auto-detected message category
+ROUTE_MODELS = {
+    "vision": (MODEL_CATALOG["vision"]["llava"], "LLaMA 3.2 Vision 11B"),
+    "code": (MODEL_CATALOG["coding"]["qwen"], "Qwen3 Coder (FREE)"),
+    "math": (MODEL_CATALOG["reasoning"]["deepseek_r1"], "DeepSeek R1 (FREE)"),
+    "image": ("IMAGE_GENERATION", "FLUX Image Generator"),
+    "default": (MODEL_CATALOG["language"]["primary"], "LLaMA 3.3 70B (FREE)"),
+}
+
+# General chat model per response length when adaptive routing is on (SHORT_MODEL /
+# MODERATE_MODEL: a MODEL_CATALOG["language"] key or a full model id, "" = keep the default)
+LANGUAGE_MODEL_NAMES = {
+    "primary": "LLaMA 3.3 70B (FREE)",
+    "llama8b": "LLaMA 3.1 8B",
+    "llama70b": "LLaMA 3.1 70B",
+    "mistral": "Mistral Nemo",
+    "mixtral": "Mixtral 8x7B",
+    "phi3": "Phi-3 Mini",
+    "phi4": "Phi-4",
+}
+LENGTH_ROUTE_MODELS = {
+    length: (MODEL_CATALOG["language"].get(key, key), LANGUAGE_MODEL_NAMES.get(key, key.split("/")[-1]))
+    for length, key in ((LENGTH_SHORT, SHORT_MODEL), (LENGTH_MODERATE, MODERATE_MODEL))
+    if key
+}
+
+# Keyword routing - compiled once into a single-pass matcher
+router = Router(ROUTE_MODELS, IMAGE_MODELS, LENGTH_ROUTE_MODELS if ADAPTIVE_ROUTING else None)
+
+# Queue priority per response length - quick greetings jump ahead of long answers
+LENGTH_PRIORITY = {LENGTH_SHORT: 0, LENGTH_MODERATE: 1, LENGTH_DETAILED: 2}
+PRIORITY_DEFAULT = LENGTH_PRIORITY[LENGTH_MODERATE]
+
+# Per-model latency/error stats, fallback and hedging
+model_router = ModelRouter(
+    MODEL_CATALOG,
+    hedging=MODEL_HEDGING,
+    hedge_default_delay=HEDGE_DEFAULT_DELAY,
+    hedge_min_delay=HEDGE_MIN_DELAY,
+    max_attempts=FALLBACK_MAX_ATTEMPTS if MODEL_FALLBACK else 1,
+    window=LATENCY_WINDOW,
 )
 
 # ============================================================================
@@ -127,6 +377,7 @@ class ChatRequest(BaseModel):
     context: Optional[UserContext] = None
     model: Optional[str] = None  # Override auto-detection
     attachedImage: Optional[str] = None  # Base64 image
+    sessionId: Optional[str] = None  # Keep the conversation server-side (see /api/sessions)
 
 class ChatResponse(BaseModel):
     text: str
@@ -135,6 +386,18 @@ class ChatResponse(BaseModel):
     modelName: str
     meta: Optional[Dict[str, Any]] = None
 
+class BatchChatRequest(BaseModel):
+    items: List[ChatRequest]
+    stream: bool = False  # NDJSON lines in completion order instead of one ordered JSON body
+
+class BatchItemResult(BaseModel):
+    index: int
+    response: Optional[ChatResponse] = None
+    error: Optional[Dict[str, Any]] = None  # {"status": ..., "detail": ...}
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchItemResult]
+
 class VisionRequest(BaseModel):
     prompt: str
     image: str  # Base64 image
@@ -147,205 +410,585 @@ class ModelListResponse(BaseModel):
 # HELPER FUNCTIONS
 # ============================================================================
 
-def detect_model(message: str, has_image: bool = False) -> tuple[str, str]:
-    """Auto-detect the best model based on message content"""
-    
-    if has_image:
-        return MODEL_CATALOG["vision"]["llava"], "LLaMA 3.2 Vision 11B"
+def render_chat_prompt(context: UserContext, model_id: str, length: str) -> RenderedPrompt:
+    """Memoized template render per (profile, model family, length guidance)"""
+    profile = profile_key(
+        context.name, context.learningStyle, context.careerGoal, context.department, context.semester
+    )
+    return render_system_prompt(profile, model_family(model_id), length)
+
+
+def prompt_meta(prompt: RenderedPrompt, message: str, history: Optional[History] = None) -> Dict[str, Any]:
+    """Estimated prompt tokens sent upstream and how many of them are boilerplate or session history"""
+    meta = {
+        "promptTokens": prompt.tokens + estimate_tokens(message) + (history.tokens if history else 0),
+        "boilerplateTokens": prompt.static_tokens,
+    }
+    if history is not None:
+        meta.update(history.meta())
+    return meta
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Build the configured response cache backend"""
+    if RESPONSE_CACHE == "off":
+        return None
+    if RESPONSE_CACHE == "sqlite":
+        backend = SQLiteCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL)
+    else:
+        backend = MemoryCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+    return ResponseCache(backend)
+
+
+async def run_store(store: Any, method: Callable[..., Any], *args: Any) -> Any:
+    """Call a cache/session store method, in a worker thread when the store is SQLite-backed"""
+    if store.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+def create_semantic_cache():
+    """Build the optional paraphrase cache (numpy is only imported when enabled)"""
+    if not SEMANTIC_CACHE:
+        return None
+    from semantic_cache import SemanticCache
+    return SemanticCache(
+        SEMANTIC_CACHE_THRESHOLDS,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+        max_bytes=SEMANTIC_CACHE_MAX_BYTES,
+        ttl=SEMANTIC_CACHE_TTL,
+    )
+
+
+def create_knowledge_base() -> Optional[KnowledgeBase]:
+    """Load the syllabus corpus and map (or build) its retrieval index"""
+    if not KNOWLEDGE_BASE:
+        return None
+    try:
+        return KnowledgeBase.open(KNOWLEDGE_PATH, KNOWLEDGE_INDEX_PATH)
+    except OSError:
+        return None
+
+
+def create_scheduler() -> Optional[UpstreamScheduler]:
+    """Build the upstream rate limiter / concurrency scheduler"""
+    if not UPSTREAM_SCHEDULER:
+        return None
+    return UpstreamScheduler(
+        rate=UPSTREAM_RATE_LIMIT,
+        burst=UPSTREAM_RATE_BURST,
+        max_concurrency=UPSTREAM_MODEL_CONCURRENCY,
+        max_queue=UPSTREAM_QUEUE_SIZE,
+        max_wait=UPSTREAM_QUEUE_TIMEOUT,
+        shared_path=UPSTREAM_RATE_SHARED_PATH or None,
+    )
+
+
+def has_image_content(messages: List[Dict]) -> bool:
+    """Whether any message carries an image part"""
+    return any(
+        part.get("type") == "image_url"
+        for m in messages if not isinstance(m["content"], str)
+        for part in m["content"]
+    )
+
+
+def last_user_text(messages: List[Dict]) -> str:
+    """Text of the latest user turn"""
+    for message in reversed(messages):
+        if message["role"] == "user" and isinstance(message["content"], str):
+            return message["content"]
+    return ""
+
+
+response_cache = create_response_cache()
+knowledge_base = create_knowledge_base()
+session_store = SessionStore(
+    max_sessions=SESSION_MAX, max_turns=SESSION_MAX_TURNS, ttl=SESSION_TTL, path=SESSION_STORE_PATH or None
+)
+session_id_secret = (SESSION_ID_SECRET or f"session-ids:{OPENROUTER_API_KEY}").encode("utf-8")
+semantic_cache = create_semantic_cache()
+inflight = SingleFlight() if REQUEST_COALESCING else None
+scheduler = create_scheduler()
+image_decode_slots = asyncio.Semaphore(IMAGE_DECODE_CONCURRENCY)
+usage_tracker = UsageTracker()
+request_guard = RequestGuard(DISCONNECT_POLL_INTERVAL)
+http_client: Optional[httpx.AsyncClient] = None
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+metrics_registry = Registry()
+http_duration = metrics_registry.histogram(
+    "murukku_http_request_duration_seconds", "API request latency", ("endpoint", "method", "status")
+)
+http_phases = metrics_registry.histogram(
+    "murukku_request_phase_seconds",
+    "Time per request phase (route, prompt, queue, upstream, classify; local = total - upstream)",
+    ("endpoint", "phase")
+)
+http_errors = metrics_registry.counter("murukku_http_errors_total", "API responses with status >= 400", ("endpoint", "status"))
+http_in_flight = metrics_registry.gauge("murukku_http_requests_in_flight", "API requests being handled")
+upstream_duration = metrics_registry.histogram(
+    "murukku_upstream_request_duration_seconds",
+    "OpenRouter latency per model (streams until the last chunk)",
+    ("model", "status")
+)
+upstream_errors = metrics_registry.counter(
+    "murukku_upstream_errors_total", "Failed OpenRouter calls by status", ("model", "status")
+)
+upstream_in_flight = metrics_registry.gauge(
+    "murukku_upstream_requests_in_flight", "OpenRouter calls in progress", ("model",)
+)
+metrics_registry.callback(
+    "murukku_tokens_total", "Tokens reported by OpenRouter usage", "counter", ("model", "kind"),
+    lambda: [
+        ((model, kind), totals[key])
+        for model, totals in usage_tracker.models.items()
+        for kind, key in (("prompt", "promptTokens"), ("cached", "cachedTokens"), ("completion", "completionTokens"))
+    ]
+)
+chat_routes = metrics_registry.counter(
+    "murukku_chat_routes_total", "Chat turns sent upstream by expected answer length and routed model", ("length", "model")
+)
+chat_max_tokens_budget = metrics_registry.counter(
+    "murukku_chat_max_tokens_total",
+    'max_tokens budget granted to chat turns by expected answer length ("full" when not length-budgeted)', ("length",)
+)
+chat_upstream_duration = metrics_registry.histogram(
+    "murukku_chat_upstream_seconds", "Chat upstream latency by expected answer length and answering model", ("length", "model")
+)
+metrics_registry.callback(
+    "murukku_requests_aborted_total", "Requests cancelled mid-flight by their deadline or a client disconnect",
+    "counter", ("reason",),
+    lambda: [(("deadline",), request_guard.deadline_exceeded), (("disconnect",), request_guard.disconnects)]
+)
+metrics_registry.callback(
+    "murukku_response_cache_lookups_total", "Response cache lookups", "counter", ("result",),
+    lambda: [(("hit",), response_cache.hits), (("miss",), response_cache.misses)] if response_cache is not None else []
+)
+metrics_registry.callback(
+    "murukku_upstream_queue_depth", "Requests waiting for an upstream slot", "gauge", (),
+    lambda: [((), scheduler.queued)] if scheduler is not None else []
+)
+metrics_registry.callback(
+    "murukku_model_fallbacks_total", "Fallback and hedged upstream attempts", "counter", ("kind",),
+    lambda: [(("fallback",), model_router.fallbacks), (("hedge",), model_router.hedges), (("hedge_win",), model_router.hedge_wins)]
+)
+
+if METRICS:
+    app.add_middleware(
+        MetricsMiddleware,
+        duration=http_duration,
+        phases=http_phases,
+        errors=http_errors,
+        in_flight=http_in_flight,
+        server_timing=SERVER_TIMING,
+    )
+
+
+@asynccontextmanager
+async def track_upstream(model: str):
+    """Per-model upstream latency, in-flight and error metrics; set call["status"] once known"""
+    call = {"status": "error"}
+    upstream_in_flight.inc((model,))
+    start = time.perf_counter()
+    try:
+        yield call
+    except asyncio.CancelledError:
+        call["status"] = "cancelled"
+        raise
+    except httpx.TimeoutException:
+        call["status"] = "timeout"
+        raise
+    finally:
+        upstream_in_flight.dec((model,))
+        upstream_duration.observe((model, call["status"]), time.perf_counter() - start)
+        if call["status"] != "200":
+            upstream_errors.inc((model, call["status"]))
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the pooled keep-alive client used for all upstream calls"""
+    # HTTP/2 needs the optional h2 package (installed via httpx[http2])
+    http2 = UPSTREAM_HTTP2 and importlib.util.find_spec("h2") is not None
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(
+            connect=UPSTREAM_CONNECT_TIMEOUT,
+            read=UPSTREAM_READ_TIMEOUT,
+            write=UPSTREAM_CONNECT_TIMEOUT,
+            pool=UPSTREAM_CONNECT_TIMEOUT,
+        ),
+        limits=httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared upstream client, creating it if startup has not run"""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+
+@asynccontextmanager
+async def upstream_slot(model: str, priority: int):
+    """Wait for the scheduler to admit an upstream call; 503 + Retry-After when it is saturated"""
+    if scheduler is None:
+        yield
+        return
+    with phase("queue"):
+        await scheduler.acquire(model, priority)
+    try:
+        yield
+    finally:
+        scheduler.release(model)
+
+
+async def read_image_upload(request: Request) -> str:
+    """Stream a raw image request body to a spooled buffer and return the data URL to forward"""
+    mime = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if mime not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail=f"Send the image as the body with one of: {', '.join(ALLOWED_IMAGE_TYPES)}")
     
-    if CODE_PATTERN.search(message):
-        return MODEL_CATALOG["coding"]["qwen"], "Qwen3 Coder (FREE)"
+    # Reject declared oversize bodies before reading a byte
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > IMAGE_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=str(ImageTooLarge(IMAGE_UPLOAD_MAX_BYTES)))
     
-    if MATH_PATTERN.search(message):
-        return MODEL_CATALOG["reasoning"]["deepseek_r1"], "DeepSeek R1 (FREE)"
+    try:
+        buffer = await spool_upload(request.stream(), IMAGE_UPLOAD_MAX_BYTES, IMAGE_SPOOL_BYTES)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     
-    if IMAGE_PATTERN.search(message):
-        return "IMAGE_GENERATION", "FLUX Image Generator"
+    try:
+        # Decoding/resizing is CPU work - keep it off the event loop
+        async with image_decode_slots:
+            data, mime = await run_in_threadpool(
+                prepare_image, buffer, mime, IMAGE_MAX_DIMENSION, IMAGE_REENCODE_BYTES, IMAGE_MAX_PIXELS
+            )
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+    finally:
+        buffer.close()
     
-    # Default to primary language model
-    return MODEL_CATALOG["language"]["primary"], "LLaMA 3.3 70B (FREE)"
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    return image_data_url(data, mime)
 
 
-def build_system_prompt(context: UserContext, model_id: str, message: str = "") -> str:
-    """Build system prompt based on user context, model type, and message complexity"""
+def upstream_error(response: httpx.Response) -> str:
+    """Error message from an OpenRouter error body (which is not always JSON)"""
+    try:
+        return fastjson.loads(response.content).get("error", {}).get("message", "Unknown error")
+    except (ValueError, AttributeError):
+        return response.text[:200] or "Unknown error"
+
+
+def openrouter_headers() -> Dict[str, str]:
+    """Headers sent with every OpenRouter request"""
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "HTTP-Referer": "http://localhost:3000",
+        "X-Title": "Murukku AI"
+    }
+
+
+async def call_openrouter(
+    model: str,
+    messages: List[Dict],
+    temperature: float = 0.7,
+    max_tokens: int = 4096,
+    priority: int = PRIORITY_DEFAULT
+) -> str:
+    """Make API call to OpenRouter, serving repeated text-only prompts from cache or an identical in-flight call"""
     
-    # Analyze message complexity for adaptive response length
-    word_count = len(message.split())
-    is_simple = any(g in message.lower() for g in ['hi', 'hello', 'hey', 'vanakkam', 'thanks', 'ok', 'bye', 'nandri'])
-    needs_detail = any(k in message.lower() for k in ['explain', 'describe', 'how', 'why', 'what is', 'elaborate', 'steps', 'process'])
-    is_code_request = any(k in message.lower() for k in ['code', 'program', 'implement', 'write', 'function', 'script'])
+    max_tokens = deadline_tokens(max_tokens)
     
-    # Adaptive response guidance
-    if is_simple or word_count < 5:
-        response_guidance = "RESPONSE LENGTH: Keep it SHORT (1-3 sentences). Be friendly and warm with Tamil flavor."
-    elif needs_detail or is_code_request:
-        response_guidance = "RESPONSE LENGTH: Be DETAILED. Use bullet points, examples, code comments, and structured format."
-    else:
-        response_guidance = "RESPONSE LENGTH: MODERATE (5-10 sentences). Clear and helpful."
-    
-    base_prompt = f"""You are **Murukku AI** (முருக்கு AI) 🍘, an elite AI Academic Companion for Anna University students.
-
-CORE PERSONALITY:
-- You are a friendly "அண்ணா" (Anna/Big Brother) who naturally mixes Tamil script (தமிழ்) with Tanglish
-- Be warm, encouraging, and supportive like a real senior helping juniors
-- Use Tamil greetings: வணக்கம் (Vanakkam), என்ன மாச்சி (Enna Machi)
-- Use encouragements: சூப்பர் (Super), கலக்கல் (Kalakkal), செம்ம (Semma), அருமை (Arumai)
-
-USER PROFILE:
-- Name: {context.name or 'Machi'}
-- Learning Style: {context.learningStyle or 'Visual'}
-- Career Goal: {context.careerGoal or 'Placement'}
-- Department: {context.department or 'Engineering'}
-- Semester: {context.semester or 'Not specified'}
-
-{response_guidance}
-
-RESPONSE STYLE:
-- Start with a Tamil greeting or phrase
-- Use **Bold** for key terminology and definitions
-- Add "📝 Exam Tip:" or "💡 Pro Tip:" for important insights
-- End academic answers with "புரியுதா? சந்தேகம் கேளு!" (Understood? Ask doubts!)
-
-TAMIL PHRASES TO USE:
-- வணக்கம் (Vanakkam) - Hello
-- நன்றி (Nandri) - Thank you
-- சூப்பர் (Super) - Great
-- கலக்கல் (Kalakkal) - Awesome
-- செம்ம (Semma) - Fantastic
-- புரியுதா (Puriyutha) - Do you understand?
-- சந்தேகம் கேளு (Sandhegam Kelu) - Ask your doubts
-- படிச்சா ஜெயி! (Padichaa Jeyi!) - Study and win!
-"""
-
-    # Add model-specific instructions
-    if "coder" in model_id.lower() or "deepseek" in model_id.lower():
-        base_prompt += """
-CODING MODE ACTIVATED:
-- Provide clean, well-commented, production-ready code
-- Use proper indentation and follow best practices
-- Explain the logic step-by-step
-- Include example usage where helpful
-- Mention time/space complexity for algorithms
-"""
+    # Image payloads are unique per upload, so only text conversations are cached or coalesced
+    cache_key = None
+    if not has_image_content(messages):
+        cache_key = make_cache_key(model, messages, temperature, max_tokens)
+        cached = await run_store(response_cache, response_cache.get, cache_key) if response_cache is not None else None
+        if cached is not None:
+            return cached
     
-    if "r1" in model_id.lower() or "reasoning" in model_id.lower():
-        base_prompt += """
-REASONING MODE ACTIVATED:
-- Break down complex problems step by step
-- Show your mathematical/logical work clearly
-- Double-check calculations before final answers
-- Use clear notation and formatting
-"""
+    # Paraphrases of an answered question reuse its answer for the same model and system
+    # prompt; follow-ups depend on the conversation before them, so only single-turn requests qualify
+    category = MODEL_CATEGORIES.get(model)
+    question = last_user_text(messages) if semantic_cache is not None and category and not is_follow_up(messages) else ""
+    if question:
+        scope = semantic_scope(messages, temperature, max_tokens)
+        cached = semantic_cache.lookup(model, category, question, scope)
+        if cached is not None:
+            return cached
+    
+    async def fetch() -> str:
+        content = await request_openrouter(model, messages, temperature, max_tokens, priority)
+        if cache_key is not None and response_cache is not None and content:
+            await run_store(response_cache, response_cache.set, cache_key, content)
+        if question and content:
+            semantic_cache.store(model, category, question, content, scope)
+        return content
+    
+    if cache_key is not None and inflight is not None:
+        return await inflight.do(cache_key, fetch)
+    return await fetch()
 
-    return base_prompt
 
+def semantic_scope(messages: List[Dict], temperature: float, max_tokens: int) -> str:
+    """
+    Semantic cache scope: the leading system prompt (student profile, prompt family and
+    length guidance) and the sampling settings, so paraphrases only meet within one of them
+    """
+    return make_cache_key("", [m for m in messages[:1] if m["role"] == "system"], temperature, max_tokens)
 
-async def call_openrouter(
+
+async def complete_with_fallback(
     model: str,
     messages: List[Dict],
     temperature: float = 0.7,
-    max_tokens: int = 4096
+    max_tokens: int = 4096,
+    priority: int = PRIORITY_DEFAULT
+) -> tuple[str, str]:
+    """Completion from the requested model or a same-category fallback; returns (text, model that answered)"""
+    return await model_router.complete(
+        model, lambda candidate: call_openrouter(candidate, messages, temperature, max_tokens, priority)
+    )
+
+
+def deadline_tokens(max_tokens: int, deadline: Optional[Deadline] = None) -> int:
+    """max_tokens cut to what fits in the time left before the (current) request deadline"""
+    deadline = deadline or current_deadline.get()
+    if deadline is None or not DEADLINE_TOKENS_PER_SECOND:
+        return max_tokens
+    return fit_tokens(max_tokens, deadline.remaining(), DEADLINE_TOKENS_PER_SECOND, DEADLINE_FIRST_TOKEN_SECONDS)
+
+
+def answered_by(model_id: str, model_name: str, used: str) -> tuple[str, str]:
+    """modelUsed/modelName for the reply, naming the fallback model if one answered"""
+    if used == model_id:
+        return model_id, model_name
+    return used, used.split("/")[-1]
+
+
+async def request_openrouter(
+    model: str,
+    messages: List[Dict],
+    temperature: float,
+    max_tokens: int,
+    priority: int = PRIORITY_DEFAULT
 ) -> str:
-    """Make API call to OpenRouter"""
+    """Send one chat completion request upstream once the scheduler admits it"""
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "HTTP-Referer": "http://localhost:3000",
-        "X-Title": "Murukku AI"
+    headers = openrouter_headers()
+    
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "usage": {"include": True}
     }
     
+    client = get_http_client()
+    # The deadline bounds the queue wait and the whole upstream call, not just each socket read
+    async with within_deadline(), upstream_slot(model, priority), track_upstream(model) as call:
+        response = await client.post(OPENROUTER_API_URL, content=fastjson.dumps(payload), headers=headers)
+        call["status"] = str(response.status_code)
+    
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=upstream_error(response))
+    
+    data = fastjson.loads(response.content)
+    usage_tracker.record(model, data.get("usage"))
+    return data["choices"][0]["message"]["content"]
+
+
+async def stream_openrouter(
+    model: str,
+    messages: List[Dict],
+    temperature: float = 0.7,
+    max_tokens: int = 4096,
+    priority: int = PRIORITY_DEFAULT,
+    deadline: Optional[Deadline] = None
+) -> AsyncIterator[str]:
+    """Stream completion deltas from OpenRouter (stream: true)"""
+    
     payload = {
         "model": model,
         "messages": messages,
         "temperature": temperature,
-        "max_tokens": max_tokens
+        "max_tokens": deadline_tokens(max_tokens, deadline),
+        "stream": True,
+        "usage": {"include": True}
     }
     
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(OPENROUTER_API_URL, json=payload, headers=headers)
-        
+    client = get_http_client()
+    # The slot is held for the whole stream, so long generations count against the concurrency cap
+    async with upstream_slot(model, priority), track_upstream(model) as call, \
+            client.stream("POST", OPENROUTER_API_URL, content=fastjson.dumps(payload), headers=openrouter_headers()) as response:
+        call["status"] = str(response.status_code)
         if response.status_code != 200:
-            error_detail = response.json().get("error", {}).get("message", "Unknown error")
-            raise HTTPException(status_code=response.status_code, detail=error_detail)
+            await response.aread()
+            raise HTTPException(status_code=response.status_code, detail=upstream_error(response))
         
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
+        async for line in response.aiter_lines():
+            # Skip blank separators and ": OPENROUTER PROCESSING" keep-alive comments
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            chunk = fastjson.loads(data)
+            if "error" in chunk:
+                raise HTTPException(status_code=502, detail=chunk["error"].get("message", "Upstream stream error"))
+            # Usage arrives on the final chunk, which may carry no choices
+            usage_tracker.record(model, chunk.get("usage"))
+            if not chunk.get("choices"):
+                continue
+            delta = chunk["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
 
 
-# Available Image Generation Models via Pollinations.ai
-IMAGE_MODELS = {
-    "flux": "flux",                    # High-quality general purpose
-    "sdxl": "sdxl",                    # Stable Diffusion XL
-    "realistic": "realistic-vision-v5", # Realistic Vision
-    "juggernaut": "juggernaut-xl",      # Juggernaut XL  
-    "dreamshaper": "dreamshaper-8",     # DreamShaper
-}
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {fastjson.dumps(data).decode('utf-8')}\n\n"
 
-def detect_image_model(prompt: str) -> tuple[str, str]:
-    """Detect the best image model based on prompt keywords"""
-    prompt_lower = prompt.lower()
+
+async def relay_until_disconnect(
+    request: Request,
+    upstream: AsyncIterator[str],
+    deadline: Optional[Deadline] = None
+) -> AsyncIterator[str]:
+    """Yield upstream deltas, cancelling the upstream call as soon as the client goes away or the deadline passes"""
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def pump():
+        try:
+            async for delta in upstream:
+                queue.put_nowait(delta)
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            queue.put_nowait(None)
+    
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            if deadline is not None and deadline.expired:
+                request_guard.deadline_exceeded += 1
+                raise DeadlineExceeded(deadline.seconds)
+            timeout = DISCONNECT_POLL_INTERVAL if deadline is None else min(DISCONNECT_POLL_INTERVAL, deadline.remaining())
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                # No tokens yet (e.g. R1 still thinking) - make sure someone is still listening
+                if await request.is_disconnected():
+                    request_guard.disconnects += 1
+                    return
+                continue
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Closing the upstream response stops generation we would otherwise pay for
+        task.cancel()
+
+
+def stream_chat_response(
+    request: Request,
+    model_id: str,
+    model_name: str,
+    messages: List[Dict],
+    temperature: float,
+    response_type: Optional[str] = None,
+    priority: int = PRIORITY_DEFAULT,
+    on_done: Optional[Callable[[str], Awaitable[None]]] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    deadline: Optional[Deadline] = None,
+    max_tokens: int = 4096
+) -> StreamingResponse:
+    """
+    SSE response: one `data` event per delta, then a `done` event with ChatResponse metadata.
+    on_done gets the full text once the stream completes (not when it fails, runs past the
+    deadline or the client leaves).
+    """
     
-    # Check for explicit model requests
-    if any(word in prompt_lower for word in ['sdxl', 'stable diffusion']):
-        return IMAGE_MODELS["sdxl"], "Stable Diffusion XL"
-    elif any(word in prompt_lower for word in ['realistic', 'photo', 'portrait', 'person', 'face', 'human']):
-        return IMAGE_MODELS["realistic"], "Realistic Vision"
-    elif any(word in prompt_lower for word in ['juggernaut', 'detailed', 'hyper']):
-        return IMAGE_MODELS["juggernaut"], "Juggernaut XL"
-    elif any(word in prompt_lower for word in ['dream', 'fantasy', 'surreal', 'artistic', 'abstract', 'creative']):
-        return IMAGE_MODELS["dreamshaper"], "DreamShaper"
-    elif any(word in prompt_lower for word in ['anime', 'manga', 'ghibli', 'cartoon']):
-        return IMAGE_MODELS["flux"], "FLUX"
+    async def events():
+        parts = []
+        try:
+            upstream = stream_openrouter(model_id, messages, temperature, max_tokens, priority, deadline)
+            with phase("upstream"):
+                async for delta in relay_until_disconnect(request, upstream, deadline):
+                    parts.append(delta)
+                    yield sse_event({"text": delta})
+        except HTTPException as e:
+            yield sse_event({"status": e.status_code, "detail": e.detail}, event="error")
+            return
+        except Exception as e:
+            yield sse_event({"status": 500, "detail": str(e)}, event="error")
+            return
+        
+        text = "".join(parts)
+        if on_done is not None and not await request.is_disconnected():
+            await on_done(text)
+        done = {
+            "type": response_type or classify_response(text, model_id),
+            "modelUsed": model_id,
+            "modelName": model_name
+        }
+        if meta is not None:
+            done["meta"] = meta
+        yield sse_event(done, event="done")
     
-    # Default to FLUX for general requests
-    return IMAGE_MODELS["flux"], "FLUX"
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
-def generate_image_url(prompt: str, model: str = None) -> dict:
+def generate_image_url(prompt: str, model: str = None, route: Optional[Route] = None) -> dict:
     """Generate image URL using Pollinations.ai with model selection"""
     
-    prompt_lower = prompt.lower()
+    route = route or router.route(prompt)
     
     # Auto-detect model if not specified
     if model is None:
-        selected_model, model_name = detect_image_model(prompt)
+        selected_model, model_name = route.image_model, route.image_model_name
     else:
         selected_model = model
         model_name = model.replace("-", " ").title()
     
-    # Style detection based on content
-    if any(word in prompt_lower for word in ['circuit', 'schematic', 'wiring', 'pcb']):
-        style = "professional electrical engineering schematic, clean black lines on white background, IEEE standard symbols"
-        selected_model = IMAGE_MODELS["flux"]  # FLUX is best for technical diagrams
-        model_name = "FLUX"
-    elif any(word in prompt_lower for word in ['flowchart', 'uml', 'process', 'algorithm']):
-        style = "clean professional software architecture diagram, white background, flat design"
+    # Style detection based on content; FLUX is best for technical diagrams
+    style = IMAGE_STYLES[route.style]
+    if route.style in ("circuit", "diagram"):
         selected_model = IMAGE_MODELS["flux"]
         model_name = "FLUX"
-    elif any(word in prompt_lower for word in ['anime', 'manga', 'ghibli']):
-        style = "high quality anime illustration, studio ghibli style, vibrant colors, 4k, masterpiece"
-    elif any(word in prompt_lower for word in ['realistic', 'photo', 'portrait']):
-        style = "hyper-realistic photography, 8k, professional DSLR, perfect lighting, award winning, photorealistic"
-    elif any(word in prompt_lower for word in ['dream', 'fantasy', 'surreal']):
-        style = "dreamlike surreal digital art, vibrant colors, imaginative, artistic masterpiece, ethereal"
-    else:
-        style = "hyper-realistic digital art, 8k, cinematic lighting, masterpiece, trending on artstation"
     
     # Clean prompt - remove command words and model names
-    remove_words = ['generate', 'create', 'draw', 'make', 'show', 'visualize', 'image', 
-                    'picture', 'photo', 'diagram', 'of', 'a', 'an', 'the',
-                    'sdxl', 'stable diffusion', 'realistic', 'juggernaut', 'dreamshaper', 'flux']
-    clean_prompt = prompt
-    for word in remove_words:
-        clean_prompt = re.sub(rf'\b{word}\b', '', clean_prompt, flags=re.IGNORECASE)
-    clean_prompt = ' '.join(clean_prompt.split()).strip()
+    clean_prompt = ' '.join(IMAGE_PROMPT_FILLER.sub('', prompt).split())
     
     if not clean_prompt or len(clean_prompt) < 2:
         clean_prompt = "advanced future technology"
     
     full_prompt = f"{clean_prompt}, {style}"
-    url = f"https://image.pollinations.ai/prompt/{full_prompt}?width=1024&height=1024&model={selected_model}&nologo=true"
+    query = urlencode({"width": 1024, "height": 1024, "model": selected_model, "nologo": "true"})
+    url = f"{POLLINATIONS_IMAGE_URL}/{quote(full_prompt, safe='')}?{query}"
     
     return {
         "url": url,
@@ -355,6 +998,57 @@ def generate_image_url(prompt: str, model: str = None) -> dict:
     }
 
 
+async def fetch_image(url: str) -> Image:
+    """Download one rendered image through the shared upstream client"""
+    response = await get_http_client().get(url, timeout=IMAGE_PREWARM_TIMEOUT, follow_redirects=True)
+    response.raise_for_status()
+    content_type = response.headers.get("content-type", "")
+    if not content_type.startswith("image/"):
+        raise ValueError(f"expected an image, got {content_type or 'no content type'}")
+    return response.content, content_type
+
+
+image_prewarmer = ImagePrewarmer(
+    ImageCache(IMAGE_CACHE_MAX_ENTRIES, IMAGE_CACHE_MAX_BYTES),
+    fetch_image,
+    (IMAGE_KEY_SECRET or f"image-keys:{OPENROUTER_API_KEY}").encode("utf-8"),
+    workers=IMAGE_PREWARM_WORKERS,
+    max_queue=IMAGE_PREWARM_QUEUE,
+) if IMAGE_PREWARM else None
+
+
+def image_links(source_url: str, base_url: str = PUBLIC_API_URL) -> Dict[str, str]:
+    """
+    Queue a background fetch of the render and return the URLs for the response: `url` is our
+    /api/images copy when a public base URL is known, `cachedUrl` the path relative to the API.
+    """
+    if image_prewarmer is None:
+        return {"url": source_url}
+    path = f"/api/images/{image_prewarmer.submit(source_url)}"
+    return {"url": f"{base_url}{path}" if base_url else source_url, "sourceUrl": source_url, "cachedUrl": path}
+
+
+# ============================================================================
+# LIFECYCLE
+# ============================================================================
+
+@app.on_event("startup")
+async def startup():
+    """Open the shared upstream connection pool"""
+    get_http_client()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the shared upstream connection pool"""
+    global http_client
+    if image_prewarmer is not None:
+        await image_prewarmer.close()
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -371,69 +1065,392 @@ async def get_models():
     return {"models": MODEL_CATALOG}
 
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Main chat endpoint with auto-detection"""
-    
-    context = request.context or UserContext()
-    has_image = bool(request.attachedImage)
-    
-    # Detect or use specified model
+def route_chat(request: ChatRequest, image_url: Optional[str] = None) -> Route:
+    """
+    Classify the message once; a requested model overrides the auto-detected one. Only
+    catalog models are accepted, since the model id labels metrics, scheduler lanes and
+    fallback stats, which must not grow with whatever clients send.
+    """
+    if request.model and request.model not in MODEL_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Unknown model '{request.model[:100]}' (see /api/models)")
+    if request.sessionId and not valid_session_id(request.sessionId):
+        raise HTTPException(status_code=400, detail="Unknown sessionId; start a conversation with POST /api/sessions")
+    route = router.route(request.message, bool(request.attachedImage or image_url))
     if request.model:
-        model_id = request.model
-        model_name = request.model.split("/")[-1]
-    else:
-        model_id, model_name = detect_model(request.message, has_image)
+        route = replace(route, model_id=request.model, model_name=request.model.split("/")[-1])
+    return route
+
+
+def image_chat_response(message: str, route: Optional[Route] = None) -> ChatResponse:
+    """Chat reply for image generation requests, with auto-model selection"""
+    image_result = generate_image_url(message, route=route)
+    links = image_links(image_result['url'])
+    meta = {"imageUrl": links['url'], "imagePrompt": image_result['prompt'], "imageModel": image_result['modelName']}
+    if "cachedUrl" in links:
+        meta["cachedImageUrl"] = links["cachedUrl"]
+    return ChatResponse(
+        text=f"🎨 Drawing it for you using **{image_result['modelName']}**!\n\nGenerating your high-quality image...",
+        type="image",
+        modelUsed=f"pollinations/{image_result['model']}",
+        modelName=f"{image_result['modelName']} Image Generator",
+        meta=meta
+    )
+
+
+def system_message(prompt: RenderedPrompt) -> Dict:
+    """
+    System message with the shared static block first and per-user details last,
+    so the leading bytes are identical for every user and provider prompt caches can hit.
+    """
+    if not PROMPT_CACHE_HINTS:
+        return {"role": "system", "content": prompt.text}
     
-    # Handle image generation with auto-model selection
-    if model_id == "IMAGE_GENERATION":
-        image_result = generate_image_url(request.message)
-        return ChatResponse(
-            text=f"🎨 Drawing it for you using **{image_result['modelName']}**!\n\nGenerating your high-quality image...",
-            type="image",
-            modelUsed=f"pollinations/{image_result['model']}",
-            modelName=f"{image_result['modelName']} Image Generator",
-            meta={"imageUrl": image_result['url'], "imagePrompt": image_result['prompt'], "imageModel": image_result['modelName']}
-        )
+    parts = [{"type": "text", "text": prompt.static, "cache_control": {"type": "ephemeral"}}]
+    if prompt.dynamic:
+        parts.append({"type": "text", "text": prompt.dynamic})
+    return {"role": "system", "content": parts}
+
+
+def chat_system_prompt(request: ChatRequest, route: Route) -> RenderedPrompt:
+    """System prompt with adaptive response length"""
+    return render_chat_prompt(request.context or UserContext(), route.model_id, route.length)
+
+
+def build_chat_messages(
+    request: ChatRequest,
+    route: Route,
+    system_prompt: RenderedPrompt,
+    image_url: Optional[str] = None,
+    history: Optional[History] = None,
+    notes: str = ""
+) -> List[Dict]:
+    """
+    System prompt, session history (summary, then recent turns), retrieved syllabus notes
+    and the user turn (with image if attached). Notes go last so the history prefix stays cacheable.
+    """
+    messages = [system_message(system_prompt)]
+    if history is not None:
+        messages.extend(history.messages())
+    if notes:
+        messages.append({"role": "system", "content": f"Syllabus notes (use them if relevant):\n{notes}"})
     
-    # Build messages with adaptive response length
-    system_prompt = build_system_prompt(context, model_id, request.message)
-    messages = [{"role": "system", "content": system_prompt}]
+    if image_url is None and request.attachedImage:
+        image_url = f"data:image/jpeg;base64,{request.attachedImage}"
     
     # Handle vision request
-    if has_image and request.attachedImage:
+    if image_url:
         messages.append({
             "role": "user",
             "content": [
                 {"type": "text", "text": request.message},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{request.attachedImage}"}}
+                {"type": "image_url", "image_url": {"url": image_url}}
             ]
         })
     else:
         messages.append({"role": "user", "content": request.message})
     
-    # Adjust temperature based on model
-    temperature = 0.7
+    return messages
+
+
+def chat_temperature(model_id: str) -> float:
+    """Adjust temperature based on model"""
     if "coder" in model_id.lower():
-        temperature = 0.3
-    elif "r1" in model_id.lower():
-        temperature = 0.2
+        return 0.3
+    if "r1" in model_id.lower():
+        return 0.2
+    return 0.7
+
+
+def chat_max_tokens(route: Route) -> tuple[int, str]:
+    """
+    Token budget for a chat turn and what set it: the expected length for general chat,
+    "full" (the whole budget) otherwise
+    """
+    if ADAPTIVE_ROUTING and route.category == "default":
+        return LENGTH_MAX_TOKENS[route.length], route.length
+    return 4096, "full"
+
+
+def classify_response(text: str, model_id: str) -> str:
+    """Determine response type"""
+    if "```" in text and "coder" in model_id.lower():
+        return "code"
+    if len(text) > 1200:
+        return "notes"
+    return "text"
+
+
+def knowledge_answer(request: ChatRequest, route: Route, image_url: Optional[str] = None) -> Optional[ChatResponse]:
+    """Local answer for a glossary term or interview question asked verbatim to the default model"""
+    if (
+        knowledge_base is None or not KNOWLEDGE_DIRECT_ANSWERS or request.model
+        or image_url or request.attachedImage or route.category != "default"
+    ):
+        return None
+    answer: Optional[DirectAnswer] = knowledge_base.direct_answer(request.message)
+    if answer is None:
+        return None
+    text = f"**{answer.title.upper()}**: {answer.text}" if answer.source == "glossary" else answer.text
+    return ChatResponse(
+        text=text,
+        type="text",
+        modelUsed="knowledge-base",
+        modelName="Murukku Knowledge Base",
+        meta={"source": answer.source, "title": answer.title, "promptTokens": 0}
+    )
+
+
+def knowledge_notes(request: ChatRequest) -> tuple[str, List[str]]:
+    """Top syllabus passages for the message as prompt notes, and their titles for meta"""
+    if knowledge_base is None or not KNOWLEDGE_TOP_K:
+        return "", []
+    hits = knowledge_base.search(request.message, KNOWLEDGE_TOP_K, KNOWLEDGE_MIN_SCORE)
+    return format_passages(hits), [hit.passage.title for hit in hits]
+
+
+def chat_meta(system_prompt: RenderedPrompt, request: ChatRequest, history: Optional[History],
+              notes: str, sources: List[str]) -> Dict[str, Any]:
+    """prompt_meta plus the syllabus passages that were injected"""
+    meta = prompt_meta(system_prompt, request.message, history)
+    if sources:
+        meta["promptTokens"] += estimate_tokens(notes)
+        meta["knowledge"] = sources
+    return meta
+
+
+def history_budget(model_id: str) -> int:
+    """Session history tokens sent to this model before older turns are summarized"""
+    return SESSION_HISTORY_BUDGETS.get(MODEL_CATEGORIES.get(model_id), SESSION_HISTORY_TOKENS)
+
+
+async def summarize_turns(summary: str, turns: List[Dict]) -> str:
+    """Fold turns into the running summary with the summary model; extractive if that fails"""
+    messages = [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": transcript(summary, turns)},
+    ]
+    try:
+        text, _ = await complete_with_fallback(
+            SESSION_SUMMARY_MODEL, messages, temperature=0.2, max_tokens=SESSION_SUMMARY_TOKENS,
+            priority=LENGTH_PRIORITY[LENGTH_DETAILED]
+        )
+        if text.strip():
+            return text.strip()
+    except HTTPException:
+        pass
+    return extractive_summary(summary, turns, SESSION_SUMMARY_TOKENS * 4)
+
+
+async def session_history(session_id: Optional[str], model_id: str) -> Optional[History]:
+    """History to send for this session, summarizing older turns first when over the model's budget"""
+    if not session_id:
+        return None
+    session = await run_store(session_store, session_store.get, session_id)
+    if session is None:
+        return History(summary="", turns=[], tokens=0, full_tokens=0)
+    
+    summarized = False
+    fold = turns_to_fold(session, history_budget(model_id))
+    if fold:
+        folded = session.turns[:fold]
+        summary = await summarize_turns(session.summary, folded)
+        session = await run_store(
+            session_store, session_store.fold, session_id, folded[-1]["seq"] + 1, summary, estimate_tokens
+        )
+        summarized = True
+    return History(
+        summary=session.summary,
+        turns=list(session.turns),
+        tokens=session.history_tokens,
+        full_tokens=session.total_tokens,
+        summarized=summarized,
+    )
+
+
+async def remember_turn(session_id: Optional[str], message: str, reply: str) -> None:
+    """Store the user turn and the reply in the session"""
+    if session_id:
+        turns = [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+        await run_store(session_store, session_store.append, session_id, turns, estimate_tokens)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition of latency, error, token and queue metrics"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Response cache hit/miss and request coalescing counters"""
+    stats = await run_store(response_cache, response_cache.stats) if response_cache is not None else {"backend": "off"}
+    if semantic_cache is not None:
+        stats["semantic"] = semantic_cache.stats()
+    if inflight is not None:
+        stats["coalescing"] = inflight.stats()
+    return stats
+
+
+def valid_session_id(session_id: str) -> bool:
+    """Issued by POST /api/sessions (on any worker), not chosen by the client"""
+    return len(session_id) <= SESSION_ID_MAX_LENGTH and is_session_id(session_id, session_id_secret)
+
+
+@app.post("/api/sessions")
+async def create_session():
+    """Start a conversation: send the returned sessionId with each /api/chat turn"""
+    return {"sessionId": new_session_id(session_id_secret)}
+
+
+@app.get("/api/sessions/stats")
+async def sessions_stats():
+    """Stored conversation sessions and how many history summaries were made"""
+    return await run_store(session_store, session_store.stats)
+
+
+@app.get("/api/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Stored turns and running summary of one conversation"""
+    session = await run_store(session_store, session_store.get, session_id) if valid_session_id(session_id) else None
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {
+        "sessionId": session_id,
+        "summary": session.summary,
+        "turns": [{"role": turn["role"], "content": turn["content"]} for turn in session.turns],
+        "historyTokens": session.history_tokens,
+        "fullHistoryTokens": session.total_tokens,
+    }
+
+
+@app.delete("/api/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Forget a conversation"""
+    if not valid_session_id(session_id) or not await run_store(session_store, session_store.delete, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"deleted": session_id}
+
+
+@app.get("/api/knowledge/stats")
+async def knowledge_stats():
+    """Knowledge base size, retrieval queries and locally answered questions"""
+    return knowledge_base.stats() if knowledge_base is not None else {"enabled": False}
+
+
+@app.get("/api/knowledge/search")
+async def knowledge_search(q: str, k: int = 5):
+    """Top passages for a query, with BM25 scores (for tuning KNOWLEDGE_MIN_SCORE)"""
+    if knowledge_base is None:
+        raise HTTPException(status_code=404, detail="Knowledge base is disabled")
+    return {
+        "results": [
+            {"kind": hit.passage.kind, "title": hit.passage.title, "text": hit.passage.text, "score": round(hit.score, 3)}
+            for hit in knowledge_base.search(q, min(k, 20))
+        ]
+    }
+
+
+@app.get("/api/usage/stats")
+async def usage_stats():
+    """Upstream token usage, including prompt tokens served from provider caches"""
+    return usage_tracker.stats()
+
+
+@app.get("/api/scheduler/stats")
+async def scheduler_stats():
+    """Upstream queue depth, wait times, per-model admitted/rejected counts and aborted requests"""
+    stats = scheduler.stats() if scheduler is not None else {"enabled": False}
+    return {**stats, "aborted": request_guard.stats()}
+
+
+@app.get("/api/models/stats")
+async def models_stats():
+    """Rolling per-model latency percentiles and error rates, plus fallback/hedge counters"""
+    return model_router.snapshot()
+
+
+@app.get("/api/prompts/stats")
+async def prompts_stats():
+    """Boilerplate token counts per prompt family and template memo hit rate"""
+    return prompt_stats()
+
+
+def route_deadline(route: Route) -> float:
+    """Deadline for a routed chat turn: code, math and images by category, the rest by expected length"""
+    kind = {"code": "code", "math": "reasoning", "vision": "vision"}.get(route.category, route.length)
+    return REQUEST_DEADLINES[kind]
+
+
+def chat_deadline() -> Deadline:
+    """Deadline for a chat turn before routing; complete_chat tightens it to the route's"""
+    return Deadline(max(REQUEST_DEADLINES.values()))
+
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request):
+    """Main chat endpoint with auto-detection"""
+    return await request_guard.run(complete_chat(request), chat_deadline(), http_request)
+
+
+@app.post("/api/chat/upload", response_model=ChatResponse)
+async def chat_upload(
+    http_request: Request,
+    message: str,
+    model: Optional[str] = None,
+    sessionId: Optional[str] = None,
+    context: UserContext = Depends()
+):
+    """Chat about an image sent as the raw request body (Content-Type: image/*) instead of base64 JSON"""
+    image_url = await read_image_upload(http_request)
+    request = ChatRequest(message=message, model=model, sessionId=sessionId, context=context)
+    return await request_guard.run(complete_chat(request, image_url), chat_deadline(), http_request)
+
+
+async def complete_chat(request: ChatRequest, image_url: Optional[str] = None) -> ChatResponse:
+    """Route, prompt and answer one chat turn"""
+    
+    with phase("route"):
+        route = route_chat(request, image_url)
+    limit_deadline(route_deadline(route))
+    model_id, model_name = route.model_id, route.model_name
+    if model_id == "IMAGE_GENERATION":
+        image_response = image_chat_response(request.message, route)
+        await remember_turn(request.sessionId, request.message, image_response.text)
+        return image_response
+    
+    with phase("retrieve"):
+        local = knowledge_answer(request, route, image_url)
+        if local is not None:
+            await remember_turn(request.sessionId, request.message, local.text)
+            return local
+        notes, sources = knowledge_notes(request)
+    with phase("history"):
+        history = await session_history(request.sessionId, model_id)
+    with phase("prompt"):
+        system_prompt = chat_system_prompt(request, route)
+        messages = build_chat_messages(request, route, system_prompt, image_url, history, notes)
+    max_tokens, budget = chat_max_tokens(route)
+    chat_routes.inc((route.length, model_id))
+    chat_max_tokens_budget.inc((budget,), max_tokens)
     
     try:
-        response_text = await call_openrouter(model_id, messages, temperature)
-        
-        # Determine response type
-        response_type = "text"
-        if "```" in response_text and "coder" in model_id.lower():
-            response_type = "code"
-        elif len(response_text) > 1200:
-            response_type = "notes"
-        
+        start = time.perf_counter()
+        with phase("upstream"):
+            response_text, used = await complete_with_fallback(
+                model_id, messages, chat_temperature(model_id), max_tokens,
+                priority=LENGTH_PRIORITY[route.length]
+            )
+        chat_upstream_duration.observe((route.length, used), time.perf_counter() - start)
+        model_used, model_name = answered_by(model_id, model_name, used)
+        with phase("classify"):
+            response_type = classify_response(response_text, model_used)
+        await remember_turn(request.sessionId, request.message, response_text)
         return ChatResponse(
             text=response_text,
             type=response_type,
-            modelUsed=model_id,
-            modelName=model_name
+            modelUsed=model_used,
+            modelName=model_name,
+            meta=chat_meta(system_prompt, request, history, notes, sources)
         )
     
     except HTTPException:
@@ -442,9 +1459,98 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """Streaming chat endpoint (Server-Sent Events)"""
+    
+    route = route_chat(request)
+    deadline = Deadline(route_deadline(route))
+    model_id, model_name = route.model_id, route.model_name
+    local = image_chat_response(request.message, route) if model_id == "IMAGE_GENERATION" else knowledge_answer(request, route)
+    if local is not None:
+        await remember_turn(request.sessionId, request.message, local.text)
+        
+        async def local_events():
+            yield sse_event({"text": local.text})
+            yield sse_event(local.model_dump(exclude={"text"}), event="done")
+        
+        return StreamingResponse(local_events(), media_type="text/event-stream")
+    
+    notes, sources = knowledge_notes(request)
+    history = await session_history(request.sessionId, model_id)
+    system_prompt = chat_system_prompt(request, route)
+    messages = build_chat_messages(request, route, system_prompt, history=history, notes=notes)
+    max_tokens, budget = chat_max_tokens(route)
+    chat_routes.inc((route.length, model_id))
+    chat_max_tokens_budget.inc((budget,), max_tokens)
+    return stream_chat_response(
+        http_request, model_id, model_name, messages, chat_temperature(model_id),
+        priority=LENGTH_PRIORITY[route.length],
+        max_tokens=max_tokens,
+        on_done=lambda text: remember_turn(request.sessionId, request.message, text),
+        meta=chat_meta(system_prompt, request, history, notes, sources) if history is not None or sources else None,
+        deadline=deadline
+    )
+
+
+@app.post("/api/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest, http_request: Request):
+    """
+    Answer many chat requests in one call. Items are routed and answered like /api/chat,
+    BATCH_CONCURRENCY at a time, through the same upstream client, caches and scheduler.
+    Each item gets its own deadline once it starts. A failing item yields an error entry
+    instead of failing the batch.
+    """
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {BATCH_MAX_ITEMS} items")
+    
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def run(index: int, item: ChatRequest) -> BatchItemResult:
+        async with slots:
+            try:
+                return BatchItemResult(index=index, response=await request_guard.run(complete_chat(item), chat_deadline()))
+            except HTTPException as e:
+                return BatchItemResult(index=index, error={"status": e.status_code, "detail": e.detail})
+            except Exception as e:
+                return BatchItemResult(index=index, error={"status": 500, "detail": str(e)})
+    
+    if not request.stream:
+        results = asyncio.gather(*[run(index, item) for index, item in enumerate(request.items)])
+        return BatchChatResponse(results=await request_guard.run(results, None, http_request))
+    
+    async def lines():
+        tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(request.items)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                yield fastjson.dumps(result.model_dump(exclude_none=True)) + b"\n"
+        finally:
+            # Client went away mid-batch - stop paying for the remaining items
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @app.post("/api/vision")
-async def analyze_image(request: VisionRequest):
+async def analyze_image(request: VisionRequest, http_request: Request):
     """Analyze an image using vision model"""
+    return await request_guard.run(
+        describe_image(request.prompt, f"data:{request.mimeType};base64,{request.image}"),
+        Deadline(REQUEST_DEADLINES["vision"]), http_request
+    )
+
+
+@app.post("/api/vision/upload")
+async def analyze_image_upload(http_request: Request, prompt: str):
+    """Analyze an image sent as the raw request body (Content-Type: image/*), streamed instead of base64 JSON"""
+    image_url = await read_image_upload(http_request)
+    return await request_guard.run(describe_image(prompt, image_url), Deadline(REQUEST_DEADLINES["vision"]), http_request)
+
+
+async def describe_image(prompt: str, image_url: str) -> Dict[str, str]:
+    """Vision model answer for one image"""
     
     model_id = MODEL_CATALOG["vision"]["llava"]
     
@@ -452,98 +1558,161 @@ async def analyze_image(request: VisionRequest):
         {
             "role": "user",
             "content": [
-                {"type": "text", "text": request.prompt},
-                {"type": "image_url", "image_url": {"url": f"data:{request.mimeType};base64,{request.image}"}}
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_url}}
             ]
         }
     ]
     
     try:
-        response_text = await call_openrouter(model_id, messages)
+        with phase("upstream"):
+            response_text, used = await complete_with_fallback(model_id, messages)
+        model_used, model_name = answered_by(model_id, "LLaMA 3.2 Vision 11B", used)
         return {
             "description": response_text,
-            "modelUsed": model_id,
-            "modelName": "LLaMA 3.2 Vision 11B"
+            "modelUsed": model_used,
+            "modelName": model_name
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/code")
-async def generate_code(request: ChatRequest):
+async def generate_code(request: ChatRequest, http_request: Request):
     """Generate code using coding specialist model"""
     
     model_id = MODEL_CATALOG["coding"]["qwen"]
     context = request.context or UserContext()
     
-    system_prompt = """You are an expert programmer and coding assistant.
-Provide clean, well-commented, production-ready code.
-Explain your approach briefly.
-Include example usage where helpful.
-Mention time/space complexity for algorithms."""
-    
     messages = [
-        {"role": "system", "content": system_prompt},
+        system_message(CODE_PROMPT),
         {"role": "user", "content": request.message}
     ]
     
     try:
-        response_text = await call_openrouter(model_id, messages, temperature=0.3)
+        with phase("upstream"):
+            response_text, used = await request_guard.run(
+                complete_with_fallback(model_id, messages, temperature=0.3, priority=LENGTH_PRIORITY[LENGTH_DETAILED]),
+                Deadline(REQUEST_DEADLINES["code"]), http_request
+            )
+        model_used, model_name = answered_by(model_id, "Qwen3 Coder (FREE)", used)
         return ChatResponse(
             text=response_text,
             type="code",
-            modelUsed=model_id,
-            modelName="Qwen3 Coder (FREE)"
+            modelUsed=model_used,
+            modelName=model_name,
+            meta=prompt_meta(CODE_PROMPT, request.message)
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/reasoning")
-async def solve_problem(request: ChatRequest):
+async def solve_problem(request: ChatRequest, http_request: Request):
     """Solve math/logic problems using reasoning model"""
     
     model_id = MODEL_CATALOG["reasoning"]["deepseek_r1"]
     
-    system_prompt = """You are a mathematical and logical reasoning expert.
-Break down complex problems step by step.
-Show your work clearly.
-Double-check calculations before providing final answers.
-Use clear notation and formatting."""
-    
     messages = [
-        {"role": "system", "content": system_prompt},
+        system_message(REASONING_PROMPT),
         {"role": "user", "content": request.message}
     ]
     
     try:
-        response_text = await call_openrouter(model_id, messages, temperature=0.2)
+        with phase("upstream"):
+            response_text, used = await request_guard.run(
+                complete_with_fallback(model_id, messages, temperature=0.2, priority=LENGTH_PRIORITY[LENGTH_DETAILED]),
+                Deadline(REQUEST_DEADLINES["reasoning"]), http_request
+            )
+        model_used, model_name = answered_by(model_id, "DeepSeek R1 (FREE)", used)
         return ChatResponse(
             text=response_text,
             type="text",
-            modelUsed=model_id,
-            modelName="DeepSeek R1 (FREE)"
+            modelUsed=model_used,
+            modelName=model_name,
+            meta=prompt_meta(REASONING_PROMPT, request.message)
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/code/stream")
+async def generate_code_stream(request: ChatRequest, http_request: Request):
+    """Streaming variant of /api/code (Server-Sent Events)"""
+    
+    model_id = MODEL_CATALOG["coding"]["qwen"]
+    messages = [
+        system_message(CODE_PROMPT),
+        {"role": "user", "content": request.message}
+    ]
+    return stream_chat_response(
+        http_request, model_id, "Qwen3 Coder (FREE)", messages, 0.3, response_type="code",
+        priority=LENGTH_PRIORITY[LENGTH_DETAILED], deadline=Deadline(REQUEST_DEADLINES["code"])
+    )
+
+
+@app.post("/api/reasoning/stream")
+async def solve_problem_stream(request: ChatRequest, http_request: Request):
+    """Streaming variant of /api/reasoning (Server-Sent Events)"""
+    
+    model_id = MODEL_CATALOG["reasoning"]["deepseek_r1"]
+    messages = [
+        system_message(REASONING_PROMPT),
+        {"role": "user", "content": request.message}
+    ]
+    return stream_chat_response(
+        http_request, model_id, "DeepSeek R1 (FREE)", messages, 0.2, response_type="text",
+        priority=LENGTH_PRIORITY[LENGTH_DETAILED], deadline=Deadline(REQUEST_DEADLINES["reasoning"])
+    )
+
+
 @app.get("/api/generate-image")
-async def generate_image(prompt: str, model: str = None):
+async def generate_image(request: Request, prompt: str, model: str = None):
     """Generate image URL from prompt with auto-model selection"""
     image_result = generate_image_url(prompt, model)
     return {
-        "url": image_result['url'],
+        **image_links(image_result['url'], PUBLIC_API_URL or str(request.base_url).rstrip("/")),
         "prompt": image_result['prompt'],
         "model": image_result['model'],
         "modelName": image_result['modelName']
     }
 
 
+@app.get("/api/images/stats")
+async def images_stats():
+    """Pre-warmed image cache size, hit rate and fetch counters"""
+    return image_prewarmer.stats() if image_prewarmer is not None else {"enabled": False}
+
+
+@app.get("/api/images/{key}")
+async def cached_image(key: str):
+    """Pre-warmed image bytes; redirects to Pollinations while our copy is unavailable"""
+    if image_prewarmer is None:
+        raise HTTPException(status_code=404, detail="Image pre-warming is disabled")
+    try:
+        image = await asyncio.wait_for(image_prewarmer.get(key), IMAGE_PREWARM_TIMEOUT)
+    except (asyncio.TimeoutError, httpx.HTTPError, ValueError):
+        image = None
+    if image is None:
+        source = image_prewarmer.source(key)
+        if source is None:
+            raise HTTPException(status_code=404, detail="Unknown image")
+        return RedirectResponse(source, status_code=307)
+    body, content_type = image
+    return Response(body, media_type=content_type, headers={"Cache-Control": "public, max-age=86400, immutable"})
+
+
 # ============================================================================
 # RUN SERVER
 # ============================================================================
 
 if __name__ == "__main__":
+    # Development server; production runs gunicorn with gunicorn.conf.py (see Procfile)
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "8000")), reload=True)
@@ -0,0 +1,253 @@
+"""
+Prometheus metrics and per-request phase timing
+Dependency-free counters, gauges and histograms rendered in the text exposition format,
+plus an ASGI middleware for endpoint latency, errors, in-flight requests and Server-Timing
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+
+INF_BUCKET = 'le="+Inf"'
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+
+    def lines(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        yield from self.lines()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def lines(self) -> Iterator[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, labels: Labels, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self.series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def lines(self) -> Iterator[str]:
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, INF_BUCKET)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total[0])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class CallbackMetric(Metric):
+    """Counter or gauge read from existing stats objects at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        type: str,
+        labelnames: Tuple[str, ...],
+        collect: Callable[[], Iterable[Tuple[Labels, float]]],
+    ):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def lines(self) -> Iterator[str]:
+        for labels, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), **kwargs) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, **kwargs))
+
+    def callback(self, name: str, help: str, type: str, labelnames: Tuple[str, ...], collect) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, type, labelnames, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# PER-REQUEST TIMING
+# ============================================================================
+
+class RequestTiming:
+    """Durations of the named phases of one request"""
+
+    __slots__ = ("start", "phases")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("current_timing", default=None)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block as one phase of the current request (no-op outside a request)"""
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (streaming responses and disconnect detection are untouched):
+    endpoint latency by status, error counts, in-flight gauge, phase histograms and,
+    optionally, a Server-Timing header.
+    """
+
+    def __init__(
+        self,
+        app,
+        duration: Histogram,
+        phases: Histogram,
+        errors: Counter,
+        in_flight: Gauge,
+        server_timing: bool = False,
+    ):
+        self.app = app
+        self.duration = duration
+        self.phases = phases
+        self.errors = errors
+        self.in_flight = in_flight
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = timing.server_timing(time.perf_counter() - timing.start)
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            self.in_flight.dec()
+            current_timing.reset(token)
+            total = time.perf_counter() - timing.start
+            route = scope.get("route")
+            endpoint = route.path if route is not None else "unmatched"
+            self.duration.observe((endpoint, scope["method"], str(status)), total)
+            if status >= 400:
+                self.errors.inc((endpoint, str(status)))
+            upstream = timing.phases.get("upstream", 0.0)
+            for name, seconds in timing.phases.items():
+                self.phases.observe((endpoint, name), seconds)
+            self.phases.observe((endpoint, "local"), total - upstream)
@@ -0,0 +1,213 @@
+"""
+System prompt templates for Murukku AI
+Static sections are rendered once at import and always come first; only the trailing
+user profile and length guidance vary per request
+"""
+
+import re
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Dict, Tuple
+
+from routing import LENGTH_DETAILED, LENGTH_MODERATE, LENGTH_SHORT
+
+# ============================================================================
+# STATIC SEGMENTS
+# ============================================================================
+
+PERSONALITY = """You are **Murukku AI** (முருக்கு AI) 🍘, an elite AI Academic Companion for Anna University students.
+
+CORE PERSONALITY:
+- You are a friendly "அண்ணா" (Anna/Big Brother) who naturally mixes Tamil script (தமிழ்) with Tanglish
+- Be warm, encouraging, and supportive like a real senior helping juniors
+- Use Tamil greetings: வணக்கம் (Vanakkam), என்ன மாச்சி (Enna Machi)
+- Use encouragements: சூப்பர் (Super), கலக்கல் (Kalakkal), செம்ம (Semma), அருமை (Arumai)
+"""
+
+RESPONSE_STYLE = """RESPONSE STYLE:
+- Start with a Tamil greeting or phrase
+- Use **Bold** for key terminology and definitions
+- Add "📝 Exam Tip:" or "💡 Pro Tip:" for important insights
+- End academic answers with "புரியுதா? சந்தேகம் கேளு!" (Understood? Ask doubts!)
+"""
+
+TAMIL_PHRASES = """TAMIL PHRASES TO USE:
+- வணக்கம் (Vanakkam) - Hello
+- நன்றி (Nandri) - Thank you
+- சூப்பர் (Super) - Great
+- கலக்கல் (Kalakkal) - Awesome
+- செம்ம (Semma) - Fantastic
+- புரியுதா (Puriyutha) - Do you understand?
+- சந்தேகம் கேளு (Sandhegam Kelu) - Ask your doubts
+- படிச்சா ஜெயி! (Padichaa Jeyi!) - Study and win!
+"""
+
+CODING_MODE = """
+CODING MODE ACTIVATED:
+- Provide clean, well-commented, production-ready code
+- Use proper indentation and follow best practices
+- Explain the logic step-by-step
+- Include example usage where helpful
+- Mention time/space complexity for algorithms
+"""
+
+REASONING_MODE = """
+REASONING MODE ACTIVATED:
+- Break down complex problems step by step
+- Show your mathematical/logical work clearly
+- Double-check calculations before final answers
+- Use clear notation and formatting
+"""
+
+# Fixed system prompts for the specialist endpoints
+CODE_SYSTEM_PROMPT = """You are an expert programmer and coding assistant.
+Provide clean, well-commented, production-ready code.
+Explain your approach briefly.
+Include example usage where helpful.
+Mention time/space complexity for algorithms."""
+
+REASONING_SYSTEM_PROMPT = """You are a mathematical and logical reasoning expert.
+Break down complex problems step by step.
+Show your work clearly.
+Double-check calculations before providing final answers.
+Use clear notation and formatting."""
+
+# Folds older conversation turns into the running session summary
+SUMMARY_SYSTEM_PROMPT = """Summarize this tutoring conversation for the tutor's own memory.
+Keep the student's goals, the topics and subjects covered, definitions or results given,
+code or formulas the student may refer back to, and open questions.
+Write at most 150 words of plain notes. No greeting, no commentary."""
+
+# ============================================================================
+# PER-REQUEST SLOTS
+# ============================================================================
+
+PROFILE_TEMPLATE = """USER PROFILE:
+- Name: {name}
+- Learning Style: {learning_style}
+- Career Goal: {career_goal}
+- Department: {department}
+- Semester: {semester}
+"""
+
+RESPONSE_GUIDANCE = {
+    LENGTH_SHORT: "RESPONSE LENGTH: Keep it SHORT (1-3 sentences). Be friendly and warm with Tamil flavor.",
+    LENGTH_DETAILED: "RESPONSE LENGTH: Be DETAILED. Use bullet points, examples, code comments, and structured format.",
+    LENGTH_MODERATE: "RESPONSE LENGTH: MODERATE (5-10 sentences). Clear and helpful.",
+}
+
+# ============================================================================
+# TOKEN ESTIMATE
+# ============================================================================
+
+# Rough BPE stand-in: ~4 ASCII letters per token, every other symbol (Tamil, emoji, punctuation) one token
+TOKEN_PIECE = re.compile(r"[A-Za-z]{1,4}|\d{1,3}|\S")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate prompt token count without a tokenizer dependency"""
+    return len(TOKEN_PIECE.findall(text))
+
+
+# ============================================================================
+# RENDERING
+# ============================================================================
+
+FAMILY_DEFAULT = "default"
+FAMILY_CODING = "coding"
+FAMILY_REASONING = "reasoning"
+FAMILY_CODING_REASONING = "coding+reasoning"
+
+
+def model_family(model_id: str) -> str:
+    """Which mode blocks a model gets (DeepSeek R1 variants get both)"""
+    model_id = model_id.lower()
+    coding = "coder" in model_id or "deepseek" in model_id
+    reasoning = "r1" in model_id or "reasoning" in model_id
+    if coding and reasoning:
+        return FAMILY_CODING_REASONING
+    if coding:
+        return FAMILY_CODING
+    if reasoning:
+        return FAMILY_REASONING
+    return FAMILY_DEFAULT
+
+
+# All instructions that do not depend on the user, pre-rendered once per model family.
+# This is the first segment of every system prompt, byte-identical across users, so
+# providers with prompt caching can reuse it.
+STATIC_PREFIXES: Dict[str, str] = {
+    family: f"{PERSONALITY}\n{RESPONSE_STYLE}\n{TAMIL_PHRASES}{modes}"
+    for family, modes in (
+        (FAMILY_DEFAULT, ""),
+        (FAMILY_CODING, CODING_MODE),
+        (FAMILY_REASONING, REASONING_MODE),
+        (FAMILY_CODING_REASONING, CODING_MODE + REASONING_MODE),
+    )
+}
+
+STATIC_TOKENS: Dict[str, int] = {
+    family: estimate_tokens(prefix) for family, prefix in STATIC_PREFIXES.items()
+}
+
+
+@dataclass(frozen=True)
+class RenderedPrompt:
+    static: str  # shared instruction block (cacheable prefix)
+    dynamic: str  # user profile + length guidance, always after the static block
+    tokens: int  # estimated tokens in the whole system prompt
+    static_tokens: int  # of which boilerplate shared by every request of this model family
+
+    @cached_property
+    def text(self) -> str:
+        return self.static + self.dynamic
+
+
+def profile_key(name, learning_style, career_goal, department, semester) -> Tuple[str, ...]:
+    """Normalise UserContext fields (with their defaults) into a hashable memo key"""
+    return (
+        name or "Machi",
+        learning_style or "Visual",
+        career_goal or "Placement",
+        department or "Engineering",
+        semester or "Not specified",
+    )
+
+
+@lru_cache(maxsize=4096)
+def render_system_prompt(profile: Tuple[str, ...], family: str, length: str) -> RenderedPrompt:
+    """Append the profile and guidance slots after the pre-rendered static prefix"""
+    name, learning_style, career_goal, department, semester = profile
+    user_profile = PROFILE_TEMPLATE.format(
+        name=name,
+        learning_style=learning_style,
+        career_goal=career_goal,
+        department=department,
+        semester=semester,
+    )
+    dynamic = f"\n{user_profile}\n{RESPONSE_GUIDANCE[length]}\n"
+    return RenderedPrompt(
+        STATIC_PREFIXES[family], dynamic,
+        STATIC_TOKENS[family] + estimate_tokens(dynamic), STATIC_TOKENS[family]
+    )
+
+
+def render_fixed_prompt(text: str) -> RenderedPrompt:
+    """Specialist endpoint prompts are entirely boilerplate"""
+    tokens = estimate_tokens(text)
+    return RenderedPrompt(text, "", tokens, tokens)
+
+
+CODE_PROMPT = render_fixed_prompt(CODE_SYSTEM_PROMPT)
+REASONING_PROMPT = render_fixed_prompt(REASONING_SYSTEM_PROMPT)
+
+
+def prompt_stats() -> Dict[str, object]:
+    """Static segment sizes and memo cache effectiveness"""
+    info = render_system_prompt.cache_info()
+    return {
+        "staticTokens": dict(STATIC_TOKENS),
+        "codePromptTokens": CODE_PROMPT.tokens,
+        "reasoningPromptTokens": REASONING_PROMPT.tokens,
+        "renderCache": {"hits": info.hits, "misses": info.misses, "entries": info.currsize},
+    }
@@ -0,0 +1,197 @@
+"""
+Single-pass message routing
+One trie-compiled keyword pattern classifies a message for model, image model, style and response length
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+# ============================================================================
+# KEYWORD TABLES
+# ============================================================================
+
+# Model detection (checked in this priority order)
+CODE_KEYWORDS = (
+    "code", "coding", "function", "class", "debug", "error", "bug", "fix", "algorithm", "compile",
+    "syntax", "javascript", "python", "java", "c++", "typescript", "html", "css", "react", "node",
+    "sql", "api", "loop", "array", "variable", "method", "import", "export", "const", "let", "var",
+    "async", "await", "promise", "callback", "component", "hook", "usestate", "useeffect", "npm",
+    "yarn", "git", "github", "programming", "developer", "script", "snippet",
+)
+MATH_KEYWORDS = (
+    "calculate", "solve", "equation", "formula", "math", "algebra", "calculus", "statistics",
+    "probability", "derivative", "integral", "proof", "theorem", "number", "percentage", "fraction",
+    "decimal", "geometry", "trigonometry", "logarithm", "exponent", "matrix", "vector", "graph", "plot",
+)
+IMAGE_KEYWORDS = (
+    "draw", "generate", "create", "show me", "visualize", "picture", "image", "photo", "diagram",
+    "sketch", "illustration", "render", "design", "art", "artwork", "portrait", "landscape", "anime",
+    "cartoon", "realistic", "fantasy", "sci-fi", "generate an image", "create an image",
+    "make an image", "draw me",
+)
+
+# Response length classification
+GREETING_KEYWORDS = ("hi", "hello", "hey", "vanakkam", "thanks", "ok", "bye", "nandri")
+DETAIL_KEYWORDS = ("explain", "describe", "how", "why", "what is", "elaborate", "steps", "process")
+CODE_REQUEST_KEYWORDS = ("code", "program", "implement", "write", "function", "script")
+
+# Image model selection (first match in this order wins, default FLUX)
+IMAGE_MODEL_KEYWORDS = {
+    "sdxl": ("sdxl", "stable diffusion"),
+    "realistic": (
+        "realistic", "photo", "photos", "photograph", "portrait", "portraits",
+        "person", "face", "faces", "human", "humans",
+    ),
+    "juggernaut": ("juggernaut", "detailed", "hyper"),
+    "dreamshaper": (
+        "dream", "dreams", "dreamy", "dreamlike", "fantasy", "surreal",
+        "artistic", "abstract", "creative",
+    ),
+    "flux": ("anime", "manga", "ghibli", "cartoon"),
+}
+IMAGE_MODEL_NAMES = {
+    "sdxl": "Stable Diffusion XL",
+    "realistic": "Realistic Vision",
+    "juggernaut": "Juggernaut XL",
+    "dreamshaper": "DreamShaper",
+    "flux": "FLUX",
+}
+
+# Image style selection (first match in this order wins, default "digital_art")
+STYLE_KEYWORDS = {
+    "circuit": ("circuit", "circuits", "schematic", "wiring", "pcb"),
+    "diagram": ("flowchart", "flowcharts", "uml", "process", "algorithm", "algorithms"),
+    "anime": ("anime", "manga", "ghibli"),
+    "photo": ("realistic", "photo", "photos", "photograph", "portrait", "portraits"),
+    "dream": ("dream", "dreams", "dreamy", "dreamlike", "fantasy", "surreal"),
+}
+
+LENGTH_SHORT = "SHORT"
+LENGTH_MODERATE = "MODERATE"
+LENGTH_DETAILED = "DETAILED"
+
+
+def keyword_labels() -> Dict[str, FrozenSet[str]]:
+    """Every keyword mapped to all the labels it contributes"""
+    groups = [
+        ("code", CODE_KEYWORDS),
+        ("math", MATH_KEYWORDS),
+        ("image", IMAGE_KEYWORDS),
+        ("greeting", GREETING_KEYWORDS),
+        ("detail", DETAIL_KEYWORDS),
+        ("code_request", CODE_REQUEST_KEYWORDS),
+    ]
+    groups += [(f"image_model:{key}", words) for key, words in IMAGE_MODEL_KEYWORDS.items()]
+    groups += [(f"style:{key}", words) for key, words in STYLE_KEYWORDS.items()]
+
+    labels: Dict[str, set] = {}
+    for label, words in groups:
+        for word in words:
+            labels.setdefault(word, set()).add(label)
+    return {word: frozenset(found) for word, found in labels.items()}
+
+
+def compile_keywords(keywords: Iterable[str]) -> re.Pattern:
+    """
+    Compile keywords into one pattern shaped like a trie, so each position in the
+    message branches on the next character instead of trying every keyword.
+    Lookarounds give word-boundary semantics that also work for "c++".
+    Longer keywords win ("generate an image" over "generate").
+    """
+    trie: Dict = {}
+    for word in keywords:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def to_regex(node: Dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + to_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A keyword ending here may continue into a longer one; backtracking falls
+        # back to the shorter keyword when the longer one is not followed by a boundary
+        return f"(?:{body})?" if terminal else body
+
+    return re.compile(rf"(?<!\w){to_regex(trie)}(?!\w)")
+
+
+# ============================================================================
+# ROUTER
+# ============================================================================
+
+@dataclass(frozen=True)
+class Route:
+    category: str  # "vision" | "code" | "math" | "image" | "default"
+    model_id: str
+    model_name: str
+    length: str  # LENGTH_SHORT | LENGTH_MODERATE | LENGTH_DETAILED
+    image_model: str
+    image_model_name: str
+    style: str
+
+
+class Router:
+    """
+    Classifies a message once and answers every routing question from the same labels.
+    length_models overrides the "default" category's model per response length, so
+    general chat that only needs a short answer can go to a smaller model.
+    """
+
+    CATEGORY_PRIORITY = ("code", "math", "image")
+
+    def __init__(
+        self,
+        route_models: Dict[str, Tuple[str, str]],
+        image_models: Dict[str, str],
+        length_models: Optional[Dict[str, Tuple[str, str]]] = None,
+    ):
+        self.route_models = route_models
+        self.image_models = image_models
+        self.length_models = length_models or {}
+        self._labels = keyword_labels()
+        self._pattern = compile_keywords(self._labels)
+
+    def labels(self, message: str) -> FrozenSet[str]:
+        """All labels whose keywords occur in the message (one scan over the lowercased text)"""
+        found = set()
+        for keyword in self._pattern.findall(message.lower()):
+            found |= self._labels[keyword]
+        return frozenset(found)
+
+    def route(self, message: str, has_image: bool = False) -> Route:
+        labels = self.labels(message)
+
+        if has_image:
+            category = "vision"
+        else:
+            category = next((c for c in self.CATEGORY_PRIORITY if c in labels), "default")
+        length = self._length(message, labels)
+        model_id, model_name = self.route_models[category]
+        if category == "default" and length in self.length_models:
+            model_id, model_name = self.length_models[length]
+
+        image_key = next((k for k in IMAGE_MODEL_KEYWORDS if f"image_model:{k}" in labels), "flux")
+        style = next((k for k in STYLE_KEYWORDS if f"style:{k}" in labels), "digital_art")
+
+        return Route(
+            category=category,
+            model_id=model_id,
+            model_name=model_name,
+            length=length,
+            image_model=self.image_models[image_key],
+            image_model_name=IMAGE_MODEL_NAMES[image_key],
+            style=style,
+        )
+
+    @staticmethod
+    def _length(message: str, labels: FrozenSet[str]) -> str:
+        """Adaptive response length: greetings and short messages get short answers"""
+        if "greeting" in labels or len(message.split()) < 5:
+            return LENGTH_SHORT
+        if "detail" in labels or "code_request" in labels:
+            return LENGTH_DETAILED
+        return LENGTH_MODERATE
@@ -0,0 +1,402 @@
+"""
+Upstream request scheduler
+Per-model token-bucket rate limits and concurrency caps, with a bounded priority wait queue
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+class SchedulerFull(HTTPException):
+    """
+    Raised instead of queueing when the wait queue is full or the wait ran out; answers
+    503 with Retry-After. Back-pressure from this process, so fallback never retries it.
+    """
+
+    def __init__(self, retry_after: int, reason: str = "Upstream queue is full"):
+        super().__init__(status_code=503, detail=reason, headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; rate 0 means unlimited"""
+
+    # Whether try_take()/delay() do I/O and must run off the event loop
+    blocking = False
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        if not self.rate:
+            return True
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self) -> float:
+        """Seconds until the next token is available"""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take_or_delay(self) -> Tuple[bool, float]:
+        """try_take(), and when that fails the delay() until the next token"""
+        if self.try_take():
+            return True, 0.0
+        return False, self.delay()
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    TokenBucket whose level lives in a SQLite file, so every worker process on the
+    host draws from one budget instead of each getting the full rate.
+    Each step is a write transaction that can wait on other workers' locks, so the
+    scheduler runs it in a thread (blocking = True).
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, key: str, rate: float, burst: int):
+        super().__init__(rate, burst)
+        self.path = path
+        self.key = key
+        self._pid = None
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """
+        Per-process connection, opened on first use (a connection must not cross a fork);
+        shared by the scheduler's threads under _lock
+        """
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, isolation_level=None, timeout=5, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    def _update(self, take: bool) -> Tuple[float, bool]:
+        """Refill, optionally take one token, and return (tokens left, taken) atomically"""
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (self.key,)).fetchone()
+                now = time.time()
+                tokens = float(self.burst) if row is None else min(
+                    self.burst, row[0] + max(0.0, now - row[1]) * self.rate
+                )
+                taken = take and tokens >= 1
+                if taken:
+                    tokens -= 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (self.key, tokens, now)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return tokens, taken
+
+    def try_take(self) -> bool:
+        if not self.rate:
+            return True
+        return self._update(take=True)[1]
+
+    def delay(self) -> float:
+        if not self.rate:
+            return 0.0
+        return max(0.0, (1 - self._update(take=False)[0]) / self.rate)
+
+    def take_or_delay(self) -> Tuple[bool, float]:
+        """One transaction instead of two when the take fails"""
+        if not self.rate:
+            return True, 0.0
+        tokens, taken = self._update(take=True)
+        return taken, 0.0 if taken else max(0.0, (1 - tokens) / self.rate)
+
+
+class _Lane:
+    """Scheduling state for one model"""
+
+    def __init__(self, bucket: TokenBucket, max_concurrency: int):
+        self.bucket = bucket
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.waiting: List[Tuple[int, int, asyncio.Future]] = []  # heap of (priority, seq, future)
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.dispatcher: Optional[asyncio.Task] = None  # blocking buckets: the running dispatch
+        self.redispatch = False
+        self.spare_token = False  # taken off-loop for a waiter that left meanwhile
+        self.admitted = 0
+        self.rejected = 0
+
+
+class UpstreamScheduler:
+    """
+    Gate in front of every upstream call.
+
+    - Each model gets its own token bucket (requests/second with a burst) and a cap
+      on concurrent requests.
+    - Callers that cannot start immediately wait in a per-model heap; lower priority
+      values go first, ties in arrival order.
+    - The total number of waiters is bounded; beyond that, or after `max_wait`
+      seconds in the queue, SchedulerFull is raised with a Retry-After hint.
+    - With `shared_path`, rate limits are kept in that SQLite file and shared by every
+      worker process; concurrency caps and queues stay per process. Those token checks
+      run in a thread, one dispatch task per model, so a busy file never stalls the loop.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: int = 20,
+        max_concurrency: int = 16,
+        max_queue: int = 200,
+        max_wait: float = 30.0,
+        window: int = 1000,
+        shared_path: Optional[str] = None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.shared_path = shared_path
+        self.lanes: Dict[str, _Lane] = {}
+        self.queued = 0
+        self.timeouts = 0
+        self.wait_times: deque = deque(maxlen=window)
+        self._seq = itertools.count()
+
+    def lane(self, model: str) -> _Lane:
+        if model not in self.lanes:
+            if self.shared_path:
+                bucket = SharedTokenBucket(self.shared_path, model, self.rate, self.burst)
+            else:
+                bucket = TokenBucket(self.rate, self.burst)
+            self.lanes[model] = _Lane(bucket, self.max_concurrency)
+        return self.lanes[model]
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: int = 0) -> AsyncIterator[None]:
+        await self.acquire(model, priority)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    async def acquire(self, model: str, priority: int = 0) -> None:
+        lane = self.lane(model)
+        start = time.monotonic()
+
+        # Fast path: nobody queued ahead and capacity available
+        if not lane.waiting and lane.active < lane.max_concurrency and await self._try_take(lane):
+            self._admit(lane, start)
+            return
+
+        if self.queued >= self.max_queue:
+            lane.rejected += 1
+            raise SchedulerFull(self.retry_after(lane))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.waiting, (priority, next(self._seq), future))
+        self.queued += 1
+        self._dispatch(lane)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self.timeouts += 1
+                lane.rejected += 1
+                raise SchedulerFull(self.retry_after(lane), "Timed out waiting for an upstream slot")
+        except asyncio.CancelledError:
+            # Client went away; hand back a slot we were granted in the meantime
+            if future.done() and not future.cancelled():
+                self.release(model)
+            else:
+                future.cancel()
+            raise
+        finally:
+            if not future.done() or future.cancelled():
+                self._discard(lane)
+        self.wait_times.append(time.monotonic() - start)
+
+    def release(self, model: str) -> None:
+        lane = self.lanes[model]
+        lane.active -= 1
+        self._dispatch(lane)
+
+    def retry_after(self, lane: _Lane) -> int:
+        """Seconds until the queue ahead of a new request should have drained"""
+        queued = len(lane.waiting) + 1
+        rate = lane.bucket.rate or math.inf
+        return max(1, math.ceil(queued / rate))
+
+    async def _try_take(self, lane: _Lane) -> bool:
+        """Fast-path token check; a blocking bucket holds a concurrency slot while its thread runs"""
+        if not lane.bucket.blocking:
+            return lane.bucket.try_take()
+        if lane.spare_token:
+            lane.spare_token = False
+            return True
+        lane.active += 1
+        taken = False
+        try:
+            taken = await asyncio.to_thread(lane.bucket.try_take)
+        finally:
+            lane.active -= 1
+            if not taken:
+                self._dispatch(lane)
+        return taken
+
+    def _admit(self, lane: _Lane, start: float) -> None:
+        lane.active += 1
+        lane.admitted += 1
+        self.wait_times.append(time.monotonic() - start)
+
+    def _discard(self, lane: _Lane) -> None:
+        """Drop cancelled futures from the heap and keep the queue count in step"""
+        live = [entry for entry in lane.waiting if not entry[2].done()]
+        self.queued -= len(lane.waiting) - len(live)
+        heapq.heapify(live)
+        lane.waiting = live
+        self._dispatch(lane)
+
+    def _dispatch(self, lane: _Lane) -> None:
+        """Grant slots to the best-priority waiters while concurrency and tokens allow"""
+        if lane.bucket.blocking:
+            if lane.dispatcher is None:
+                lane.dispatcher = asyncio.get_running_loop().create_task(self._dispatch_blocking(lane))
+            else:
+                lane.redispatch = True
+            return
+        while lane.waiting and lane.active < lane.max_concurrency:
+            future = lane.waiting[0][2]
+            if future.done():
+                heapq.heappop(lane.waiting)
+                self.queued -= 1
+                continue
+            if not lane.bucket.try_take():
+                if lane.timer is None:
+                    lane.timer = asyncio.get_running_loop().call_later(
+                        lane.bucket.delay(), self._on_refill, lane
+                    )
+                return
+            heapq.heappop(lane.waiting)
+            self.queued -= 1
+            lane.active += 1
+            lane.admitted += 1
+            future.set_result(None)
+
+    async def _dispatch_blocking(self, lane: _Lane) -> None:
+        """_dispatch for a blocking bucket: tokens are taken in a thread while a slot is held"""
+        try:
+            while True:
+                lane.redispatch = False
+                while lane.waiting and lane.active < lane.max_concurrency:
+                    if lane.waiting[0][2].done():
+                        heapq.heappop(lane.waiting)
+                        self.queued -= 1
+                        continue
+                    if lane.spare_token:
+                        taken, delay = True, 0.0
+                    else:
+                        lane.active += 1
+                        try:
+                            taken, delay = await asyncio.to_thread(lane.bucket.take_or_delay)
+                        except Exception as e:
+                            # Fail the waiter that would have been admitted, as the inline check would
+                            self._fail_head(lane, e)
+                            continue
+                        finally:
+                            lane.active -= 1
+                    lane.spare_token = False
+                    if not taken:
+                        if lane.timer is None:
+                            lane.timer = asyncio.get_running_loop().call_later(delay, self._on_refill, lane)
+                        break
+                    # The queue may have changed during the thread call; the best live waiter gets it
+                    while lane.waiting and lane.waiting[0][2].done():
+                        heapq.heappop(lane.waiting)
+                        self.queued -= 1
+                    if not lane.waiting:
+                        lane.spare_token = True
+                        break
+                    _, _, future = heapq.heappop(lane.waiting)
+                    self.queued -= 1
+                    lane.active += 1
+                    lane.admitted += 1
+                    future.set_result(None)
+                if not lane.redispatch:
+                    return
+        finally:
+            lane.dispatcher = None
+
+    def _fail_head(self, lane: _Lane, error: Exception) -> None:
+        while lane.waiting:
+            _, _, future = heapq.heappop(lane.waiting)
+            self.queued -= 1
+            if not future.done():
+                future.set_exception(error)
+                return
+
+    def _on_refill(self, lane: _Lane) -> None:
+        lane.timer = None
+        self._dispatch(lane)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self.wait_times)
+
+        def p(q: float) -> float:
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else 0.0
+
+        return {
+            "queueDepth": self.queued,
+            "maxQueue": self.max_queue,
+            "timeouts": self.timeouts,
+            "sharedRateLimit": bool(self.shared_path),
+            "waitMs": {
+                "avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "p50": p(0.50),
+                "p95": p(0.95),
+                "max": round(waits[-1] * 1000, 1) if waits else 0.0,
+            },
+            "models": {
+                model: {
+                    "active": lane.active,
+                    "queued": sum(1 for entry in lane.waiting if not entry[2].done()),
+                    "admitted": lane.admitted,
+                    "rejected": lane.rejected,
+                }
+                for model, lane in self.lanes.items()
+            },
+        }
@@ -0,0 +1,291 @@
+"""
+Semantic near-duplicate answer cache
+Embeds questions with a hashed n-gram vectorizer and serves stored answers for close paraphrases
+"""
+
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+# Question scaffolding that carries no topic - "explain deadlock" and "what is deadlock" should meet
+STOP_WORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "in", "on", "to", "for", "and", "or",
+    "what", "whats", "explain", "describe", "define", "tell", "me", "about", "please", "pls", "can",
+    "you", "give", "how", "does", "do", "i", "my", "with", "machi", "bro", "anna", "meaning",
+})
+
+
+class HashingVectorizer:
+    """CPU-only embedding: signed feature hashing of words, word bigrams and character n-grams"""
+
+    def __init__(self, dim: int = 256, char_ngrams: tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+
+    def features(self, text: str) -> List[str]:
+        words = [w for w in WORD_PATTERN.findall(text.lower()) if w not in STOP_WORDS]
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        low, high = self.char_ngrams
+        for word in words:
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self.features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def transform_batch(self, texts: List[str]) -> np.ndarray:
+        return np.stack([self.transform(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+
+class SemanticCache:
+    """
+    In-memory vector index with batched cosine search.
+
+    Rows are unit vectors, so cosine similarity is a single matrix product per block.
+    Past APPROXIMATE_FROM rows the full scan becomes memory-bound, so each row also
+    keeps a sign-bit code: candidates are shortlisted by Hamming distance and only
+    the shortlist is re-scored exactly.
+    Entries expire after `ttl`; when the entry or memory cap is reached the least
+    recently used row is evicted.
+
+    Rows are partitioned by model, a caller-supplied scope (whatever else shapes the
+    answer, e.g. a digest of the system prompt) and the numbers in the question:
+    "2 marks" and "16 marks" embed almost identically but want different answers.
+    """
+
+    SEARCH_BLOCK = 65536
+    APPROXIMATE_FROM = 50_000
+    APPROXIMATE_MAX_BATCH = 2
+    RERANK = 64
+
+    def __init__(
+        self,
+        thresholds: Dict[str, float],
+        vectorizer: Optional[HashingVectorizer] = None,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 3600.0,
+        min_words: int = 2,
+    ):
+        self.thresholds = thresholds
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.min_words = min_words
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        dim = self.vectorizer.dim
+        if dim % 64:
+            raise ValueError("vectorizer dim must be a multiple of 64")
+        self._vectors = np.zeros((min(1024, max_entries), dim), dtype=np.float32)
+        self._codes = np.zeros((len(self._vectors), dim // 64), dtype=np.uint64)
+        self._partition_ids = np.full(len(self._vectors), -1, dtype=np.int32)
+        self._expires = np.zeros(len(self._vectors), dtype=np.float64)
+        self._last_used = np.zeros(len(self._vectors), dtype=np.float64)
+        self._answers: List[Optional[str]] = [None] * len(self._vectors)
+        self._answer_bytes = 0
+        self._row_bytes = dim * 4 + dim // 8 + 4 + 8 + 8
+        self._count = 0
+        self._live = 0
+        self._free: List[int] = []
+        self._partitions: Dict[str, int] = {}
+        self._partition_names: Dict[int, str] = {}
+        self._partition_rows: Dict[int, int] = {}
+        self._free_partitions: List[int] = []
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ lookup
+
+    def lookup(self, model: str, category: str, text: str, scope: str = "") -> Optional[str]:
+        """Return a cached answer for a paraphrase of `text` within the same scope, if one is similar enough"""
+        threshold = self.thresholds.get(category)
+        if threshold is None or not self._cacheable(text):
+            return None
+        query = self.vectorizer.transform(text)
+        with self._lock:
+            slots, scores = self.search(query[None, :], self.partition(model, scope, text))
+            slot, score = int(slots[0]), float(scores[0])
+            if slot < 0 or score < threshold:
+                self.misses += 1
+                return None
+            self._last_used[slot] = time.monotonic()
+            self.hits += 1
+            return self._answers[slot]
+
+    @staticmethod
+    def partition(model: str, scope: str, text: str) -> str:
+        """Rows only match questions with the same model, scope and numbers"""
+        return "\x1f".join([model, scope, *NUMBER_PATTERN.findall(text)])
+
+    def search(self, queries: np.ndarray, partition: str) -> tuple[np.ndarray, np.ndarray]:
+        """Best live row of the partition and its cosine similarity for each query row (-1 where none)"""
+        best_slots = np.full(len(queries), -1, dtype=np.int64)
+        best_scores = np.full(len(queries), -np.inf, dtype=np.float32)
+        partition_id = self._partitions.get(partition)
+        if partition_id is None or self._count == 0:
+            return best_slots, best_scores
+
+        now = time.monotonic()
+        # One matrix product amortises the scan across a batch; the shortlist only wins for a few queries
+        if self._count >= self.APPROXIMATE_FROM and len(queries) <= self.APPROXIMATE_MAX_BATCH:
+            return self._search_approximate(queries, partition_id, now)
+
+        for start in range(0, self._count, self.SEARCH_BLOCK):
+            stop = min(start + self.SEARCH_BLOCK, self._count)
+            scores = queries @ self._vectors[start:stop].T
+            dead = (self._partition_ids[start:stop] != partition_id) | (self._expires[start:stop] < now)
+            scores[:, dead] = -np.inf
+            block_best = scores.argmax(axis=1)
+            block_scores = scores[np.arange(len(queries)), block_best]
+            better = block_scores > best_scores
+            best_scores[better] = block_scores[better]
+            best_slots[better] = block_best[better] + start
+        return best_slots, best_scores
+
+    def _search_approximate(self, queries: np.ndarray, partition_id: int, now: float) -> tuple[np.ndarray, np.ndarray]:
+        """Hamming shortlist over sign codes, exact cosine re-rank of the shortlist"""
+        best_slots = np.full(len(queries), -1, dtype=np.int64)
+        best_scores = np.full(len(queries), -np.inf, dtype=np.float32)
+        codes = self._codes[:self._count]
+        dead = (self._partition_ids[:self._count] != partition_id) | (self._expires[:self._count] < now)
+        shortlist = min(self.RERANK, self._count - 1)
+
+        for i, query in enumerate(queries):
+            distances = np.bitwise_count(codes ^ self._encode(query)).sum(axis=1, dtype=np.uint16)
+            distances[dead] = np.iinfo(np.uint16).max
+            candidates = np.argpartition(distances, shortlist)[:shortlist + 1]
+            candidates = candidates[~dead[candidates]]
+            if len(candidates) == 0:
+                continue
+            scores = self._vectors[candidates] @ query
+            best = scores.argmax()
+            best_slots[i], best_scores[i] = candidates[best], scores[best]
+        return best_slots, best_scores
+
+    @staticmethod
+    def _encode(vector: np.ndarray) -> np.ndarray:
+        return np.packbits(vector > 0).view(np.uint64)
+
+    # ------------------------------------------------------------------- store
+
+    def store(self, model: str, category: str, text: str, answer: str, scope: str = "") -> None:
+        """Remember the answer for `text` under this model and scope"""
+        if category not in self.thresholds or not self._cacheable(text):
+            return
+        self.store_vectors(self.partition(model, scope, text), self.vectorizer.transform(text)[None, :], [answer])
+
+    def store_vectors(self, partition: str, vectors: np.ndarray, answers: List[str]) -> None:
+        """Insert pre-computed unit vectors (used for bulk loads and benchmarks)"""
+        now = time.monotonic()
+        with self._lock:
+            for vector, answer in zip(vectors, answers):
+                slot = self._free_slot()
+                # After _free_slot: its eviction may release this very partition
+                partition_id = self._partition_id(partition)
+                self._vectors[slot] = vector
+                self._codes[slot] = self._encode(vector)
+                self._partition_ids[slot] = partition_id
+                self._expires[slot] = now + self.ttl
+                self._last_used[slot] = now
+                self._answers[slot] = answer
+                self._answer_bytes += len(answer)
+                self._partition_rows[partition_id] += 1
+                self._live += 1
+                while self.memory_bytes > self.max_bytes and self._live > 1:
+                    self._free.append(self._evict(keep=slot))
+
+    # ----------------------------------------------------------------- helpers
+
+    @property
+    def entries(self) -> int:
+        return self._live
+
+    @property
+    def memory_bytes(self) -> int:
+        """Live rows (vector + bookkeeping) plus stored answer text"""
+        return self._live * self._row_bytes + self._answer_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.entries,
+            "memoryBytes": self.memory_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _cacheable(self, text: str) -> bool:
+        return len(text.split()) >= self.min_words
+
+    def _partition_id(self, partition: str) -> int:
+        """Row label for a partition; ids of partitions whose rows are all gone are reused"""
+        partition_id = self._partitions.get(partition)
+        if partition_id is None:
+            partition_id = self._free_partitions.pop() if self._free_partitions else len(self._partitions)
+            self._partitions[partition] = partition_id
+            self._partition_names[partition_id] = partition
+            self._partition_rows[partition_id] = 0
+        return partition_id
+
+    def _free_slot(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._count < self.max_entries:
+            if self._count == len(self._vectors):
+                self._grow(min(len(self._vectors) * 2, self.max_entries))
+            self._count += 1
+            return self._count - 1
+        return self._evict()
+
+    def _evict(self, keep: int = -1) -> int:
+        """Drop the least recently used live row (expired rows first) and return its slot"""
+        last_used = self._last_used[:self._count].copy()
+        last_used[self._expires[:self._count] < time.monotonic()] = -np.inf
+        last_used[self._partition_ids[:self._count] < 0] = np.inf
+        if keep >= 0:
+            last_used[keep] = np.inf
+        slot = int(last_used.argmin())
+        self._answer_bytes -= len(self._answers[slot])
+        self._answers[slot] = None
+        self._release_partition(int(self._partition_ids[slot]))
+        self._partition_ids[slot] = -1
+        self._live -= 1
+        self.evictions += 1
+        return slot
+
+    def _release_partition(self, partition_id: int) -> None:
+        """One row of the partition is gone; forget the partition with its last row"""
+        self._partition_rows[partition_id] -= 1
+        if self._partition_rows[partition_id] == 0:
+            del self._partition_rows[partition_id]
+            del self._partitions[self._partition_names.pop(partition_id)]
+            self._free_partitions.append(partition_id)
+
+    def _grow(self, capacity: int) -> None:
+        extra = capacity - len(self._vectors)
+        self._vectors = np.vstack([self._vectors, np.zeros((extra, self._vectors.shape[1]), np.float32)])
+        self._codes = np.vstack([self._codes, np.zeros((extra, self._codes.shape[1]), np.uint64)])
+        self._partition_ids = np.concatenate([self._partition_ids, np.full(extra, -1, np.int32)])
+        self._expires = np.concatenate([self._expires, np.zeros(extra)])
+        self._last_used = np.concatenate([self._last_used, np.zeros(extra)])
+        self._answers.extend([None] * extra)
@@ -0,0 +1,267 @@
+"""
+Server-side conversation sessions
+Bounded in-memory LRU of conversation turns with optional SQLite persistence, server-issued
+session ids, and token-budgeted history selection that folds older turns into a running summary
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+# Roles as sent upstream; summaries label them for the summarizer
+SPEAKERS = {"user": "Student", "assistant": "Murukku"}
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+
+def new_session_id(secret: bytes) -> str:
+    """Unguessable session id, signed so any worker can tell the server issued it"""
+    token = secrets.token_urlsafe(18)
+    return f"{token}.{_sign(token, secret)}"
+
+
+def is_session_id(session_id: str, secret: bytes) -> bool:
+    """Whether `session_id` came from new_session_id with this secret (not made up by a client)"""
+    token, _, signature = session_id.rpartition(".")
+    return bool(token) and hmac.compare_digest(signature, _sign(token, secret))
+
+
+def _sign(token: str, secret: bytes) -> str:
+    return hmac.new(secret, token.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+@dataclass
+class Session:
+    """Turns not yet summarized, the summary of everything before them, and lifetime totals"""
+
+    turns: List[Dict[str, Any]] = field(default_factory=list)  # {"seq", "role", "content", "tokens"}
+    summary: str = ""
+    summary_tokens: int = 0
+    total_tokens: int = 0  # every turn ever stored, i.e. what a full-history resend would cost
+    next_seq: int = 0
+    updated: float = field(default_factory=time.time)
+
+    @property
+    def history_tokens(self) -> int:
+        return self.summary_tokens + sum(turn["tokens"] for turn in self.turns)
+
+    def to_json(self) -> str:
+        return json.dumps(self.__dict__, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Session":
+        return cls(**json.loads(raw))
+
+
+@dataclass
+class History:
+    """What one request sends upstream from its session"""
+
+    summary: str
+    turns: List[Dict[str, Any]]
+    tokens: int
+    full_tokens: int
+    summarized: bool = False
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Summary (as a system note) then the recent turns, oldest first"""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"{SUMMARY_HEADER}\n{self.summary}"})
+        messages.extend({"role": turn["role"], "content": turn["content"]} for turn in self.turns)
+        return messages
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "historyTurns": len(self.turns),
+            "historyTokens": self.tokens,
+            "fullHistoryTokens": self.full_tokens,
+            "savedTokens": max(0, self.full_tokens - self.tokens),
+            "summarized": self.summarized,
+        }
+
+
+class SessionStore:
+    """
+    LRU of sessions bounded by count and turns per session, expiring after `ttl` idle seconds.
+    With `path`, every change is also written to SQLite so sessions survive restarts and
+    are visible to every worker process; the store is then blocking, so async callers run
+    its methods in a thread.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        max_turns: int = 50,
+        ttl: float = 86400.0,
+        path: Optional[str] = None,
+    ):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.path = path
+        self.summaries = 0
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._pid = None
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Per-process connection, opened on first use (a connection must not cross a fork)"""
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated)")
+            self._pid = os.getpid()
+        return self._connection
+
+    @property
+    def blocking(self) -> bool:
+        return self.path is not None
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            return self._get(session_id)
+
+    def _get(self, session_id: str) -> Optional[Session]:
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session is None and self.path:
+            row = self._conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            session = Session.from_json(row[0]) if row else None
+        elif session is not None and self.path:
+            # Another worker may have added turns since this copy was cached
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated > ?", (session_id, session.updated)
+            ).fetchone()
+            if row:
+                session = Session.from_json(row[0])
+        if session is None:
+            return None
+        if session.updated + self.ttl < now:
+            self._delete(session_id)
+            return None
+        self._remember(session_id, session)
+        return session
+
+    def append(self, session_id: str, turns: List[Dict[str, str]], estimate: Callable[[str], int]) -> Session:
+        """Add turns ({"role", "content"}), creating the session on first use"""
+        with self._lock:
+            session = self._get(session_id) or Session()
+            for turn in turns:
+                tokens = estimate(turn["content"])
+                session.turns.append({"seq": session.next_seq, **turn, "tokens": tokens})
+                session.next_seq += 1
+                session.total_tokens += tokens
+            # Hard cap on storage; the summary is refreshed before history ever gets this long
+            del session.turns[:-self.max_turns]
+            self._save(session_id, session)
+            return session
+
+    def fold(self, session_id: str, before_seq: int, summary: str, estimate: Callable[[str], int]) -> Session:
+        """Replace every turn older than before_seq with `summary`"""
+        with self._lock:
+            session = self._get(session_id) or Session()
+            session.turns = [turn for turn in session.turns if turn["seq"] >= before_seq]
+            session.summary = summary
+            session.summary_tokens = estimate(summary)
+            self.summaries += 1
+            self._save(session_id, session)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._delete(session_id)
+
+    def _delete(self, session_id: str) -> bool:
+        found = self._sessions.pop(session_id, None) is not None
+        if self.path:
+            found = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0 or found
+        return found
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self.path:
+                return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "sqlite" if self.path else "memory",
+            "sessions": len(self),
+            "cached": len(self._sessions),
+            "summaries": self.summaries,
+        }
+
+    def _remember(self, session_id: str, session: Session) -> None:
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _save(self, session_id: str, session: Session) -> None:
+        session.updated = time.time()
+        self._remember(session_id, session)
+        if self.path:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, updated) VALUES (?, ?, ?)",
+                (session_id, session.to_json(), session.updated)
+            )
+            self._conn.execute("DELETE FROM sessions WHERE updated < ?", (session.updated - self.ttl,))
+
+
+# ============================================================================
+# HISTORY BUDGET
+# ============================================================================
+
+def is_follow_up(messages: List[Dict[str, Any]]) -> bool:
+    """Whether the request carries earlier turns (or their summary) before the latest user turn"""
+    return any(
+        m["role"] == "assistant" or (m["role"] == "system" and str(m["content"]).startswith(SUMMARY_HEADER))
+        for m in messages
+    )
+
+
+def turns_to_fold(session: Session, budget: int) -> int:
+    """
+    How many of the oldest turns to fold into the summary so the history fits `budget`
+    (0 when it already fits). The newest turns that fit next to the current summary are
+    kept verbatim; only the overflow is folded.
+    """
+    if session.history_tokens <= budget:
+        return 0
+    keep, kept_tokens = 0, 0
+    for turn in reversed(session.turns):
+        if session.summary_tokens + kept_tokens + turn["tokens"] > budget:
+            break
+        keep += 1
+        kept_tokens += turn["tokens"]
+    return len(session.turns) - keep
+
+
+def transcript(summary: str, turns: List[Dict[str, Any]]) -> str:
+    """Previous summary plus the turns being folded, as text for the summarizer"""
+    lines = [f"Earlier summary: {summary}"] if summary else []
+    lines.extend(f"{SPEAKERS.get(turn['role'], turn['role'])}: {turn['content']}" for turn in turns)
+    return "\n".join(lines)
+
+
+def extractive_summary(summary: str, turns: List[Dict[str, Any]], max_chars: int) -> str:
+    """Summary without an upstream call: the first sentence of each turn, newest kept when clipped"""
+    lines = [summary] if summary else []
+    for turn in turns:
+        first = turn["content"].strip().split("\n", 1)[0].split(". ", 1)[0][:120]
+        lines.append(f"{SPEAKERS.get(turn['role'], turn['role'])}: {first}")
+    return "\n".join(lines)[-max_chars:]
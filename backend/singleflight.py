@@ -0,0 +1,67 @@
+"""
+Single-flight request coalescing
+Concurrent calls with the same key share one upstream task and all receive its result
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplicates identical in-flight work.
+
+    - The first caller for a key starts the task; later callers await the same task.
+    - Upstream errors are raised to every waiter.
+    - A waiter being cancelled (client went away) never cancels the shared task
+      while others still wait; the task is cancelled only when its last waiter leaves.
+    - Keys are forgotten as soon as the task finishes, so results are never reused
+      after the fact - that is the response cache's job.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inFlight": self.in_flight,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
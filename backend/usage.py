@@ -0,0 +1,36 @@
+"""
+Upstream token usage accounting
+Aggregates the `usage` block OpenRouter returns, including provider prompt-cache hits
+"""
+
+from typing import Any, Dict, Optional
+
+
+class UsageTracker:
+    """Per-model totals of prompt, cached-prompt and completion tokens"""
+
+    def __init__(self):
+        self.models: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model: str, usage: Optional[Dict[str, Any]]) -> None:
+        if not usage:
+            return
+        totals = self.models.setdefault(
+            model, {"requests": 0, "promptTokens": 0, "cachedTokens": 0, "completionTokens": 0}
+        )
+        details = usage.get("prompt_tokens_details") or {}
+        totals["requests"] += 1
+        totals["promptTokens"] += usage.get("prompt_tokens") or 0
+        totals["cachedTokens"] += details.get("cached_tokens") or 0
+        totals["completionTokens"] += usage.get("completion_tokens") or 0
+
+    def stats(self) -> Dict[str, Any]:
+        prompt = sum(m["promptTokens"] for m in self.models.values())
+        cached = sum(m["cachedTokens"] for m in self.models.values())
+        return {
+            "promptTokens": prompt,
+            "cachedTokens": cached,
+            "completionTokens": sum(m["completionTokens"] for m in self.models.values()),
+            "cachedRatio": round(cached / prompt, 4) if prompt else 0.0,
+            "models": self.models,
+        }
@@ -0,0 +1,24 @@
+// Export services/knowledgeBase.ts to backend/knowledge_base.json for server-side retrieval.
+// Run after editing the knowledge base: npm run export:kb
+import { readFile, writeFile } from 'node:fs/promises';
+
+const source = await readFile(new URL('../services/knowledgeBase.ts', import.meta.url), 'utf8');
+
+// The file is plain data: drop the type import and the `: Type` annotations on declarations
+const js = source
+    .replace(/^import .*$/gm, '')
+    .replace(/^(export\s+)?const\s+(\w+)\s*:[^=]+=/gm, '$1const $2 =');
+
+const kb = await import(`data:text/javascript;base64,${Buffer.from(js).toString('base64')}`);
+
+const out = {
+    globalReferences: kb.globalReferences,
+    departmentCatalog: kb.departmentCatalog,
+    subjectDatabase: kb.subjectDatabase,
+    techGlossary: kb.techGlossary,
+    interviewQA: kb.interviewQA,
+    interviewModules: kb.interviewModules,
+};
+
+await writeFile(new URL('../backend/knowledge_base.json', import.meta.url), JSON.stringify(out, null, 1) + '\n');
+console.log('wrote backend/knowledge_base.json');
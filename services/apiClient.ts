@@ -20,6 +20,7 @@ export interface ChatRequest {
   context?: Partial<UserContext>;
   model?: string;
   attachedImage?: string;
+  sessionId?: string; // From createSession(); the server keeps the conversation, send only the new message
 }
 
 export interface ChatResponse {
@@ -119,6 +120,13 @@ class FastAPIClient {
     });
   }
 
+  /**
+   * Start a server-side conversation; pass the id as ChatRequest.sessionId
+   */
+  async createSession(): Promise<{ sessionId: string }> {
+    return this.request('/api/sessions', { method: 'POST' });
+  }
+
   /**
    * Analyze an image using vision model
    */
@@ -152,7 +160,7 @@ class FastAPIClient {
   /**
    * Generate image URL
    */
-  async generateImage(prompt: string): Promise<{ url: string; prompt: string; model: string }> {
+  async generateImage(prompt: string): Promise<{ url: string; prompt: string; model: string; cachedUrl?: string }> {
     const params = new URLSearchParams({ prompt });
     return this.request(`/api/generate-image?${params}`);
   }